@@ -0,0 +1,140 @@
+"""
+Semantic answer cache for knowledge base answers.
+
+Stores final answers (text, sources and follow-up questions) keyed by the normalized
+question embedding, the set of knowledge fields the user can access and the question
+language. A new question is served from the cache when a stored question with the same
+key has a cosine similarity above the threshold.
+
+Entries expire after a TTL, the least recently used entries are evicted when the cache
+is full, and entries are invalidated whenever a knowledge field they were answered from
+is rebuilt.
+
+Environment variables:
+    ANSWER_CACHE_ENABLED                - "true"/"false" (default true)
+    ANSWER_CACHE_MAX_ENTRIES            - maximum number of cached answers (default 500)
+    ANSWER_CACHE_TTL_SECONDS            - lifetime of an answer (default 86400)
+    ANSWER_CACHE_SIMILARITY_THRESHOLD   - minimum cosine similarity for a hit (default 0.95)
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "500"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.95"))
+
+
+class SemanticAnswerCache:
+    """Thread-safe in-memory semantic cache with TTL and LRU eviction."""
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_MAX_ENTRIES, ttl_seconds: int = ANSWER_CACHE_TTL_SECONDS,
+                 similarity_threshold: float = ANSWER_CACHE_SIMILARITY_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()  # entry_id -> entry dict, least recently used first
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    @staticmethod
+    def make_key(fields, language: str) -> tuple:
+        return (frozenset(fields), language or "unknown")
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self, now: float):
+        expired = [entry_id for entry_id, entry in self._entries.items() if now - entry["created"] > self.ttl_seconds]
+        for entry_id in expired:
+            del self._entries[entry_id]
+        self._stats["expirations"] += len(expired)
+
+    def lookup(self, embedding, fields, language: str):
+        """Returns the most similar cached entry for the key, or None."""
+        key = self.make_key(fields, language)
+        query = self._normalize(embedding)
+        with self._lock:
+            self._expire(time.time())
+            candidates = [(entry_id, entry) for entry_id, entry in self._entries.items() if entry["key"] == key]
+            if candidates:
+                similarities = np.stack([entry["embedding"] for _, entry in candidates]) @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    entry_id, entry = candidates[best]
+                    self._entries.move_to_end(entry_id)
+                    entry["hits"] += 1
+                    self._stats["hits"] += 1
+                    return dict(entry, similarity=float(similarities[best]))
+            self._stats["misses"] += 1
+            return None
+
+    def store(self, question: str, embedding, fields, language: str, answer: str, sources, keywords, follow_ups: list, source_mode: str):
+        """Adds an answer to the cache, evicting the least recently used entries if necessary."""
+        if not answer:
+            return
+        entry = {
+            "key": self.make_key(fields, language),
+            "fields": sorted(fields),
+            "question": question,
+            "embedding": self._normalize(embedding),
+            "answer": answer,
+            "sources": sources,
+            "keywords": keywords,
+            "follow_ups": list(follow_ups or []),
+            "source_mode": source_mode,
+            "created": time.time(),
+            "hits": 0,
+        }
+        with self._lock:
+            self._entries[uuid.uuid4().hex] = entry
+            self._stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate_field(self, field: str) -> int:
+        """Removes all answers that were (partly) answered from the given knowledge field."""
+        with self._lock:
+            stale = [entry_id for entry_id, entry in self._entries.items() if field in entry["key"][0]]
+            for entry_id in stale:
+                del self._entries[entry_id]
+            self._stats["invalidations"] += len(stale)
+        return len(stale)
+
+    def retain_fields(self, existing_fields) -> int:
+        """Removes all answers that depend on a knowledge field which no longer exists."""
+        existing_fields = set(existing_fields)
+        with self._lock:
+            stale = [entry_id for entry_id, entry in self._entries.items() if not entry["key"][0] <= existing_fields]
+            for entry_id in stale:
+                del self._entries[entry_id]
+            self._stats["invalidations"] += len(stale)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._stats["invalidations"] += len(self._entries)
+            self._entries.clear()
+
+    def get_statistics(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "enabled": ANSWER_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                **self._stats,
+            }
+
+
+answer_cache = SemanticAnswerCache()
@@ -24,13 +24,19 @@ from typing import List, Optional
 from datetime import datetime, timedelta
 import pandas as pd
 import pytz
-from llm import periodic_cache_cleanup, cleanup_expired_cache
+import llm
+from llm import periodic_cache_cleanup, cleanup_expired_cache, list_vector_store_generations, get_current_generation, rollback_vector_store, VECTOR_STORE_PATH, vector_stores
+from answer_cache import answer_cache
+from embedding_cache import embedding_cache
+from reranker import get_reranker
+from upload_store_cache import upload_store_cache
 from config import (
     get_config_file_path, load_json_config, save_json_config,
     load_admins_config, load_features_config, load_knowledge_fields_config,
     save_admins_config, save_features_config, save_knowledge_fields_config
 )
 from backup_scheduler import get_scheduler
+from kb_jobs import get_job_manager, KnowledgeBaseJobRunning
 import security
 
 # --- App Initialization ---
@@ -66,6 +72,9 @@ logging.basicConfig(level=logging.INFO)
 @fastapi_app.on_event("startup")
 async def startup_event():
     """Initialize background tasks when the FastAPI app starts."""
+    # Registers the knowledge base vector stores and creates cache directories; importing llm does not
+    await asyncio.to_thread(llm.init)
+
     # Perform initial cache cleanup
     logging.info("Performing initial cache cleanup on startup...")
     try:
@@ -256,6 +265,11 @@ async def health_check():
                 "status": "connected" if db_status else "disconnected",
                 "message": db_message
             },
+            "answer_cache": answer_cache.get_statistics(),
+            "embedding_cache": embedding_cache.get_statistics(),
+            "vector_stores": vector_stores.get_statistics(),
+            "reranker": get_reranker().get_statistics(),
+            "upload_stores": upload_store_cache.get_statistics(),
             "timestamp": datetime.utcnow().isoformat()
         }
         
@@ -1105,6 +1119,61 @@ async def restore_backup(restore_data: dict = Body(...), user: User = Depends(ge
         logging.error(f"Backup restore failed: {e}")
         raise HTTPException(status_code=500, detail="Failed to restore backup")
 
+# --- Knowledge Base Job Endpoints ---
+@fastapi_app.get("/admin/knowledge_base/jobs")
+async def list_knowledge_base_jobs(user: User = Depends(get_current_user)):
+    """Lists recent knowledge base update jobs and the running one (admin only)."""
+    check_admin_access(user)
+    manager = get_job_manager()
+    return {"active": manager.get_active_job(), "jobs": manager.list_jobs()}
+
+@fastapi_app.get("/admin/knowledge_base/jobs/{job_id}")
+async def get_knowledge_base_job(job_id: str, since: int = 0, user: User = Depends(get_current_user)):
+    """Gets status and progress messages of a knowledge base update job (admin only)."""
+    check_admin_access(user)
+    job = get_job_manager().get_job(job_id, since=since)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Knowledge base job not found")
+    return job
+
+@fastapi_app.post("/admin/knowledge_base/jobs/{job_id}/cancel")
+async def cancel_knowledge_base_job(job_id: str, user: User = Depends(get_current_user)):
+    """Cancels a running knowledge base update job (admin only)."""
+    check_admin_access(user)
+    if not get_job_manager().cancel(job_id):
+        raise HTTPException(status_code=409, detail="Knowledge base job is not running")
+    return {"status": "success", "message": f"Cancelling knowledge base job {job_id}"}
+
+@fastapi_app.get("/admin/knowledge_base/generations")
+async def get_knowledge_base_generations(user: User = Depends(get_current_user)):
+    """Lists the stored index generations of every knowledge field (admin only)."""
+    check_admin_access(user)
+    fields = sorted(
+        name for name in os.listdir(VECTOR_STORE_PATH)
+        if not name.startswith('.') and os.path.isdir(os.path.join(VECTOR_STORE_PATH, name))
+    ) if os.path.isdir(VECTOR_STORE_PATH) else []
+    return {
+        field: {"current": get_current_generation(field), "generations": list_vector_store_generations(field)}
+        for field in fields
+    }
+
+@fastapi_app.post("/admin/knowledge_base/rollback")
+async def rollback_knowledge_base(rollback_data: dict = Body(...), user: User = Depends(get_current_user)):
+    """Serves an earlier index generation of a knowledge field again (admin only)."""
+    check_admin_access(user)
+    field = rollback_data.get("field")
+    if not field:
+        raise HTTPException(status_code=400, detail="Knowledge field is required")
+    if get_job_manager().get_active_job():
+        raise HTTPException(status_code=409, detail="A knowledge base update is running")
+    try:
+        generation = await asyncio.to_thread(rollback_vector_store, field, rollback_data.get("generation"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error rolling back knowledge field: {str(e)}")
+    return {"status": "success", "message": f"'{field}' rolled back to generation {generation}", "generation": generation}
+
 # --- Temporary File Handling ---
 TEMP_UPLOADS_DIR = "temp_uploads"
 if not os.path.exists(TEMP_UPLOADS_DIR):
@@ -1442,6 +1511,7 @@ def cleanup_session_file(sid):
 
     # Clean up RAG vector store directory
     rag_path = sessions[sid].get("rag_vector_store_path")
+    upload_store_cache.release(rag_path)
     if rag_path and os.path.exists(rag_path):
         try:
             # The vector store is a directory, so use shutil.rmtree
@@ -1623,6 +1693,7 @@ async def disconnect(sid):
         print(f"Error logging logout time: {e}")
     
     cleanup_session_file(sid) # Clean up file on disconnect
+    get_job_manager().unsubscribe(sid)
     sessions.pop(sid, None)
 
 
@@ -1808,7 +1879,16 @@ async def stream_and_process_response(sid, generator, conversation_history, **kw
                         await sio.emit("answer_chunk", payload, to=sid)
                     else:
                         print(f"Warning: chunk payload is not a string: {payload}")
-                        
+
+                elif event_type == "follow_ups":
+                    # Follow-ups arrive after the answer has been streamed
+                    payload = result.get("data", [])
+                    if isinstance(payload, list):
+                        assistant_response["follow_ups"] = payload
+                        await sio.emit("answer_follow_ups", {"follow_ups": payload}, to=sid)
+                    else:
+                        print(f"Warning: follow_ups payload is not a list: {payload}")
+
                 elif event_type == "clarification":
                     payload = result.get("data", {})
                     await sio.emit("clarification", {"data": payload}, to=sid)
@@ -1988,7 +2068,8 @@ async def process_document_for_rag(sid, data):
             await sio.emit("status", {"message": message}, to=sid)
 
             if status == "complete":
-                # Store the path to the vector store in the session
+                # Store the path to the vector store in the session; a handle cached for an earlier upload there is stale
+                upload_store_cache.release(vector_store_path)
                 sessions[sid]["rag_vector_store_path"] = vector_store_path
                 await sio.emit("rag_status", {"status": "ready"}, to=sid)
             elif status == "error":
@@ -2001,20 +2082,103 @@ async def process_document_for_rag(sid, data):
         await sio.emit("error", {"message": error_message}, to=sid)
 
 
+async def emit_knowledge_base_job_finished(sid, job: dict):
+    """Tells a client that its knowledge base job has ended."""
+    await sio.emit("knowledge_base_job", job, to=sid)
+    if job["status"] == "completed":
+        await sio.emit("status", {"message": "Knowledge base update complete."}, to=sid)
+    elif job["status"] == "cancelled":
+        await sio.emit("status", {"message": "Knowledge base update cancelled."}, to=sid)
+    else:
+        await sio.emit("error", {"message": f"An error occurred during knowledge base update: {job.get('error') or job['status']}"}, to=sid)
+
+def knowledge_base_job_listener(sid, loop):
+    """Returns a job listener that pushes progress from the worker thread to the client."""
+    def listener(job_id, event):
+        if event["type"] == "message":
+            coroutine = sio.emit("status", {"message": event["message"]}, to=sid)
+        else:
+            coroutine = emit_knowledge_base_job_finished(sid, event["job"])
+        asyncio.run_coroutine_threadsafe(coroutine, loop)
+    return listener
+
+async def get_admin_from_session(sid):
+    """
+    Returns the user of a Socket.IO session if it is an admin - the same check as the HTTP admin
+    endpoints (check_admin_access). Otherwise the client gets an 'error' event and None is returned.
+    """
+    user = await get_user_from_session(sid)
+    try:
+        check_admin_access(user)
+    except HTTPException as e:
+        print(f"Knowledge base job request from {sid} rejected: {e.detail}")
+        await sio.emit("error", {"message": e.detail}, to=sid)
+        return None
+    return user
+
 @sio.event
 async def update_knowledge_base(sid, data):
-    """Handles request to update the knowledge base."""
+    """
+    Handles request to update the knowledge base (admins only). The update runs as a background
+    job; its progress is pushed to the client as 'status' events.
+    """
     print(f"Knowledge base update requested by {sid}")
+    user = await get_admin_from_session(sid)
+    if user is None:
+        return
+    data = data or {}
+    manager = get_job_manager()
+    listener = knowledge_base_job_listener(sid, asyncio.get_running_loop())
     try:
-        # The logic's generator yields progress updates
-        for message in logic.update_knowledge_base():
-            await sio.emit("status", {"message": message}, to=sid)
-            await asyncio.sleep(0.05)  # Add a small delay to allow UI to update
-        await sio.emit("status", {"message": "Knowledge base update complete."}, to=sid)
+        job = manager.start(
+            logic.update_knowledge_base,
+            full_rebuild=bool(data.get("full_rebuild")),
+            requested_by=user.id,
+            listener_key=sid,
+            listener=listener,
+        )
+    except KnowledgeBaseJobRunning as e:
+        job = manager.subscribe(e.job["id"], sid, listener) or e.job
+        await sio.emit("status", {"message": "A knowledge base update is already running - showing its progress."}, to=sid)
     except Exception as e:
         error_message = f"An error occurred during knowledge base update: {e}"
         print(error_message)
         await sio.emit("error", {"message": error_message}, to=sid)
+        return
+    await sio.emit("knowledge_base_job", job, to=sid)
+
+@sio.event
+async def knowledge_base_job_status(sid, data):
+    """
+    Sends the state of a knowledge base job (default: the running one) and, if it is still
+    running, subscribes the client to its progress - e.g. after a reconnect. Admins only, as
+    the progress messages name the indexed documents.
+    'since' skips messages the client has already received.
+    """
+    if await get_admin_from_session(sid) is None:
+        return
+    data = data or {}
+    manager = get_job_manager()
+    job_id = data.get("job_id") or (manager.get_active_job() or {}).get("id")
+    job = manager.get_job(job_id, since=int(data.get("since", 0))) if job_id else None
+    if job is None:
+        await sio.emit("knowledge_base_job", {"id": job_id, "status": "unknown"}, to=sid)
+        return
+    manager.subscribe(job_id, sid, knowledge_base_job_listener(sid, asyncio.get_running_loop()))
+    await sio.emit("knowledge_base_job", job, to=sid)
+
+@sio.event
+async def cancel_knowledge_base_update(sid, data):
+    """Cancels a running knowledge base job (default: the running one). Admins only."""
+    if await get_admin_from_session(sid) is None:
+        return
+    data = data or {}
+    manager = get_job_manager()
+    job_id = data.get("job_id") or (manager.get_active_job() or {}).get("id")
+    if job_id and manager.cancel(job_id):
+        await sio.emit("status", {"message": "Cancelling knowledge base update..."}, to=sid)
+    else:
+        await sio.emit("status", {"message": "No knowledge base update is running."}, to=sid)
 
 @sio.event
 async def python_code_request(sid, data):
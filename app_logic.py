@@ -233,10 +233,11 @@ class AppLogic:
         finally:
             self._reset_cancellation_flag(sid)
 
-    def update_knowledge_base(self):
+    def update_knowledge_base(self, full_rebuild: bool = False):
         """
         Triggers the knowledge base update process.
         This is a generator that yields progress updates.
+        Only changed documents are re-indexed unless full_rebuild is True.
         """
         # --- Derive and store knowledge fields with domain permissions ---
         yield "Processing document structure..."
@@ -276,7 +277,7 @@ class AppLogic:
 
         # --- Update vector store (existing functionality) ---
         yield "Starting vector store update..."
-        for message in force_create_vector_store():
+        for message in force_create_vector_store(full_rebuild=full_rebuild):
             yield message
 
     async def process_document_question(self, sid: str, conversation_history: list, document_content: str, file_type: str = None):
@@ -396,11 +397,12 @@ class AppLogic:
                 try:
                     yield {"status": "generating_code", "attempt": attempt + 1}
 
-                    code_generation_result = next(get_python_code(
+                    # Blocking LLM calls run in a worker thread, never on the event loop
+                    code_generation_result = await asyncio.to_thread(lambda: next(get_python_code(
                         code_gen_history,
                         file_path=file_path,
                         cancellation_check=lambda: self._get_cancellation_flag(sid)
-                    ))
+                    )))
 
                     if self._get_cancellation_flag(sid):
                         yield {"status": "failed", "error": "Generation cancelled by user."}
@@ -421,7 +423,7 @@ class AppLogic:
 
                     # --- Sicherheitsüberprüfung ---
                     yield {"status": "security_check"}
-                    is_safe, reason = is_code_safe(python_code)
+                    is_safe, reason = await asyncio.to_thread(is_code_safe, python_code)
                     if not is_safe:
                         # Log the faulty code to the database
                         if user_id:
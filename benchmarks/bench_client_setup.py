@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for per-request client setup overhead.
+
+Compares building a fresh Together client + TogetherEmbeddings per request (old
+behaviour) with the shared instances from llm_clients, and measures the
+connection setup cost that HTTP keep-alive saves against a local HTTP server
+(new httpx client per request vs. the pooled client).
+
+No requests are sent to Together AI. A dummy API key is used if none is set.
+
+Usage:
+    python benchmarks/bench_client_setup.py [--runs 200]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("TOGETHER_API_KEY", "benchmark-dummy-key")
+
+import llm_clients  # noqa: E402
+
+EMBEDDING_MODEL = "intfloat/multilingual-e5-large-instruct"
+
+
+class OkHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), sum(samples)
+
+
+def report(label, result):
+    p50, total = result
+    print(f"  {label:<38}{p50:>10.3f} ms p50{total:>12.1f} ms total")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    from together import Together
+    from langchain_together.embeddings import TogetherEmbeddings
+
+    print(f"Client construction ({args.runs} requests)")
+    report("fresh Together + TogetherEmbeddings", timed(
+        lambda: (Together(api_key=os.environ["TOGETHER_API_KEY"]),
+                 TogetherEmbeddings(model=EMBEDDING_MODEL, together_api_key=os.environ["TOGETHER_API_KEY"])),
+        args.runs))
+    report("shared registry", timed(
+        lambda: (llm_clients.get_together_client(), llm_clients.get_embeddings(EMBEDDING_MODEL)),
+        args.runs))
+
+    if not llm_clients.HTTPX_AVAILABLE:
+        print("httpx not installed - skipping keep-alive comparison")
+        return
+
+    import httpx
+    server = ThreadingHTTPServer(("127.0.0.1", 0), OkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    def fresh_request():
+        with httpx.Client() as client:
+            client.get(url)
+
+    pooled = llm_clients.get_http_client()
+    print(f"HTTP request incl. connection setup ({args.runs} requests, local server, no TLS)")
+    report("new connection per request", timed(fresh_request, args.runs))
+    report("pooled keep-alive connection", timed(lambda: pooled.get(url), args.runs))
+    print("  (TLS handshakes to api.together.xyz add considerably more per new connection)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
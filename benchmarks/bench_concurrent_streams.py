@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Load test for concurrent answer streaming.
+
+Simulates N users streaming answers at the same time against a fake Together
+client and reports, per streaming mode, the spread of time-to-first-token
+across users and the worst event-loop stall seen by a heartbeat task (a stand-in
+for Socket.IO pings and HTTP endpoints).
+
+  sync   - iterates the blocking stream directly inside the coroutine (old behaviour)
+  async  - llm.async_stream_completion (thread-bridged, bounded queue)
+
+Usage:
+    python benchmarks/bench_concurrent_streams.py [--users 10] [--tokens 100]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm  # noqa: E402
+
+
+class FakeStreamingClient:
+    def __init__(self, first_token_latency: float, token_interval: float, tokens: int):
+        self.first_token_latency = first_token_latency
+        self.token_interval = token_interval
+        self.tokens = tokens
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, model, messages, temperature, stream=False, timeout=None):
+        time.sleep(self.first_token_latency)
+
+        def generate():
+            for i in range(self.tokens):
+                time.sleep(self.token_interval)
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=f"t{i} "))])
+        return generate()
+
+
+async def sync_user(client, messages):
+    start = time.perf_counter()
+    first = None
+    for chunk in llm.robust_api_call(client, llm.LLM_MODEL, messages, 0.0, stream=True):
+        if first is None:
+            first = time.perf_counter() - start
+        await asyncio.sleep(0)  # yield point of the surrounding async generator
+    return first
+
+
+async def async_user(client, messages):
+    start = time.perf_counter()
+    first = None
+    async for chunk in llm.async_stream_completion(client, llm.LLM_MODEL, messages, 0.0):
+        if first is None:
+            first = time.perf_counter() - start
+    return first
+
+
+async def heartbeat(stop: asyncio.Event, interval: float, stalls: list):
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        stalls.append(max(0.0, time.perf_counter() - expected))
+
+
+async def run(mode, args):
+    client = FakeStreamingClient(args.first_token_latency, args.token_interval, args.tokens)
+    messages = [{"role": "user", "content": "Was ist unsere Car Policy?"}]
+    user = sync_user if mode == "sync" else async_user
+    stop, stalls = asyncio.Event(), []
+    beat = asyncio.create_task(heartbeat(stop, 0.05, stalls))
+    start = time.perf_counter()
+    ttft = await asyncio.gather(*[user(client, messages) for _ in range(args.users)])
+    total = time.perf_counter() - start
+    stop.set()
+    await beat
+    return ttft, total, max(stalls) if stalls else 0.0
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--first-token-latency", type=float, default=0.3)
+    parser.add_argument("--token-interval", type=float, default=0.01)
+    args = parser.parse_args()
+
+    print(f"{args.users} concurrent users, {args.tokens} tokens each")
+    print(f"{'mode':<7}{'TTFT min':>10}{'TTFT p50':>10}{'TTFT max':>10}{'spread':>9}{'total':>9}{'max loop stall':>16}")
+    for mode in ("sync", "async"):
+        ttft, total, stall = await run(mode, args)
+        print(f"{mode:<7}{min(ttft):>10.3f}{statistics.median(ttft):>10.3f}{max(ttft):>10.3f}"
+              f"{max(ttft) - min(ttft):>9.3f}{total:>9.3f}{stall:>16.3f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
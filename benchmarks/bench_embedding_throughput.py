@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Embedding throughput benchmark against a local fake embedding server.
+
+Starts an HTTP server that mimics an OpenAI-style /v1/embeddings endpoint with a
+latency proportional to the request size and a concurrency limit that answers
+excess requests with HTTP 429 (Retry-After). Then embeds a 2,000-chunk field
+  - sequentially in fixed batches of 64 (old behaviour)
+  - with the EmbeddingScheduler (token-budget batches, several in flight, 429 backoff)
+and reports chunks/sec.
+
+Usage:
+    python benchmarks/bench_embedding_throughput.py [--chunks 2000] [--concurrency 4] [--server-limit 6]
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding_scheduler import EmbeddingScheduler  # noqa: E402
+
+
+class RateLimitError(Exception):
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status_code}")
+        self.response = response
+        self.status_code = response.status_code
+
+
+def make_handler(args, state):
+    class EmbeddingHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            inputs = body["input"]
+            with state["lock"]:
+                if state["active"] >= args.server_limit:
+                    state["rejected"] += 1
+                    self._send(429, {"error": "rate limit"}, {"Retry-After": "0.5"})
+                    return
+                state["active"] += 1
+            try:
+                tokens = sum(len(text) // 3 for text in inputs)
+                time.sleep(args.request_latency + tokens * args.token_latency)
+                data = [{"index": i, "embedding": [float(len(text) % 7)] * 8} for i, text in enumerate(inputs)]
+                self._send(200, {"data": data})
+            finally:
+                with state["lock"]:
+                    state["active"] -= 1
+
+        def _send(self, status, payload, headers=None):
+            encoded = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(encoded)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(encoded)
+
+        def log_message(self, *args):
+            pass
+
+    return EmbeddingHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--chunk-chars", type=int, default=1500)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--server-limit", type=int, default=6, help="Concurrent requests before the server answers 429")
+    parser.add_argument("--request-latency", type=float, default=0.15, help="Fixed latency per request (s)")
+    parser.add_argument("--token-latency", type=float, default=0.00002, help="Additional latency per token (s)")
+    args = parser.parse_args()
+
+    state = {"lock": threading.Lock(), "active": 0, "rejected": 0}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args, state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/embeddings"
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=32))
+
+    def embed(texts):
+        response = session.post(url, json={"model": "fake", "input": texts}, timeout=60)
+        if response.status_code != 200:
+            raise RateLimitError(response)
+        return [item["embedding"] for item in response.json()["data"]]
+
+    texts = [f"Chunk {i}: " + "Reisekostenrichtlinie Dienstwagen Spesen " * (args.chunk_chars // 40) for i in range(args.chunks)]
+    print(f"{args.chunks} chunks of ~{args.chunk_chars} chars, server limit {args.server_limit} concurrent requests")
+
+    start = time.perf_counter()
+    for i in range(0, len(texts), 64):
+        embed(texts[i:i + 64])
+    sequential = time.perf_counter() - start
+    print(f"  sequential, 64 per batch:        {sequential:6.2f}s  {args.chunks / sequential:7.1f} chunks/s")
+
+    for concurrency in sorted({1, args.concurrency, args.server_limit + 2}):
+        state["rejected"] = 0
+        scheduler = EmbeddingScheduler(embed, max_concurrency=concurrency)
+        start = time.perf_counter()
+        batches = sum(1 for _ in scheduler.iter_batches(texts))
+        elapsed = time.perf_counter() - start
+        print(f"  scheduler, concurrency {concurrency:<2} ({batches} batches): {elapsed:6.2f}s  {args.chunks / elapsed:7.1f} chunks/s"
+              f"  ({state['rejected']} x 429)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
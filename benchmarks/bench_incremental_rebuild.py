@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the incremental knowledge base rebuild.
+
+Creates a temporary knowledge field with N generated DOCX files, builds the index from
+scratch, then changes one file and rebuilds incrementally, and finally rebuilds without
+any change, and once more from scratch with a warm embedding cache. Embeddings come from a local fake model that simulates the API latency per
+batch, so the numbers show parsing + embedding work avoided, not network variance.
+The LLM-based document structure index is skipped. Documents are parsed by
+--parse-workers processes (KB_PARSE_WORKERS); compare with --parse-workers 1.
+
+Usage:
+    python benchmarks/bench_incremental_rebuild.py [--files 50] [--paragraphs 40] [--batch-latency 0.3] [--parse-workers 4]
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import docx  # noqa: E402
+
+import llm  # noqa: E402
+from embedding_cache import EmbeddingCache  # noqa: E402
+
+
+class FakeEmbeddings:
+    """Deterministic local embeddings with a simulated per-batch API latency."""
+
+    def __init__(self, batch_latency: float, dimensions: int = 64):
+        self.batch_latency = batch_latency
+        self.dimensions = dimensions
+        self.embedded_texts = 0
+
+    def _vector(self, text):
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        return [b / 255.0 for b in (digest * (self.dimensions // len(digest) + 1))[:self.dimensions]]
+
+    def embed_documents(self, texts):
+        time.sleep(self.batch_latency)
+        self.embedded_texts += len(texts)
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+def write_document(path, index, revision=0):
+    document = docx.Document()
+    document.add_heading(f"Richtlinie {index}", level=1)
+    for p in range(ARGS.paragraphs):
+        if p % 8 == 0:
+            document.add_heading(f"Abschnitt {p // 8 + 1}", level=2)
+        document.add_paragraph(
+            f"Dokument {index}, Absatz {p}, Revision {revision}: Diese Regelung beschreibt den Prozess "
+            f"für Reisekosten, Dienstwagen und Spesenabrechnung im Unternehmen. " * 4
+        )
+    document.save(path)
+
+
+def run(label, fake, **kwargs):
+    before = fake.embedded_texts
+    start = time.perf_counter()
+    for _ in llm.force_create_vector_store(**kwargs):
+        pass
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<44}{elapsed:>9.2f}s{fake.embedded_texts - before:>10} chunks embedded")
+
+
+def main():
+    workdir = tempfile.mkdtemp(prefix="kb-bench-")
+    try:
+        field_path = os.path.join(workdir, "Documents", "Benchmark")
+        os.makedirs(field_path)
+        for i in range(ARGS.files):
+            write_document(os.path.join(field_path, f"richtlinie_{i:03d}.docx"), i)
+
+        llm.DOCUMENTS_PATH = os.path.join(workdir, "Documents")
+        llm.VECTOR_STORE_PATH = os.path.join(workdir, "vector_store")
+        llm.DOCUMENT_STRUCTURE_INDEX_PATH = os.path.join(workdir, "document_structure_index.json")
+        llm.DOCUMENT_STRUCTURE_INDEX_BINARY_PATH = os.path.join(workdir, "document_structure_index.msgpack")
+        llm.create_document_structure_index = lambda fields: {}  # LLM-based, not part of this benchmark
+        fake = FakeEmbeddings(ARGS.batch_latency)
+        llm.get_embeddings = lambda model: fake
+        llm.embedding_cache = EmbeddingCache(os.path.join(workdir, "embedding_cache.sqlite"))
+        if ARGS.parse_workers:
+            llm.KB_PARSE_WORKERS = ARGS.parse_workers
+
+        print(f"{ARGS.files} DOCX files, {ARGS.batch_latency}s simulated latency per embedding batch, {llm.KB_PARSE_WORKERS} parse workers")
+        run("full build", fake, full_rebuild=True)
+        write_document(os.path.join(field_path, "richtlinie_007.docx"), 7, revision=1)
+        run("1 file changed (incremental)", fake)
+        run("no changes", fake)
+        write_document(os.path.join(field_path, "richtlinie_007.docx"), 7, revision=2)
+        run("1 file changed (full, warm embedding cache)", fake, full_rebuild=True)
+        print(f"  embedding cache: {llm.embedding_cache.get_statistics()}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--paragraphs", type=int, default=40)
+    parser.add_argument("--batch-latency", type=float, default=0.3)
+    parser.add_argument("--parse-workers", type=int, default=0, help="Worker processes for parsing (default: KB_PARSE_WORKERS)")
+    ARGS = parser.parse_args()
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+End-to-end extraction time of mixed-content PDFs: whole-document extractors vs. the per-page
+strategy of pdf_pages ("auto").
+
+Builds a synthetic PDF with text pages, ruled table pages of figures and scanned pages (a text
+page rendered to an image without a text layer), or uses --pdf. Every page is classified
+(pdf_pages.classify_page) and the classes of the synthetic pages are checked against how they
+were built. Then the document is extracted with
+
+- PyMuPDF for the whole document (the previous fast path; misses the text of scanned pages)
+- pdfplumber for the whole document (the previous table fallback)
+- unstructured hi_res for the whole document (the previous last fallback; if installed)
+- the per-page strategy: PyMuPDF for text pages, pdfplumber for table pages, OCR for scanned
+  pages (OCR only if unstructured is installed)
+
+--table-extractor pymupdf sets PDF_TABLE_PAGE_EXTRACTOR for the run, so the per-page strategy
+keeps the PyMuPDF text of table pages; comparing both runs shows what pdfplumber costs.
+
+Usage:
+    python benchmarks/bench_mixed_pdf_extraction.py [--text-pages 40] [--table-pages 15]
+        [--scanned-pages 5] [--pdf file.pdf] [--workers 1] [--repeats 3] [--skip-hi-res]
+        [--table-extractor pdfplumber|pymupdf]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdf_pages  # noqa: E402
+
+WORDS = ["Planung", "Kostenstelle", "Personal", "Bericht", "Vertrag", "Urlaub", "Datenschutz", "Antrag", "Lohn",
+         "Abrechnung", "Budget", "Konto", "Umsatz", "Ergebnis", "Prognose", "Szenario", "Periode", "Freigabe"]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def add_text_page(doc, rng):
+    page = doc.new_page()
+    y = 72
+    while y < page.rect.height - 72:
+        page.insert_text((72, y), " ".join(rng.choice(WORDS) for _ in range(9)), fontsize=10)
+        y += 14
+    return page
+
+
+def add_table_page(doc, rng):
+    page = doc.new_page()
+    left, top, rows, columns, row_height, column_width = 60, 80, 30, 5, 20, 95
+    page.insert_text((left, top - 12), f"Tabelle {rng.randint(1, 99)}: {rng.choice(WORDS)}", fontsize=11)
+    for r in range(rows + 1):
+        page.draw_line((left, top + r * row_height), (left + columns * column_width, top + r * row_height))
+    for c in range(columns + 1):
+        page.draw_line((left + c * column_width, top), (left + c * column_width, top + rows * row_height))
+    for r in range(rows):
+        for c in range(columns):
+            cell = rng.choice(WORDS) if c == 0 else f"{rng.uniform(-5000, 50000):,.2f}"
+            page.insert_text((left + c * column_width + 4, top + r * row_height + 14), cell, fontsize=9)
+    return page
+
+
+def add_scanned_page(doc, rng):
+    import fitz  # PyMuPDF
+    with fitz.open() as source:
+        add_text_page(source, rng)
+        pixmap = source[0].get_pixmap(dpi=150)
+    page = doc.new_page()
+    page.insert_image(page.rect, pixmap=pixmap)
+    return page
+
+
+def build_mixed_pdf(path: str, text_pages: int, table_pages: int, scanned_pages: int, seed: int) -> list:
+    """Writes the PDF (page kinds shuffled) and returns the expected class of every page."""
+    import fitz  # PyMuPDF
+    rng = random.Random(seed)
+    kinds = [pdf_pages.PAGE_TEXT] * text_pages + [pdf_pages.PAGE_TABLE] * table_pages + [pdf_pages.PAGE_SCANNED] * scanned_pages
+    rng.shuffle(kinds)
+    builders = {pdf_pages.PAGE_TEXT: add_text_page, pdf_pages.PAGE_TABLE: add_table_page, pdf_pages.PAGE_SCANNED: add_scanned_page}
+    with fitz.open() as doc:
+        for kind in kinds:
+            builders[kind](doc, rng)
+        doc.save(path)
+    return kinds
+
+
+def classify_pages(path: str) -> list:
+    with pdf_pages.open_pdf(path) as doc:
+        return [pdf_pages.classify_page(page) for page in doc]
+
+
+def extract(path: str, method: str, workers: int) -> str:
+    """Whole document text; method "auto" is the per-page strategy, "hi_res" unstructured hi_res."""
+    if method == "hi_res":
+        from unstructured.partition.auto import partition
+        elements = partition(filename=path, include_metadata=True, strategy="hi_res")
+        return "\n\n".join(str(element) for element in elements if str(element).strip())
+    texts = (text for _, _, text, _ in pdf_pages.iter_pdf_pages(path, method, workers=workers))
+    return "".join(text + "\n\n" for text in texts if text or method != "pdfplumber")
+
+
+def timed(extract, repeats: int) -> tuple:
+    times, text = [], ""
+    for _ in range(repeats):
+        start = time.perf_counter()
+        text = extract()
+        times.append(time.perf_counter() - start)
+    return text, times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="Use this PDF instead of a synthetic one (no class check)")
+    parser.add_argument("--text-pages", type=int, default=40)
+    parser.add_argument("--table-pages", type=int, default=15)
+    parser.add_argument("--scanned-pages", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=pdf_pages.PDF_EXTRACT_WORKERS)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--skip-hi-res", action="store_true", help="Do not run whole-document unstructured hi_res")
+    parser.add_argument("--table-extractor", choices=("pdfplumber", "pymupdf"), default=pdf_pages.PDF_TABLE_PAGE_EXTRACTOR)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    # Set before the first extraction, so spawned workers read the same setting
+    os.environ["PDF_TABLE_PAGE_EXTRACTOR"] = args.table_extractor
+    pdf_pages.USE_PDFPLUMBER_FOR_TABLES = args.table_extractor == "pdfplumber" and pdf_pages.PDFPLUMBER_AVAILABLE
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path, expected = args.pdf, None
+        if not path:
+            path = os.path.join(workdir, "mixed.pdf")
+            expected = build_mixed_pdf(path, args.text_pages, args.table_pages, args.scanned_pages, args.seed)
+
+        start = time.perf_counter()
+        classes = classify_pages(path)
+        classify_ms = (time.perf_counter() - start) * 1000
+        counts = {page_class: classes.count(page_class) for page_class in (pdf_pages.PAGE_TEXT, pdf_pages.PAGE_TABLE, pdf_pages.PAGE_SCANNED)}
+        print(f"{os.path.basename(path)}: {len(classes)} pages - "
+              + ", ".join(f"{count} {page_class}" for page_class, count in counts.items())
+              + f" (classified in {classify_ms:.0f}ms, {classify_ms / max(1, len(classes)):.1f}ms per page)")
+        if expected is not None:
+            wrong = [i + 1 for i, (got, want) in enumerate(zip(classes, expected)) if got != want]
+            print(f"Classes as built: {'yes' if not wrong else 'no, pages ' + ', '.join(map(str, wrong))}")
+        if not pdf_pages.UNSTRUCTURED_AVAILABLE:
+            print("unstructured is not installed: scanned pages keep their (empty) PyMuPDF text, hi_res is skipped")
+
+        runs = [("PyMuPDF (whole document)", "pymupdf")]
+        if pdf_pages.PDFPLUMBER_AVAILABLE:
+            runs.append(("pdfplumber (whole document)", "pdfplumber"))
+        if pdf_pages.UNSTRUCTURED_AVAILABLE and not args.skip_hi_res:
+            runs.append(("unstructured hi_res (whole document)", "hi_res"))
+        runs.append((f"per page (tables: {args.table_extractor})", "auto"))
+
+        print(f"{'method (' + str(args.workers) + ' workers)':<40}{'p50':>10}{'max':>10}{'characters':>12}")
+        for name, method in runs:
+            repeats = 1 if method == "hi_res" else args.repeats
+            text, times = timed(lambda: extract(path, method, args.workers), repeats)
+            print(f"{name:<40}{percentile(times, 50):>9.2f}s{max(times):>9.2f}s{len(text.strip()):>12,}")
+
+    if expected is not None and wrong:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Page-parallel PDF text extraction vs. the former sequential extraction.
+
+Extracts a PDF with the previous single-threaded loop (text += page text) and with pdf_pages
+(page ranges in worker processes, pages yielded in order and joined once). Reports total time
+and the time until the first page is available to chunking, and checks that both texts are
+identical.
+
+Usage:
+    python benchmarks/bench_pdf_extraction.py [--pdf Beispieldaten/BMW-AG-Jahresabschluss-2024-de.pdf]
+        [--method pymupdf] [--workers 4] [--pages-per-task 16] [--repeats 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_pages import PDF_EXTRACT_WORKERS, PDF_PAGES_PER_TASK, iter_pdf_pages  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def sequential_extraction(file_path: str, method: str) -> str:
+    """The previous extract_text_with_pymupdf / extract_text_with_pdfplumber loops."""
+    text = ""
+    if method == "pymupdf":
+        import fitz  # PyMuPDF
+        doc = fitz.open(file_path)
+        for page in doc:
+            text += page.get_text() + "\n\n"
+        doc.close()
+    else:
+        import pdfplumber
+        with pdfplumber.open(file_path) as pdf:
+            for page in pdf.pages:
+                page_text = page.extract_text()
+                if page_text:
+                    text += page_text + "\n\n"
+    return text
+
+
+def parallel_extraction(file_path: str, method: str, workers: int, pages_per_task: int) -> tuple:
+    """Returns (text, seconds until the first page)."""
+    start = time.perf_counter()
+    first_page, parts = None, []
+    for _, _, text, _ in iter_pdf_pages(file_path, method, workers=workers, pages_per_task=pages_per_task):
+        first_page = first_page if first_page is not None else time.perf_counter() - start
+        if text or method == "pymupdf":
+            parts.append(text + "\n\n")
+    return "".join(parts), first_page
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", default=os.path.join(ROOT, "Beispieldaten", "BMW-AG-Jahresabschluss-2024-de.pdf"))
+    parser.add_argument("--method", choices=("pymupdf", "pdfplumber"), default="pymupdf")
+    parser.add_argument("--workers", type=int, default=PDF_EXTRACT_WORKERS)
+    parser.add_argument("--pages-per-task", type=int, default=PDF_PAGES_PER_TASK)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    sequential_times, parallel_times, first_pages = [], [], []
+    identical = True
+    for _ in range(args.repeats):
+        start = time.perf_counter()
+        expected = sequential_extraction(args.pdf, args.method)
+        sequential_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        text, first_page = parallel_extraction(args.pdf, args.method, args.workers, args.pages_per_task)
+        parallel_times.append(time.perf_counter() - start)
+        first_pages.append(first_page or 0.0)
+        identical = identical and text == expected
+
+    print(f"{os.path.basename(args.pdf)}: {len(expected):,} characters, {args.method}, "
+          f"{args.workers} workers, {args.pages_per_task} pages per task (CPUs: {os.cpu_count()})")
+    print(f"Sequential:     total p50 {percentile(sequential_times, 50):6.2f}s (first page only after the whole document)")
+    print(f"Page-parallel:  total p50 {percentile(parallel_times, 50):6.2f}s, first page after {percentile(first_pages, 50):.2f}s")
+    print(f"Texts identical: {'yes' if identical else 'no'}")
+    if not identical:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Per-question cost of the keyword prescreen (quick_vector_store_check).
+
+Generates a synthetic document structure index with --terms terms (single words and short
+phrases spread over the categories and knowledge fields), compiles the PrescreenIndex and
+compares it with the previous linear scan over all terms. Both use the same question words;
+the matched terms and field scores of both are checked to be identical.
+
+Usage:
+    python benchmarks/bench_prescreen_index.py [--terms 100000] [--fields 8] [--questions 200]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prescreen_index import CATEGORIES, PrescreenIndex, question_words  # noqa: E402
+
+SYLLABLES = ["pla", "nung", "kos", "ten", "stel", "le", "per", "so", "nal", "be", "richt", "ver", "trag", "ur", "laub",
+             "da", "ten", "schutz", "an", "trag", "lohn", "ab", "rech", "ung", "bud", "get", "kon", "to", "re", "port"]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def random_word(rng) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def synthetic_index(terms: int, fields: int, rng) -> dict:
+    field_names = [f"Field {i + 1}" for i in range(fields)]
+    index = {category: {} for category in CATEGORIES}
+    while sum(len(entries) for entries in index.values()) < terms:
+        category = rng.choice(CATEGORIES)
+        term = " ".join(random_word(rng) for _ in range(rng.choice((1, 1, 1, 2, 3))))
+        index[category].setdefault(term, []).extend(rng.sample(field_names, rng.randint(1, 2)))
+    return index
+
+
+def linear_scan(structure_index: dict, words: set, accessible_fields) -> tuple:
+    """The previous quick_vector_store_check loop."""
+    matched_terms, field_scores = [], {}
+    for category_name in CATEGORIES:
+        for term, fields in structure_index.get(category_name, {}).items():
+            term_lower = term.lower()
+            if term_lower in words:
+                matched_terms.append(f"{category_name}:{term}")
+                weight = 2.0
+            elif any(word in term_lower for word in words if len(word) > 2):
+                matched_terms.append(f"{category_name}:{term} (partial)")
+                weight = 1.0
+            elif any(term_lower in word for word in words if len(term_lower) > 2):
+                matched_terms.append(f"{category_name}:{term} (contains)")
+                weight = 1.0
+            else:
+                continue
+            for field in fields:
+                if field in accessible_fields:
+                    field_scores[field] = field_scores.get(field, 0) + weight
+    return matched_terms, field_scores
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--terms", type=int, default=100000)
+    parser.add_argument("--fields", type=int, default=8)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--linear-questions", type=int, default=20, help="Questions timed with the (slow) linear scan")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    structure_index = synthetic_index(args.terms, args.fields, rng)
+    accessible_fields = [f"Field {i + 1}" for i in range(args.fields)]
+    questions = [f"Wie funktioniert {random_word(rng)} im {random_word(rng)} für {random_word(rng)}?" for _ in range(args.questions)]
+
+    prescreen, build_ms = timed(PrescreenIndex, structure_index)
+    print(f"{len(prescreen)} terms, {args.fields} fields: compiled in {build_ms:.0f}ms")
+
+    compiled_ms, linear_ms, mismatches = [], [], 0
+    for i, question in enumerate(questions):
+        words = question_words(question)
+        (matched, scores), elapsed = timed(prescreen.match, words, accessible_fields)
+        compiled_ms.append(elapsed)
+        if i < args.linear_questions:
+            (expected_matched, expected_scores), elapsed = timed(linear_scan, structure_index, words, accessible_fields)
+            linear_ms.append(elapsed)
+            mismatches += matched != expected_matched or scores != expected_scores
+
+    for name, values in (("compiled", compiled_ms), ("linear scan", linear_ms)):
+        print(f"{name:<12} p50 {percentile(values, 50):8.3f}ms  p95 {percentile(values, 95):8.3f}ms  ({len(values)} questions)")
+    print(f"Speed-up (p50): {percentile(linear_ms, 50) / percentile(compiled_ms, 50):.0f}x")
+    print(f"Results identical to the linear scan: {'yes' if not mismatches else f'no ({mismatches} questions differ)'}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Retrieval quality and latency of the cross-encoder reranker.
+
+Chunks the DOCX/PDF samples in Documents/ like the knowledge base build, embeds them with
+the production embedding model (TOGETHER_API_KEY is required) and answers a fixed question
+set (benchmarks/reranker_questions.json). For every question the top --candidates chunks of
+the vector search are reranked; a chunk counts as relevant if it comes from the expected
+document and contains one of the expected phrases.
+
+Reported for vector order vs. reranked order: hit@1, hit@3, hit@top-n and MRR over the top-n
+chunks passed to the answer. Reranking latency (p50/p95) is reported for a cold score cache
+and for a second pass over the same questions (warm cache), and the number of fallbacks to
+vector order under the configured latency budget.
+
+Usage:
+    python benchmarks/bench_reranker.py [--documents Documents] [--candidates 18] [--top-n 7] [--budget-ms 1500]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_community.vectorstores import FAISS  # noqa: E402
+
+import llm  # noqa: E402
+from llm_clients import get_embeddings  # noqa: E402
+from reranker import CrossEncoderReranker  # noqa: E402
+from retrieval import batched_search  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_QUESTIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reranker_questions.json")
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def is_relevant(doc, case) -> bool:
+    if os.path.basename(doc.metadata.get("source", "")) != case["source"]:
+        return False
+    content = doc.page_content.lower()
+    return any(phrase.lower() in content for phrase in case["expected"])
+
+
+def rank_metrics(docs, case, top_n) -> dict:
+    rank = next((i + 1 for i, doc in enumerate(docs[:top_n]) if is_relevant(doc, case)), None)
+    return {
+        "hit@1": rank == 1,
+        "hit@3": rank is not None and rank <= 3,
+        f"hit@{top_n}": rank is not None,
+        "mrr": 1.0 / rank if rank else 0.0,
+    }
+
+
+def build_store(documents_path, embeddings):
+    chunks = []
+    for directory, _, files in os.walk(documents_path):
+        for name in sorted(files):
+            if name.lower().endswith((".docx", ".pdf")):
+                start = time.perf_counter()
+                document_chunks = llm._chunk_knowledge_document(os.path.join(directory, name))
+                print(f"  {name}: {len(document_chunks)} chunks ({time.perf_counter() - start:.1f}s)")
+                chunks.extend(document_chunks)
+    if not chunks:
+        raise SystemExit(f"No DOCX/PDF documents found in {documents_path}")
+    start = time.perf_counter()
+    store = FAISS.from_documents(chunks, embeddings)
+    print(f"Embedded {len(chunks)} chunks in {time.perf_counter() - start:.1f}s")
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", default=os.path.join(ROOT, "Documents"))
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS)
+    parser.add_argument("--candidates", type=int, default=18, help="Chunks from the vector search passed to the reranker")
+    parser.add_argument("--top-n", type=int, default=7, help="Chunks kept for the answer")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Latency budget (default RERANKER_LATENCY_BUDGET_MS)")
+    args = parser.parse_args()
+
+    with open(args.questions, "r", encoding="utf-8") as f:
+        cases = json.load(f)
+    embeddings = get_embeddings(llm.EMBEDDING_MODEL)
+    print(f"Chunking and embedding {args.documents}...")
+    store = build_store(args.documents, embeddings)
+
+    reranker = CrossEncoderReranker()
+    if not reranker.enabled:
+        raise SystemExit("Reranker is disabled or sentence-transformers is not installed")
+    load_start = time.perf_counter()
+    reranker.warm_up().result()
+    if not reranker.is_ready():
+        raise SystemExit(f"Reranker model could not be loaded: {reranker.get_statistics()['load_error']}")
+    print(f"Reranker model loaded in {time.perf_counter() - load_start:.1f}s\n")
+
+    candidates = {}
+    for case in cases:
+        results, errors, _ = asyncio.run(batched_search({"docs": store}, [case["question"]], embeddings, k=args.candidates))
+        if errors:
+            raise SystemExit(f"Search failed: {errors['docs']}")
+        candidates[case["question"]] = results["docs"]
+
+    totals = {"vector": [], "reranked": []}
+    latencies = {"cold": [], "warm": []}
+    fallbacks = 0
+    for case in cases:
+        scored_docs = candidates[case["question"]]
+        ranked, _ = reranker.rerank(case["question"], scored_docs, args.top_n, latency_budget_ms=float("inf"))
+        totals["vector"].append(rank_metrics([doc for doc, _ in scored_docs], case, args.top_n))
+        totals["reranked"].append(rank_metrics([doc for doc, _ in ranked], case, args.top_n))
+    # Latency under the configured budget: cold (cache cleared), then warm (same questions again)
+    reranker._cache.clear()
+    for phase in ("cold", "warm"):
+        for case in cases:
+            _, info = reranker.rerank(case["question"], candidates[case["question"]], args.top_n, latency_budget_ms=args.budget_ms)
+            latencies[phase].append(info["seconds"] * 1000)
+            fallbacks += not info["reranked"]
+
+    metric_names = list(totals["vector"][0])
+    print(f"{len(cases)} questions, {args.candidates} candidates, top {args.top_n}")
+    print(f"{'':<10}" + "".join(f"{name:>9}" for name in metric_names))
+    for order, rows in totals.items():
+        print(f"{order:<10}" + "".join(f"{statistics.mean(float(row[name]) for row in rows):>9.2f}" for name in metric_names))
+    for phase, values in latencies.items():
+        print(f"Rerank latency ({phase} cache): p50 {percentile(values, 50):.0f}ms, p95 {percentile(values, 95):.0f}ms")
+    budget = reranker.latency_budget_ms if args.budget_ms is None else args.budget_ms
+    print(f"Fallbacks to vector order (budget {budget:.0f}ms): {fallbacks} of {2 * len(cases)}")
+
+
+if __name__ == "__main__":
+    main()
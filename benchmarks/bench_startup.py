@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Startup profile of the backend.
+
+For each module, imports it in a fresh interpreter with `python -X importtime` and reports the
+wall-clock import time plus the imports with the largest cumulative time. With --health, the
+server is also started with uvicorn, and the time until /health first answers with HTTP 200 is
+measured.
+
+--max-import-seconds turns the run into a timing test: the exit code is 1 if any module takes
+longer to import (e.g. to catch a heavy import that slipped back to module level).
+
+Usage:
+    python benchmarks/bench_startup.py [--modules security llm api] [--top 15] [--health] [--max-import-seconds 3]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\| (.*)$")
+
+
+def profile_import(module: str, top: int) -> float:
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        print(f"  import {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+        return elapsed
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            entries.append((int(match.group(2)), int(match.group(1)), match.group(3)))
+    # Only top-level packages, so the cumulative times do not count the same work twice
+    top_level = sorted((entry for entry in entries if not entry[2].startswith(" ")), reverse=True)
+    print(f"\nimport {module}: {elapsed:.2f}s wall clock (interpreter start included), {len(entries)} modules")
+    print(f"  {'cumulative':>11}{'self':>9}  module")
+    for cumulative, self_time, name in top_level[:top]:
+        print(f"  {cumulative / 1e6:>10.3f}s{self_time / 1e6:>8.3f}s  {name.strip()}")
+    return elapsed
+
+
+def time_to_healthy(port: int, timeout: float) -> float:
+    url = f"http://127.0.0.1:{port}/health"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited with code {server.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=2) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError, OSError):
+                pass
+            time.sleep(0.05)
+        raise TimeoutError(f"/health did not answer with 200 within {timeout:.0f}s")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=["security", "llm", "api"])
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest imports to show per module")
+    parser.add_argument("--health", action="store_true", help="Also measure time to the first healthy /health")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--max-import-seconds", type=float, default=None, help="Fail if a module import takes longer")
+    args = parser.parse_args()
+
+    slow = []
+    for module in args.modules:
+        elapsed = profile_import(module, args.top)
+        if args.max_import_seconds is not None and elapsed > args.max_import_seconds:
+            slow.append(f"{module} ({elapsed:.2f}s)")
+
+    if args.health:
+        try:
+            print(f"\nTime to first healthy /health: {time_to_healthy(args.port, args.timeout):.2f}s")
+        except Exception as e:
+            print(f"\nCould not measure /health: {e}")
+
+    if slow:
+        print(f"\nFAILED: import slower than {args.max_import_seconds:.2f}s: {', '.join(slow)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Size and load time of the document structure index: indented JSON (previous format) vs. the
+compact msgpack format of structure_index_store.
+
+Builds a synthetic index the way create_document_structure_index does (terms added per document
+with their lower-cased aliases) for --fields knowledge fields with --documents documents each,
+writes it in both formats and loads each file --repeats times. The msgpack file is checked to
+load back to the same index as the JSON file.
+
+Usage:
+    python benchmarks/bench_structure_index.py [--fields 50] [--documents 20] [--repeats 5]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import structure_index_store  # noqa: E402
+
+WORDS = ["Planung", "Kostenstelle", "Personal", "Bericht", "Vertrag", "Urlaub", "Datenschutz", "Antrag", "Lohn",
+         "Abrechnung", "Budget", "Konto", "Report", "Dashboard", "Schnittstelle", "Import", "Export", "Benutzer",
+         "Rolle", "Berechtigung", "Workflow", "Freigabe", "Forecast", "Szenario", "Version", "Periode", "Dimension",
+         "Hierarchie", "Modell", "Formel", "Tabelle", "Ansicht", "Filter", "Kennzahl", "Plan", "Ist", "Abweichung"]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def phrase(rng, words) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)) + ("" if rng.random() < 0.7 else f" {rng.randint(1, 999)}")
+
+
+def add_term(entries: dict, term: str, field: str):
+    """Same insertion and aliasing as create_document_structure_index."""
+    if term not in entries:
+        entries[term] = []
+    entries[term].append(field)
+    entries[term.lower()] = entries[term]
+
+
+def synthetic_index(fields: int, documents: int, rng) -> dict:
+    index = {"topics": {}, "processes": {}, "search_terms": {}, "headings": {}, "filenames": {}, "field_stats": {}}
+    for f in range(fields):
+        field = f"Wissensgebiet {f + 1:02d}"
+        main_topics = set()
+        for d in range(documents):
+            filename = f"{phrase(rng, 2)} {f}_{d}.docx"
+            for name in (filename, os.path.splitext(filename)[0]):
+                index["filenames"].setdefault(name, []).append(field)
+            for _ in range(12):
+                topic = phrase(rng, 2)
+                add_term(index["topics"], topic, field)
+                main_topics.add(topic)
+            for _ in range(8):
+                add_term(index["processes"], phrase(rng, 3), field)
+            for _ in range(25):
+                add_term(index["search_terms"], phrase(rng, 1), field)
+            for _ in range(60):
+                add_term(index["headings"], f"{rng.randint(1, 12)}.{rng.randint(1, 20)} {phrase(rng, 3)}", field)
+        index["field_stats"][field] = {"doc_count": documents, "total_chunks": documents * 40, "main_topics": sorted(main_topics)}
+    return index
+
+
+def timed_loads(load, repeats: int) -> tuple:
+    times, result = [], None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = load()
+        times.append((time.perf_counter() - start) * 1000)
+    return result, times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fields", type=int, default=50)
+    parser.add_argument("--documents", type=int, default=20, help="Documents per knowledge field")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    if not structure_index_store.MSGPACK_AVAILABLE:
+        raise SystemExit("msgpack is not installed")
+
+    index = synthetic_index(args.fields, args.documents, random.Random(args.seed))
+    terms = sum(len(index[category]) for category in structure_index_store.TERM_CATEGORIES)
+    print(f"Synthetic structure index: {args.fields} fields x {args.documents} documents, {terms} terms (incl. aliases)")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        json_path = os.path.join(workdir, "document_structure_index.json")
+        binary_path = os.path.join(workdir, "document_structure_index.msgpack")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+        json_size = os.path.getsize(json_path)
+
+        def load_json():
+            with open(json_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        expected, json_ms = timed_loads(load_json, args.repeats)
+        start = time.perf_counter()
+        structure_index_store.save_structure_index(index, binary_path, os.path.join(workdir, "unused.json"))
+        save_ms = (time.perf_counter() - start) * 1000
+        binary_size = os.path.getsize(binary_path)
+        loaded, binary_ms = timed_loads(lambda: structure_index_store.load_structure_index(binary_path, json_path)[0], args.repeats)
+
+    print(f"{'format':<22}{'size':>10}{'load p50':>12}{'load max':>12}")
+    for name, size, times in (("JSON (indent=2)", json_size, json_ms), ("msgpack (compact)", binary_size, binary_ms)):
+        print(f"{name:<22}{size / (1024 * 1024):>8.2f}MB{percentile(times, 50):>10.1f}ms{max(times):>10.1f}ms")
+    print(f"Size: {binary_size / json_size:.0%} of JSON, load speed-up (p50): {percentile(json_ms, 50) / percentile(binary_ms, 50):.1f}x, msgpack write {save_ms:.0f}ms")
+    identical = loaded == expected
+    print(f"msgpack index identical to JSON index: {'yes' if identical else 'no'}")
+    if not identical:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
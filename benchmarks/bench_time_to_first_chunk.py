@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Time-to-first-chunk benchmark for answer generation.
+
+Compares the old two-pass flow (full non-streaming answer for the follow-up
+questions, then the same answer again as a stream) with the single-pass
+stream_answer_with_follow_ups pipeline, and for uploaded-document answers the old
+chain flow (full answer, then re-sliced into 20-character pieces with a 10ms delay)
+with the token stream used now. A fake Together client simulates model latency,
+so no API key is needed.
+
+Usage:
+    python benchmarks/bench_time_to_first_chunk.py [--runs 5] [--tokens 200]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm  # noqa: E402
+
+
+class FakeCompletions:
+    def __init__(self, first_token_latency: float, token_interval: float, tokens: int):
+        self.first_token_latency = first_token_latency
+        self.token_interval = token_interval
+        self.tokens = [f"token{i} " for i in range(tokens)]
+        self.calls = 0
+
+    def create(self, model, messages, temperature, stream=False, timeout=None):
+        self.calls += 1
+        time.sleep(self.first_token_latency)
+        is_follow_up = "follow-up questions" in messages[0]["content"]
+        if is_follow_up:
+            text = '["Was bedeutet das?", "Wie geht es weiter?", "Gibt es Beispiele?"]'
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+        if not stream:
+            time.sleep(self.token_interval * len(self.tokens))
+            text = "".join(self.tokens)
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+        def generate():
+            for token in self.tokens:
+                time.sleep(self.token_interval)
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+        return generate()
+
+
+def make_client(args):
+    completions = FakeCompletions(args.first_token_latency, args.token_interval, args.tokens)
+    return SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+
+async def legacy_two_pass(client, messages, history):
+    """The previous flow: generate the answer, derive follow-ups, then stream it again."""
+    start = time.perf_counter()
+    first_chunk = None
+    temp_response = await asyncio.to_thread(llm.robust_api_call, client, llm.LLM_MODEL, messages, 0.0, stream=False)
+    temp_answer = temp_response.choices[0].message.content.strip()
+    await asyncio.to_thread(llm.generate_follow_up_questions, client, history, temp_answer, "")
+    stream = llm.robust_api_call(client, llm.LLM_MODEL, messages, 0.0, stream=True)
+    for chunk in stream:
+        if first_chunk is None and chunk.choices[0].delta.content:
+            first_chunk = time.perf_counter() - start
+    return first_chunk, time.perf_counter() - start
+
+
+async def single_pass(client, messages, history):
+    start = time.perf_counter()
+    first_chunk = None
+    async for event in llm.stream_answer_with_follow_ups(client, llm.LLM_MODEL, messages, 0.0, history, ""):
+        if first_chunk is None and event["type"] == "chunk":
+            first_chunk = time.perf_counter() - start
+    return first_chunk, time.perf_counter() - start
+
+
+async def document_fake_streaming(client, messages, history):
+    """The previous document RAG flow: wait for the whole answer, then slice it with an artificial delay."""
+    start = time.perf_counter()
+    first_chunk = None
+    response = await asyncio.to_thread(llm.robust_api_call, client, llm.LLM_MODEL, messages, 0.0, stream=False)
+    answer = response.choices[0].message.content
+    for i in range(0, len(answer), 20):
+        if first_chunk is None:
+            first_chunk = time.perf_counter() - start
+        await asyncio.sleep(0.01)
+    return first_chunk, time.perf_counter() - start
+
+
+async def document_streaming(client, messages, history):
+    start = time.perf_counter()
+    first_chunk = None
+    async for chunk in llm.async_stream_completion(client, llm.LLM_MODEL, messages, 0.0):
+        if first_chunk is None and chunk.choices[0].delta.content:
+            first_chunk = time.perf_counter() - start
+    return first_chunk, time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--first-token-latency", type=float, default=0.4)
+    parser.add_argument("--token-interval", type=float, default=0.01)
+    args = parser.parse_args()
+
+    history = [{"role": "user", "content": "Was ist ein Ermittlungstyp in 4PLAN?"}]
+    messages = llm.create_contextual_messages(history, "You are a helpful assistant.")
+
+    results = {}
+    flows = (
+        ("two-pass (before)", legacy_two_pass),
+        ("single-pass (after)", single_pass),
+        ("document, sliced (before)", document_fake_streaming),
+        ("document, streamed (after)", document_streaming),
+    )
+    for name, flow in flows:
+        ttfc, totals, calls = [], [], []
+        for _ in range(args.runs):
+            client = make_client(args)
+            first_chunk, total = await flow(client, messages, history)
+            ttfc.append(first_chunk)
+            totals.append(total)
+            calls.append(client.chat.completions.calls)
+        results[name] = (statistics.median(ttfc), statistics.median(totals), statistics.median(calls))
+
+    print(f"{'flow':<28}{'TTFC p50 (s)':>14}{'total p50 (s)':>15}{'LLM calls':>11}")
+    for name, (ttfc, total, calls) in results.items():
+        print(f"{name:<28}{ttfc:>14.3f}{total:>15.3f}{calls:>11.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
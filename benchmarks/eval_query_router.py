@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Offline evaluation (and training) of the local query router.
+
+Loads logged questions from ChatQuestionLog, labels them with the LLM router
+(labels are cached in a JSON file so the LLM is only asked once per question),
+trains the nearest-centroid model on a training split and reports on the test split:
+
+  - accuracy of the local router against the LLM labels (on the questions it decides itself)
+  - coverage: share of questions decided locally without the LLM
+  - end-to-end accuracy with LLM fallback
+  - p50/p95 routing latency, local vs. LLM
+  - accuracy/coverage for a range of confidence margins
+
+Before that, the keyword rules are checked against the fixed cases in
+benchmarks/query_router_rule_cases.json (expected label, or null where the rules must leave
+the question to the next stages - e.g. commands that only mention an image).
+
+With --save the model is retrained on all labelled questions and written to
+QUERY_ROUTER_MODEL_PATH using the margin that reaches --target-accuracy.
+
+Usage:
+    python benchmarks/eval_query_router.py [--limit 2000] [--test-ratio 0.3] [--save]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+import llm  # noqa: E402
+from database import SessionLocal, ChatQuestionLog  # noqa: E402
+from llm_clients import get_together_client, get_embeddings  # noqa: E402
+from query_router import LocalQueryRouter, QUERY_ROUTER_MODEL_PATH, ROUTE_LABELS, classify_with_rules, MIN_QUESTION_WORDS  # noqa: E402
+
+DEFAULT_LABELS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "query_router_labels.json")
+DEFAULT_RULE_CASES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "query_router_rule_cases.json")
+MARGINS = [0.0, 0.01, 0.02, 0.03, 0.04, 0.05, 0.075, 0.1]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def load_questions(limit: int) -> list:
+    db = SessionLocal()
+    try:
+        rows = db.query(ChatQuestionLog.question_text).order_by(ChatQuestionLog.timestamp.desc()).limit(limit).all()
+    finally:
+        db.close()
+    seen, questions = set(), []
+    for (text,) in rows:
+        text = (text or "").strip()
+        if text and text not in seen:
+            seen.add(text)
+            questions.append(text)
+    return questions
+
+
+def label_with_llm(questions: list, labels_path: str) -> tuple[dict, list]:
+    """Returns {question: label} (cached on disk) and the LLM latencies measured in this run."""
+    labels = {}
+    if os.path.exists(labels_path):
+        with open(labels_path, "r", encoding="utf-8") as f:
+            labels = json.load(f)
+    client = get_together_client()
+    latencies = []
+    missing = [q for q in questions if q not in labels]
+    for i, question in enumerate(missing, 1):
+        start = time.perf_counter()
+        labels[question] = llm.route_query_with_llm(client, [{"role": "user", "content": question}])
+        latencies.append(time.perf_counter() - start)
+        if i % 25 == 0 or i == len(missing):
+            print(f"  labelled {i}/{len(missing)} questions with the LLM router")
+            with open(labels_path, "w", encoding="utf-8") as f:
+                json.dump(labels, f, ensure_ascii=False, indent=1)
+    return labels, latencies
+
+
+def check_rule_cases(path: str) -> int:
+    """Prints the rule cases whose outcome differs from the expected one; returns their number."""
+    with open(path, "r", encoding="utf-8") as f:
+        cases = json.load(f)
+    wrong = 0
+    for case in cases:
+        predicted, reason = classify_with_rules(case["question"])
+        if predicted != case["expected"]:
+            wrong += 1
+            print(f"  rule mismatch: {case['question']!r} -> {predicted} ({reason}), expected {case['expected']}")
+    print(f"Keyword rules: {len(cases) - wrong}/{len(cases)} fixed cases as expected")
+    return wrong
+
+
+def evaluate(router: LocalQueryRouter, questions: list, labels: list, embeddings: np.ndarray, margin: float) -> dict:
+    decided, correct = 0, 0
+    for question, label, embedding in zip(questions, labels, embeddings):
+        predicted, reason = classify_with_rules(question)
+        if predicted is None and reason is None and len(question.split()) >= MIN_QUESTION_WORDS:
+            predicted, score = router.score(embedding)
+            if score < margin:
+                predicted = None
+        if predicted is not None:
+            decided += 1
+            correct += predicted == label
+    total = len(questions) or 1
+    return {
+        "accuracy": correct / decided if decided else 0.0,
+        "coverage": decided / total,
+        "end_to_end": (correct + (len(questions) - decided)) / total,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=2000, help="Maximum number of logged questions to use")
+    parser.add_argument("--test-ratio", type=float, default=0.3)
+    parser.add_argument("--labels", default=DEFAULT_LABELS_PATH, help="Cache file for LLM labels")
+    parser.add_argument("--rule-cases", default=DEFAULT_RULE_CASES_PATH, help="Fixed cases for the keyword rules")
+    parser.add_argument("--target-accuracy", type=float, default=0.95, help="Accuracy the saved margin must reach")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", action="store_true", help=f"Train on all questions and save to {QUERY_ROUTER_MODEL_PATH}")
+    args = parser.parse_args()
+
+    check_rule_cases(args.rule_cases)
+    questions = load_questions(args.limit)
+    if len(questions) < 20:
+        print(f"Only {len(questions)} logged questions found - not enough to evaluate.")
+        return
+    print(f"{len(questions)} distinct logged questions")
+
+    label_map, llm_latencies = label_with_llm(questions, args.labels)
+    labels = [label_map[q] for q in questions]
+    print("Label distribution: " + ", ".join(f"{label} {labels.count(label)}" for label in ROUTE_LABELS))
+
+    embeddings_model = get_embeddings(llm.EMBEDDING_MODEL)
+    router = LocalQueryRouter(embed_fn=embeddings_model.embed_query, embedding_model=llm.EMBEDDING_MODEL)
+    print("Embedding questions...")
+    embeddings = np.array(embeddings_model.embed_documents(questions), dtype=np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    indices = list(range(len(questions)))
+    random.Random(args.seed).shuffle(indices)
+    split = int(len(indices) * (1 - args.test_ratio))
+    train, test = indices[:split], indices[split:]
+    router.fit([questions[i] for i in train], [labels[i] for i in train], embeddings[train])
+
+    test_questions = [questions[i] for i in test]
+    test_labels = [labels[i] for i in test]
+    print(f"\nTrain {len(train)} / test {len(test)} questions")
+    print(f"{'margin':>8}{'accuracy':>10}{'coverage':>10}{'end-to-end':>12}")
+    chosen_margin = None
+    for margin in MARGINS:
+        result = evaluate(router, test_questions, test_labels, embeddings[test], margin)
+        print(f"{margin:>8.3f}{result['accuracy']:>10.3f}{result['coverage']:>10.3f}{result['end_to_end']:>12.3f}")
+        if chosen_margin is None and result["accuracy"] >= args.target_accuracy:
+            chosen_margin = margin
+    if chosen_margin is None:
+        chosen_margin = MARGINS[-1]
+    print(f"Margin for target accuracy {args.target_accuracy:.2f}: {chosen_margin:.3f}")
+
+    # Latency: the local router embeds the question (one embedding request); the LLM router
+    # needs a full completion. Measured on a sample of the test questions.
+    router.min_margin = chosen_margin
+    local_latencies = []
+    for question in test_questions[:50]:
+        start = time.perf_counter()
+        router.classify(question)
+        local_latencies.append(time.perf_counter() - start)
+    if not llm_latencies:
+        client = get_together_client()
+        for question in test_questions[:20]:
+            start = time.perf_counter()
+            llm.route_query_with_llm(client, [{"role": "user", "content": question}])
+            llm_latencies.append(time.perf_counter() - start)
+    print("\nRouting latency")
+    print(f"  local router: p50 {statistics.median(local_latencies) * 1000:.0f}ms, p95 {percentile(local_latencies, 95) * 1000:.0f}ms")
+    print(f"  LLM router:   p50 {statistics.median(llm_latencies) * 1000:.0f}ms, p95 {percentile(llm_latencies, 95) * 1000:.0f}ms")
+
+    if args.save:
+        router.fit(questions, labels, embeddings)
+        router.save(QUERY_ROUTER_MODEL_PATH, trained_on=len(questions))
+        print(f"\nSaved local query router ({len(questions)} questions, margin {chosen_margin:.3f}) to {QUERY_ROUTER_MODEL_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Calibration of the semantic prescreen thresholds RETRIEVAL_LOW_SIMILARITY and
+RETRIEVAL_HIGH_SIMILARITY.
+
+Chunks the DOCX/PDF samples in Documents/ like the knowledge base build, embeds them with
+the production embedding model (TOGETHER_API_KEY is required) and searches the index with
+two question sets: the in-domain questions of benchmarks/reranker_questions.json (answerable
+from Documents/) and the off-topic questions of benchmarks/retrieval_offtopic_questions.json
+(general questions the knowledge base cannot answer). The best chunk similarity of every
+question is what the prescreen compares with the thresholds.
+
+Reported:
+- whether the index vectors are unit-length (the cosine conversion of retrieval.py relies on it)
+- the best-chunk similarity distribution of both sets (min/p10/p50/p90/max)
+- for candidate thresholds: the share of in-domain questions a "low" decision would suppress
+  (without the keyword guard) and the share of off-topic questions it would let through, and
+  the share of in-domain questions a "high" decision would answer without query expansion and
+  of off-topic questions it would wrongly accept
+- a suggested low threshold (the highest one suppressing no in-domain question) and high
+  threshold (the lowest one accepting no off-topic question), next to the configured values
+
+Usage:
+    python benchmarks/eval_retrieval_thresholds.py [--documents Documents] [--questions ...]
+        [--offtopic ...] [--k 25] [--step 0.01]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm  # noqa: E402
+from llm_clients import get_embeddings  # noqa: E402
+from retrieval import embed_queries, has_unit_vectors, reconstruct_vectors, search_store  # noqa: E402
+
+from bench_reranker import build_store, is_relevant  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def load_questions(path: str) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def best_scores(store, embeddings, cases: list, k: int) -> list:
+    """Best chunk similarity and the hit list of every question (one embedding request per set)."""
+    query_vectors = embed_queries(embeddings, [case["question"] for case in cases])
+    per_query = search_store(store, query_vectors, k)
+    return [(max((score for _, score in hits), default=0.0), hits) for hits in per_query]
+
+
+def share(values, predicate) -> float:
+    return sum(1 for value in values if predicate(value)) / len(values) if values else 0.0
+
+
+def describe(name: str, scores: list) -> str:
+    return (f"{name:<12}{len(scores):>4} questions  min {min(scores):.3f}  p10 {percentile(scores, 10):.3f}  "
+            f"p50 {percentile(scores, 50):.3f}  p90 {percentile(scores, 90):.3f}  max {max(scores):.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", default=os.path.join(ROOT, "Documents"))
+    parser.add_argument("--questions", default=os.path.join(HERE, "reranker_questions.json"))
+    parser.add_argument("--offtopic", default=os.path.join(HERE, "retrieval_offtopic_questions.json"))
+    parser.add_argument("--k", type=int, default=llm.PRESCREEN_K, help="Hits per question, as in the prescreen")
+    parser.add_argument("--step", type=float, default=0.01, help="Spacing of the candidate thresholds")
+    args = parser.parse_args()
+
+    in_domain_cases = load_questions(args.questions)
+    offtopic_cases = load_questions(args.offtopic)
+    embeddings = get_embeddings(llm.EMBEDDING_MODEL)
+    print(f"Chunking and embedding {args.documents}...")
+    store = build_store(args.documents, embeddings)
+
+    sample = list(range(min(store.index.ntotal, 256)))
+    norms = np.linalg.norm(reconstruct_vectors(store, sample), axis=1)
+    print(f"\nIndex vector norms: min {norms.min():.4f}, max {norms.max():.4f} "
+          f"(unit-length: {'yes' if has_unit_vectors(store) else 'no, similarities use the stored norms'})")
+
+    in_domain = best_scores(store, embeddings, in_domain_cases, args.k)
+    offtopic = [score for score, _ in best_scores(store, embeddings, offtopic_cases, args.k)]
+    found = [any(is_relevant(doc, case) for doc, _ in hits) for case, (_, hits) in zip(in_domain_cases, in_domain)]
+    in_domain = [score for score, _ in in_domain]
+    print(f"Relevant chunk among the top {args.k} for {sum(found)}/{len(found)} in-domain questions\n")
+    print(describe("in-domain", in_domain))
+    print(describe("off-topic", offtopic))
+
+    low_start = np.floor(min(in_domain + offtopic) / args.step) * args.step
+    high_end = np.ceil(max(in_domain + offtopic) / args.step) * args.step
+    candidates = np.round(np.arange(low_start, high_end + args.step / 2, args.step), 4)
+    print(f"\n{'threshold':>10}{'low: in-domain suppressed':>28}{'off-topic passed':>18}"
+          f"{'high: in-domain':>17}{'off-topic':>11}")
+    for threshold in candidates:
+        print(f"{threshold:>10.2f}{share(in_domain, lambda s: s < threshold):>28.0%}{share(offtopic, lambda s: s >= threshold):>18.0%}"
+              f"{share(in_domain, lambda s: s >= threshold):>17.0%}{share(offtopic, lambda s: s >= threshold):>11.0%}")
+
+    suggested_low = max((t for t in candidates if share(in_domain, lambda s: s < t) == 0), default=None)
+    suggested_high = min((t for t in candidates if share(offtopic, lambda s: s >= t) == 0), default=None)
+    print(f"\nConfigured: RETRIEVAL_LOW_SIMILARITY={llm.RETRIEVAL_LOW_SIMILARITY:.2f}, RETRIEVAL_HIGH_SIMILARITY={llm.RETRIEVAL_HIGH_SIMILARITY:.2f}")
+    print(f"Suggested:  RETRIEVAL_LOW_SIMILARITY={suggested_low:.2f}, RETRIEVAL_HIGH_SIMILARITY={suggested_high:.2f}"
+          if suggested_low is not None and suggested_high is not None else "Suggested:  no separating thresholds on this grid")
+    if suggested_low is not None and suggested_high is not None and suggested_low > suggested_high:
+        print("The sets do not overlap: any threshold between the suggested values separates them")
+
+
+if __name__ == "__main__":
+    main()
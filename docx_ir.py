@@ -0,0 +1,77 @@
+"""
+Single-pass intermediate representation of a DOCX document.
+
+A knowledge base rebuild needs two views of every DOCX: the paragraph blocks between headings
+(for chunking) and the heading tree (for the document structure index). Both are built here
+from one python-docx walk over the paragraphs, so the file is opened and parsed only once;
+smart_chunk_document, process_docx_with_headings and extract_document_headings work on the
+result.
+
+- headings: [{"level", "heading", "breadcrumb"}, ...] for every heading with text, in document order
+- blocks:   [{"heading_context", "heading_level", "paragraphs"}, ...], one block per heading
+            section; heading_context is the breadcrumb of the enclosing headings and
+            paragraphs are the non-empty body paragraphs of the section
+"""
+from dataclasses import dataclass, field
+
+MAX_HEADING_LEVEL = 6
+
+
+@dataclass
+class DocxIR:
+    file_path: str
+    headings: list = field(default_factory=list)
+    blocks: list = field(default_factory=list)
+
+    def content_blocks(self) -> list:
+        """Blocks with text, as {"content", "heading_context"} (the paragraphs joined by newlines)."""
+        blocks = []
+        for block in self.blocks:
+            content = "\n".join(block["paragraphs"]).strip()
+            if content:
+                blocks.append({"content": content, "heading_context": block["heading_context"]})
+        return blocks
+
+
+def _heading_level(style_name: str):
+    """Level of a "Heading N" paragraph style, or None if the style has no valid level."""
+    try:
+        level = int(style_name.split(' ')[-1])
+    except ValueError:
+        return None
+    return level if 1 <= level <= MAX_HEADING_LEVEL else None
+
+
+def parse_docx(file_path: str) -> DocxIR:
+    """Walks the paragraphs of a DOCX once and returns its heading tree and paragraph blocks."""
+    import docx
+    doc = docx.Document(file_path)
+    ir = DocxIR(file_path)
+    current_headings = [""] * MAX_HEADING_LEVEL
+    block = {"heading_context": "", "heading_level": 0, "paragraphs": []}
+
+    for para in doc.paragraphs:
+        if para.style.name.startswith('Heading'):
+            # Every heading paragraph closes the current block
+            if block["paragraphs"]:
+                ir.blocks.append(block)
+            level = _heading_level(para.style.name)
+            if level is not None:
+                text = para.text.strip()
+                current_headings[level - 1] = text
+                for i in range(level, MAX_HEADING_LEVEL):
+                    current_headings[i] = ""
+                breadcrumb = " > ".join(h for h in current_headings if h)
+                if text:
+                    ir.headings.append({"level": level, "heading": text, "breadcrumb": breadcrumb})
+            block = {
+                "heading_context": " > ".join(h for h in current_headings if h),
+                "heading_level": len([h for h in current_headings if h]),
+                "paragraphs": [],
+            }
+        elif para.text.strip():
+            block["paragraphs"].append(para.text)
+
+    if block["paragraphs"]:
+        ir.blocks.append(block)
+    return ir
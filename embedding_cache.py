@@ -0,0 +1,146 @@
+"""
+Persistent, content-addressed embedding cache.
+
+Embeddings are stored in SQLite keyed by (embedding model, sha256 of the text), so a chunk
+that was embedded before - in an earlier knowledge base build or another upload - never
+costs another embedding API call. The cache is bounded in size; the least recently used
+vectors are evicted first.
+
+Environment variables:
+    EMBEDDING_CACHE_ENABLED   - "true"/"false" (default true)
+    EMBEDDING_CACHE_PATH      - SQLite file (default embedding_cache.sqlite next to this module)
+    EMBEDDING_CACHE_MAX_MB    - maximum size of the stored vectors in MB (default 1024)
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(SCRIPT_DIR, "embedding_cache.sqlite"))
+EMBEDDING_CACHE_MAX_BYTES = int(float(os.getenv("EMBEDDING_CACHE_MAX_MB", "1024")) * 1024 * 1024)
+# After an eviction the cache is shrunk to this share of the maximum, so eviction does not run on every insert
+EVICTION_TARGET_RATIO = 0.9
+SQLITE_BATCH_SIZE = 500  # Stays below SQLite's limit for query parameters
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Thread-safe SQLite embedding store with hit statistics and size-bounded LRU eviction."""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_bytes: int = EMBEDDING_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._connection = None
+        self._size_bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (model, sha256)
+                )
+            """)
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+            self._size_bytes = connection.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+            self._connection = connection
+        return self._connection
+
+    def get_many(self, model: str, texts: list) -> list:
+        """Returns a list with the cached embedding (list of floats) or None for every text."""
+        hashes = [text_sha256(text) for text in texts]
+        found = {}
+        with self._lock:
+            connection = self._connect()
+            unique_hashes = list(dict.fromkeys(hashes))
+            for i in range(0, len(unique_hashes), SQLITE_BATCH_SIZE):
+                batch = unique_hashes[i:i + SQLITE_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = connection.execute(
+                    f"SELECT sha256, vector FROM embeddings WHERE model = ? AND sha256 IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+                for sha256, blob in rows:
+                    found[sha256] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                now = time.time()
+                connection.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND sha256 = ?",
+                    [(now, model, sha256) for sha256 in found],
+                )
+                connection.commit()
+            results = [found.get(sha256) for sha256 in hashes]
+            hits = sum(1 for result in results if result is not None)
+            self._stats["hits"] += hits
+            self._stats["misses"] += len(results) - hits
+        return results
+
+    def put_many(self, model: str, texts: list, vectors: list):
+        """Stores embeddings for texts and evicts old entries if the cache is too large."""
+        now = time.time()
+        rows = [(model, text_sha256(text), np.asarray(vector, dtype=np.float32).tobytes(), now) for text, vector in zip(texts, vectors)]
+        if not rows:
+            return
+        with self._lock:
+            connection = self._connect()
+            before = connection.total_changes
+            connection.executemany("INSERT OR IGNORE INTO embeddings (model, sha256, vector, last_used) VALUES (?, ?, ?, ?)", rows)
+            connection.commit()
+            inserted = connection.total_changes - before
+            if inserted:
+                self._size_bytes += inserted * len(rows[0][2])
+                self._stats["stores"] += inserted
+            if self._size_bytes > self.max_bytes:
+                self._evict(connection)
+
+    def _evict(self, connection: sqlite3.Connection):
+        target = int(self.max_bytes * EVICTION_TARGET_RATIO)
+        while self._size_bytes > target:
+            rows = connection.execute(
+                "SELECT rowid, LENGTH(vector) FROM embeddings ORDER BY last_used ASC LIMIT ?", (SQLITE_BATCH_SIZE,)
+            ).fetchall()
+            if not rows:
+                self._size_bytes = 0
+                break
+            removed = []
+            for rowid, size in rows:
+                removed.append((rowid,))
+                self._size_bytes -= size
+                if self._size_bytes <= target:
+                    break
+            connection.executemany("DELETE FROM embeddings WHERE rowid = ?", removed)
+            self._stats["evictions"] += len(removed)
+        connection.commit()
+
+    def get_statistics(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "enabled": EMBEDDING_CACHE_ENABLED,
+                "size_mb": round(self._size_bytes / (1024 * 1024), 2),
+                "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                **self._stats,
+            }
+
+
+embedding_cache = EmbeddingCache()
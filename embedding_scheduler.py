@@ -0,0 +1,182 @@
+"""
+Concurrent, rate-limit-aware scheduling of embedding requests.
+
+Texts are grouped into batches by an estimated token budget instead of a fixed count,
+several batches are kept in flight at once, and rate-limit responses (HTTP 429) are
+retried with exponential backoff. When one request is rate limited, all workers pause
+until the backoff has passed, so the scheduler does not keep hammering the API.
+Completed batches are always reported in order, so progress messages stay sequential.
+
+Environment variables:
+    EMBEDDING_MAX_CONCURRENCY     - batches in flight at the same time (default 4)
+    EMBEDDING_MAX_BATCH_TOKENS    - estimated token budget per request (default 16000)
+    EMBEDDING_MAX_BATCH_SIZE      - maximum number of texts per request (default 128)
+    EMBEDDING_MAX_RETRIES         - retries per batch for rate limits / server errors (default 6)
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+EMBEDDING_MAX_BATCH_TOKENS = int(os.getenv("EMBEDDING_MAX_BATCH_TOKENS", "16000"))
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "128"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "6"))
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+CHARS_PER_TOKEN = 3  # Conservative estimate for German/English text with a multilingual tokenizer
+
+
+@dataclass
+class EmbeddingBatch:
+    number: int         # 1-based batch number
+    total: int          # total number of batches
+    indices: list       # positions of the batch texts in the input list
+    embeddings: list    # one embedding per index
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def plan_batches(texts: list, max_batch_tokens: int = EMBEDDING_MAX_BATCH_TOKENS, max_batch_size: int = EMBEDDING_MAX_BATCH_SIZE) -> list:
+    """Groups text indices into batches that stay within the token budget and the size limit."""
+    batches, current, current_tokens = [], [], 0
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (current_tokens + tokens > max_batch_tokens or len(current) >= max_batch_size):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _status_code(error: Exception):
+    for obj in (error, getattr(error, "response", None)):
+        for attribute in ("status_code", "status"):
+            value = getattr(obj, attribute, None)
+            if isinstance(value, int):
+                return value
+    return None
+
+
+def _retry_after(error: Exception):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable_error(error: Exception) -> bool:
+    status = _status_code(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    message = str(error).lower()
+    return "429" in message or "rate limit" in message or "too many requests" in message
+
+
+class EmbeddingScheduler:
+    """Embeds lists of texts with bounded concurrency, token-budget batching and 429 backoff."""
+
+    def __init__(self, embed_fn, max_concurrency: int = EMBEDDING_MAX_CONCURRENCY, max_batch_tokens: int = EMBEDDING_MAX_BATCH_TOKENS,
+                 max_batch_size: int = EMBEDDING_MAX_BATCH_SIZE, max_retries: int = EMBEDDING_MAX_RETRIES):
+        self.embed_fn = embed_fn
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_retries = max_retries
+        self._pause_until = 0.0
+        self._pause_lock = threading.Lock()
+        self.rate_limited = 0  # Number of 429/5xx responses seen, for reporting
+
+    def _wait_for_pause(self, should_stop):
+        while True:
+            remaining = self._pause_until - time.monotonic()
+            if remaining <= 0 or should_stop():
+                return
+            time.sleep(min(remaining, 0.5))
+
+    def _embed_with_retry(self, texts: list, should_stop=lambda: False) -> list:
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_pause(should_stop)
+            if should_stop():
+                raise RuntimeError("Embedding cancelled")
+            try:
+                return self.embed_fn(texts)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable_error(e):
+                    raise
+                self.rate_limited += 1
+                delay = _retry_after(e) or min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt)
+                delay *= 1 + random.random() * 0.25
+                print(f"Embedding request rate limited or failed ({e}); retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+                with self._pause_lock:
+                    # All workers back off together
+                    self._pause_until = max(self._pause_until, time.monotonic() + delay)
+
+    def iter_batches(self, texts: list, cancellation_check=lambda: False):
+        """
+        Embeds texts and yields an EmbeddingBatch per batch, in batch order, while up to
+        max_concurrency batches are in flight.
+        """
+        batches = plan_batches(texts, self.max_batch_tokens, self.max_batch_size)
+        if not batches:
+            return
+        stop_event = threading.Event()
+
+        def should_stop():
+            return stop_event.is_set() or cancellation_check()
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="embedding") as executor:
+            pending = {}
+            next_to_submit = 0
+            try:
+                for number in range(len(batches)):
+                    # Keep the window of in-flight batches full
+                    while next_to_submit < len(batches) and next_to_submit < number + self.max_concurrency:
+                        indices = batches[next_to_submit]
+                        pending[next_to_submit] = executor.submit(self._embed_with_retry, [texts[i] for i in indices], should_stop)
+                        next_to_submit += 1
+                    embeddings = pending.pop(number).result()
+                    yield EmbeddingBatch(number + 1, len(batches), batches[number], embeddings)
+            finally:
+                stop_event.set()
+                for future in pending.values():
+                    future.cancel()
+
+    async def aiter_batches(self, texts: list, cancellation_check=lambda: False):
+        """Async version of iter_batches; the blocking requests run in worker threads."""
+        batches = plan_batches(texts, self.max_batch_tokens, self.max_batch_size)
+        if not batches:
+            return
+        loop = asyncio.get_running_loop()
+        stop_event = threading.Event()
+
+        def should_stop():
+            return stop_event.is_set() or cancellation_check()
+
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="embedding")
+        pending = {}
+        next_to_submit = 0
+        try:
+            for number in range(len(batches)):
+                while next_to_submit < len(batches) and next_to_submit < number + self.max_concurrency:
+                    indices = batches[next_to_submit]
+                    pending[next_to_submit] = loop.run_in_executor(executor, self._embed_with_retry, [texts[i] for i in indices], should_stop)
+                    next_to_submit += 1
+                embeddings = await pending.pop(number)
+                yield EmbeddingBatch(number + 1, len(batches), batches[number], embeddings)
+        finally:
+            stop_event.set()
+            for future in pending.values():
+                future.cancel()
+                # Nobody awaits these anymore; retrieve their outcome to avoid "never retrieved" warnings
+                future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -374,6 +374,17 @@ function MainContent() {
                     });
                 });
 
+                newSocket.on('answer_follow_ups', (data) => {
+                    setMessages(prev => {
+                        const newMessages = [...prev];
+                        const lastMessage = newMessages[newMessages.length - 1];
+                        if (lastMessage && lastMessage.role === 'assistant' && !isCancellingRef.current) {
+                            lastMessage.follow_ups = data.follow_ups;
+                        }
+                        return newMessages;
+                    });
+                });
+
                 newSocket.on('generation_cancelled', () => {
                     console.log('Generation cancelled event received');
                     setIsCancelling(true);
@@ -0,0 +1,247 @@
+"""
+Background jobs for knowledge base updates.
+
+A knowledge base rebuild parses documents, calls the embedding API and builds FAISS indexes,
+which can take minutes. It runs in a worker thread, so the Socket.IO event loop keeps serving
+all other users in the meantime. Only one rebuild runs at a time; a second request is told
+which job is already running and can follow its progress.
+
+Every job has an ID. Status and progress messages are persisted in a JSON state file, so they
+survive client reconnects; a job that was running when the server stopped is marked
+"interrupted" on the next start. Listeners (e.g. a Socket.IO client) registered for a job
+receive every progress message as it happens.
+
+Environment variables:
+    KB_JOB_STATE_PATH     - JSON file with the job history (default kb_jobs.json next to this module)
+    KB_JOB_HISTORY        - number of jobs kept in the state file (default 20)
+    KB_JOB_MAX_MESSAGES   - progress messages kept per job (default 1000)
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+KB_JOB_STATE_PATH = os.getenv("KB_JOB_STATE_PATH", os.path.join(SCRIPT_DIR, "kb_jobs.json"))
+KB_JOB_HISTORY = int(os.getenv("KB_JOB_HISTORY", "20"))
+KB_JOB_MAX_MESSAGES = int(os.getenv("KB_JOB_MAX_MESSAGES", "1000"))
+SAVE_INTERVAL_SECONDS = 1.0  # Progress is written at most this often while a job runs
+
+ACTIVE_STATES = ("queued", "running", "cancelling")
+
+
+class KnowledgeBaseJobRunning(Exception):
+    """Raised when a rebuild is requested while another one is still running."""
+
+    def __init__(self, job: dict):
+        self.job = job
+        super().__init__(f"Knowledge base job {job['id']} is already running")
+
+
+class KnowledgeBaseJobManager:
+    """Runs knowledge base updates one at a time in a background thread and tracks their progress."""
+
+    def __init__(self, state_path: str = KB_JOB_STATE_PATH, history: int = KB_JOB_HISTORY, max_messages: int = KB_JOB_MAX_MESSAGES):
+        self.state_path = state_path
+        self.history = history
+        self.max_messages = max_messages
+        self._lock = threading.RLock()
+        self._jobs = OrderedDict()      # job_id -> job dict, oldest first
+        self._listeners = {}            # job_id -> {key: callback(job_id, event)}
+        self._cancel_events = {}        # job_id -> threading.Event
+        self._active_id = None
+        self._last_save = 0.0
+        self._load()
+
+    # --- Persistence ---
+
+    def _load(self):
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                jobs = json.load(f).get("jobs", [])
+        except (OSError, ValueError) as e:
+            print(f"Could not read knowledge base job state {self.state_path}: {e}")
+            return
+        for job in jobs:
+            if job.get("status") in ACTIVE_STATES:
+                job["status"] = "interrupted"
+                job["finished"] = datetime.now().isoformat()
+                job["messages"].append("Job was interrupted by a server restart.")
+            self._jobs[job["id"]] = job
+        self._save(force=True)
+
+    def _save(self, force: bool = False):
+        """Writes the job history; must be called with the lock held."""
+        now = time.monotonic()
+        if not force and now - self._last_save < SAVE_INTERVAL_SECONDS:
+            return
+        self._last_save = now
+        tmp_path = f"{self.state_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"jobs": list(self._jobs.values())}, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            print(f"Could not write knowledge base job state {self.state_path}: {e}")
+
+    # --- Job control ---
+
+    def start(self, run_fn, full_rebuild: bool = False, requested_by=None, listener_key=None, listener=None) -> dict:
+        """
+        Starts run_fn(full_rebuild) - a generator of progress messages - in a background thread.
+        Raises KnowledgeBaseJobRunning if another job is still active.
+        """
+        with self._lock:
+            if self._active_id is not None:
+                raise KnowledgeBaseJobRunning(self._snapshot(self._jobs[self._active_id], include_messages=False))
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "id": job_id,
+                "status": "queued",
+                "full_rebuild": full_rebuild,
+                "requested_by": requested_by,
+                "created": datetime.now().isoformat(),
+                "started": None,
+                "finished": None,
+                "error": None,
+                "message_count": 0,
+                "messages": [],
+            }
+            while len(self._jobs) > self.history:
+                self._jobs.popitem(last=False)
+            self._active_id = job_id
+            self._cancel_events[job_id] = threading.Event()
+            if listener is not None:
+                self._listeners.setdefault(job_id, {})[listener_key] = listener
+            self._save(force=True)
+            snapshot = self._snapshot(self._jobs[job_id], include_messages=False)
+
+        thread = threading.Thread(target=self._run, args=(job_id, run_fn, full_rebuild), name=f"kb-job-{job_id[:8]}", daemon=True)
+        thread.start()
+        return snapshot
+
+    def _run(self, job_id: str, run_fn, full_rebuild: bool):
+        with self._lock:
+            if self._jobs[job_id]["status"] == "queued":
+                self._jobs[job_id]["status"] = "running"
+            self._jobs[job_id]["started"] = datetime.now().isoformat()
+        cancel_event = self._cancel_events[job_id]
+        status, error = "completed", None
+        messages = None
+        try:
+            messages = run_fn(full_rebuild)
+            for message in messages:
+                self._add_message(job_id, message)
+                if cancel_event.is_set():
+                    status = "cancelled"
+                    break
+        except Exception as e:
+            status, error = "failed", str(e)
+            print(f"Knowledge base job {job_id} failed: {e}")
+        finally:
+            if messages is not None and hasattr(messages, "close"):
+                # Stops the rebuild at its current step; a half-built index is never swapped in
+                messages.close()
+            self._finish(job_id, status, error)
+
+    def _add_message(self, job_id: str, message: str):
+        with self._lock:
+            job = self._jobs[job_id]
+            job["messages"].append(message)
+            job["message_count"] += 1
+            if len(job["messages"]) > self.max_messages:
+                del job["messages"][:len(job["messages"]) - self.max_messages]
+            self._save()
+            listeners = list(self._listeners.get(job_id, {}).values())
+        self._notify(listeners, job_id, {"type": "message", "message": message})
+
+    def _finish(self, job_id: str, status: str, error: Optional[str]):
+        with self._lock:
+            job = self._jobs[job_id]
+            job["status"] = status
+            job["error"] = error
+            job["finished"] = datetime.now().isoformat()
+            self._active_id = None
+            self._cancel_events.pop(job_id, None)
+            self._save(force=True)
+            listeners = list(self._listeners.pop(job_id, {}).values())
+            snapshot = self._snapshot(job, include_messages=False)
+        self._notify(listeners, job_id, {"type": "finished", "job": snapshot})
+
+    @staticmethod
+    def _notify(listeners: list, job_id: str, event: dict):
+        for listener in listeners:
+            try:
+                listener(job_id, event)
+            except Exception as e:
+                print(f"Knowledge base job listener failed: {e}")
+
+    def cancel(self, job_id: str) -> bool:
+        """Requests cancellation; the job stops after its current step. Returns False if the job is not active."""
+        with self._lock:
+            event = self._cancel_events.get(job_id)
+            if event is None:
+                return False
+            event.set()
+            self._jobs[job_id]["status"] = "cancelling"
+            self._save(force=True)
+            return True
+
+    # --- Listeners and status ---
+
+    def subscribe(self, job_id: str, listener_key, listener) -> Optional[dict]:
+        """Registers a listener for an active job. Returns the job snapshot, or None for an unknown job."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job["status"] in ACTIVE_STATES:
+                self._listeners.setdefault(job_id, {})[listener_key] = listener
+            return self._snapshot(job, include_messages=False)
+
+    def unsubscribe(self, listener_key):
+        """Removes the listener with this key (e.g. a disconnected Socket.IO sid) from all jobs."""
+        with self._lock:
+            for listeners in self._listeners.values():
+                listeners.pop(listener_key, None)
+
+    def _snapshot(self, job: dict, include_messages: bool = True, since: int = 0) -> dict:
+        snapshot = {key: value for key, value in job.items() if key != "messages"}
+        if include_messages:
+            # 'since' counts all messages of the job, including ones trimmed from the history
+            first_kept = job["message_count"] - len(job["messages"])
+            snapshot["messages"] = job["messages"][max(0, since - first_kept):]
+        return snapshot
+
+    def get_job(self, job_id: str, since: int = 0) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._snapshot(job, since=since) if job else None
+
+    def get_active_job(self) -> Optional[dict]:
+        with self._lock:
+            return self._snapshot(self._jobs[self._active_id], include_messages=False) if self._active_id else None
+
+    def list_jobs(self) -> list:
+        """Returns all known jobs without their messages, newest first."""
+        with self._lock:
+            return [self._snapshot(job, include_messages=False) for job in reversed(self._jobs.values())]
+
+
+# Global job manager instance
+_job_manager: Optional[KnowledgeBaseJobManager] = None
+_job_manager_lock = threading.Lock()
+
+def get_job_manager() -> KnowledgeBaseJobManager:
+    """Get or create the global knowledge base job manager"""
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            _job_manager = KnowledgeBaseJobManager()
+        return _job_manager
@@ -3,42 +3,48 @@ os.environ['TOKENIZERS_PARALLELISM'] = 'false'
 import json
 import re
 import requests
-import docx
 import asyncio
 import base64
 import gc  # Added for garbage collection
 import hashlib
 import time
+import uuid
 import logging
+import threading
+import concurrent.futures
+import functools
+import multiprocessing
+import importlib.util
 from datetime import datetime
-from bs4 import BeautifulSoup
 # Removed googlesearch import - replaced with Brave Search API
-from together import Together
 from dotenv import load_dotenv
 from langchain_core.documents import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
-from unstructured.partition.auto import partition
-from unstructured.chunking.title import chunk_by_title
-try:
-    import fitz  # PyMuPDF
-    PYMUPDF_AVAILABLE = True
-except ImportError:
-    PYMUPDF_AVAILABLE = False
+# Heavy parsing and chain libraries (unstructured, PyMuPDF, pdfplumber, python-docx, BeautifulSoup,
+# langchain chains) are imported where they are used, so importing this module stays fast.
+# Optional PDF libraries are only checked for availability here.
+PYMUPDF_AVAILABLE = importlib.util.find_spec("fitz") is not None
+if not PYMUPDF_AVAILABLE:
     print("Warning: PyMuPDF not available. Install with: pip install PyMuPDF")
 
-try:
-    import pdfplumber
-    PDFPLUMBER_AVAILABLE = True
-except ImportError:
-    PDFPLUMBER_AVAILABLE = False
+PDFPLUMBER_AVAILABLE = importlib.util.find_spec("pdfplumber") is not None
+if not PDFPLUMBER_AVAILABLE:
     print("Warning: pdfplumber not available. Install with: pip install pdfplumber")
-from langchain.chains import ConversationalRetrievalChain
-from langchain.memory import ConversationBufferMemory
-from langchain.prompts import PromptTemplate
-from langchain_together import ChatTogether
-from langchain_together.embeddings import TogetherEmbeddings
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from llm_clients import get_together_client, get_embeddings, acquire_model_slot
+from query_router import LocalQueryRouter, QUERY_ROUTER_MODEL_PATH
+from answer_cache import answer_cache, ANSWER_CACHE_ENABLED
+from embedding_cache import embedding_cache, EMBEDDING_CACHE_ENABLED
+from embedding_scheduler import EmbeddingScheduler
+from vector_store_registry import VectorStoreRegistry, save_field_store, load_field_store
+from reranker import get_reranker
+from upload_store_cache import upload_store_cache
+from prescreen_index import PrescreenIndex, question_words
+from docx_ir import DocxIR, parse_docx
+from pdf_pages import aiter_pdf_pages, extract_pdf_text, extract_pages_in_process
+from structure_index_store import MSGPACK_AVAILABLE, save_structure_index, load_structure_index, structure_index_exists
+from retrieval import (batched_search, search_store_with_scores, merge_scored_results, format_search_stats, embed_queries,
+                       best_position_scores, reconstruct_vectors, top_by_cosine, documents_for_positions)
 import ssl
 from langdetect import detect, LangDetectException
 
@@ -133,7 +139,8 @@ FAST_MODEL = "meta-llama/Llama-3.2-3B-Instruct-Turbo" # Fast model for analysis
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DOCUMENTS_PATH = os.path.join(SCRIPT_DIR, "Documents")
 VECTOR_STORE_PATH = os.path.join(SCRIPT_DIR, "vector_store")
-DOCUMENT_STRUCTURE_INDEX_PATH = os.path.join(SCRIPT_DIR, "document_structure_index.json")
+DOCUMENT_STRUCTURE_INDEX_PATH = os.path.join(SCRIPT_DIR, "document_structure_index.json")  # Older format and fallback without msgpack
+DOCUMENT_STRUCTURE_INDEX_BINARY_PATH = os.path.join(SCRIPT_DIR, "document_structure_index.msgpack")
 # Enhanced Chunking Strategy - Optimized for embedding model compatibility
 DEFAULT_CHUNK_SIZE = 2000  # Reduced for better embedding model compatibility
 DEFAULT_OVERLAP = 400  # Reduced overlap for better performance
@@ -162,6 +169,8 @@ def robust_api_call(client, model, messages, temperature, stream=False, timeout=
     if cancellation_check and cancellation_check():
         raise Exception("API call cancelled before execution")
     
+    # Per-model concurrency limit; streaming calls hold their slot until the stream ends
+    release_slot = acquire_model_slot(model)
     try:
         response = client.chat.completions.create(
             model=model,
@@ -171,22 +180,99 @@ def robust_api_call(client, model, messages, temperature, stream=False, timeout=
             timeout=timeout # Pass timeout to the API call
         )
         
-        # For streaming responses, wrap with cancellation checks
-        if stream and cancellation_check:
-            def cancellation_aware_stream():
-                for chunk in response:
-                    if cancellation_check():
-                        break
-                    yield chunk
-            return cancellation_aware_stream()
+        if stream:
+            # Wrap the stream with cancellation checks and slot release
+            def slot_holding_stream():
+                try:
+                    for chunk in response:
+                        if cancellation_check and cancellation_check():
+                            break
+                        yield chunk
+                finally:
+                    release_slot()
+            return slot_holding_stream()
         
+        release_slot()
         return response
     except Exception as e:
+        release_slot()
         # Check if this was a cancellation during API call
         if cancellation_check and cancellation_check():
             raise Exception("API call cancelled during execution")
         raise e
 
+# --- Non-blocking Streaming ---
+# Maximum number of chunks buffered between the streaming thread and the event loop.
+# When the consumer falls behind, the streaming thread waits (backpressure).
+STREAM_BUFFER_SIZE = 64
+STREAM_POLL_INTERVAL = 0.25  # Seconds between cancellation checks while waiting for chunks
+
+async def async_stream_completion(client, model, messages, temperature, timeout=None, cancellation_check=lambda: False):
+    """
+    Async version of a streaming robust_api_call.
+    The blocking HTTP stream is read in a dedicated worker thread and handed to the
+    event loop through a bounded queue, so reading tokens never blocks other sessions,
+    Socket.IO pings or HTTP endpoints. Yields the raw completion chunks.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=STREAM_BUFFER_SIZE)
+    stop_event = threading.Event()
+    done_marker = object()
+
+    def should_stop():
+        return stop_event.is_set() or cancellation_check()
+
+    def put(item) -> bool:
+        # Blocks while the queue is full, but gives up once the consumer has gone away
+        try:
+            future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        except RuntimeError:
+            return False  # Event loop already closed
+        while True:
+            try:
+                future.result(timeout=STREAM_POLL_INTERVAL)
+                return True
+            except concurrent.futures.TimeoutError:
+                if stop_event.is_set():
+                    future.cancel()
+                    return False
+            except Exception:
+                return False
+
+    def worker():
+        try:
+            stream = robust_api_call(client, model, messages, temperature, stream=True, timeout=timeout, cancellation_check=should_stop)
+            for chunk in stream:
+                if should_stop():
+                    break
+                if not put(chunk):
+                    return
+        except Exception as e:
+            put(("error", e))
+            return
+        put(done_marker)
+
+    threading.Thread(target=worker, name="llm-stream", daemon=True).start()
+
+    try:
+        while True:
+            if cancellation_check():
+                return
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=STREAM_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                continue
+            if item is done_marker:
+                return
+            if isinstance(item, tuple) and len(item) == 2 and item[0] == "error":
+                if cancellation_check():
+                    return
+                raise item[1]
+            yield item
+    finally:
+        # Stops the worker thread if the consumer exits early (cancellation, client disconnect)
+        stop_event.set()
+
 def truncate_text(text: str, max_chars: int) -> str:
     """Trunkiert den Text auf eine maximale Zeichenlänge und behält den Anfang bei."""
     if len(text) > max_chars:
@@ -202,74 +288,77 @@ def get_document_list(path: str) -> list:
     all_files = docx_files + pdf_files
     return [f for f in all_files if not os.path.basename(f).startswith('~$')]
 
-async def extract_document_structure_with_llm(file_path: str) -> dict:
+# Structure analysis during index builds: documents are analysed concurrently, at most
+# STRUCTURE_EXTRACTION_CONCURRENCY at a time. The LLM analysis is cached by a hash of the document's
+# heading list, so documents whose headings did not change are not analysed again on a rebuild.
+STRUCTURE_EXTRACTION_CONCURRENCY = max(1, int(os.getenv("STRUCTURE_EXTRACTION_CONCURRENCY", "4")))
+DOCUMENT_STRUCTURE_CACHE_PATH = os.path.join(SCRIPT_DIR, "document_structure_cache.json")
+
+def extract_document_headings(file_path: str) -> list:
     """
-    Intelligent, language-agnostic document structure extraction using LLM analysis.
-    Works with any document type and language without hard-coded assumptions.
+    Returns the headings of a DOCX (heading styles) or PDF (table of contents) as
+    [{"level", "heading", "breadcrumb"}, ...] in document order.
     """
-    doc = docx.Document(file_path)
-    structure = {
-        "filename": os.path.basename(file_path),
-        "chapters": {},
-        "subsections": {},
-        "topics": {},
-        "processes": {},
-        "headings_hierarchy": []
-    }
-    
-    path_parts = os.path.normpath(file_path).split(os.sep)
-    try:
-        documents_index = path_parts.index('Documents')
-        knowledge_field = path_parts[documents_index + 1]
-    except (ValueError, IndexError):
-        knowledge_field = "Unknown"
-    
+    if file_path.lower().endswith('.docx'):
+        return parse_docx(file_path).headings
+    if not (file_path.lower().endswith('.pdf') and PYMUPDF_AVAILABLE):
+        return []
+    import fitz  # PyMuPDF
+    with fitz.open(file_path) as doc:
+        outline = [(level, title.strip()) for level, title, _page in doc.get_toc(simple=True) if title.strip()]
+
+    headings = []
     current_headings = [""] * 6
-    heading_content_pairs = []
+    for level, text in outline:
+        if 1 <= level <= 6:
+            current_headings[level - 1] = text
+            for i in range(level, 6):
+                current_headings[i] = ""
+            headings.append({
+                "level": level,
+                "heading": text,
+                "breadcrumb": " > ".join(h for h in current_headings if h)
+            })
+    return headings
+
+def _headings_hash(headings: list) -> str:
+    """Cache key of a structure analysis: the analysis model and the heading list."""
+    headings_text = "\n".join(f"{h['level']}:{h['breadcrumb']}" for h in headings)
+    return hashlib.sha256(f"{FAST_MODEL}\n{headings_text}".encode("utf-8")).hexdigest()
+
+def _load_structure_analysis_cache() -> dict:
+    try:
+        if os.path.exists(DOCUMENT_STRUCTURE_CACHE_PATH):
+            with open(DOCUMENT_STRUCTURE_CACHE_PATH, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except Exception as e:
+        print(f"Error loading document structure cache: {e}")
+    return {}
+
+def _save_structure_analysis_cache(cache: dict):
+    try:
+        temp_path = DOCUMENT_STRUCTURE_CACHE_PATH + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False)
+        os.replace(temp_path, DOCUMENT_STRUCTURE_CACHE_PATH)
+    except Exception as e:
+        print(f"Error saving document structure cache: {e}")
+
+async def analyze_document_headings(file_path: str, headings: list):
+    """
+    Intelligent, language-agnostic analysis of a document's headings with FAST_MODEL.
+    Returns the parsed analysis, or None if the call or the JSON parsing failed.
+    """
+    # Use LLM to intelligently analyze document structure
+    client = get_together_client()
     
-    # Extract all headings and their content
-    for para in doc.paragraphs:
-        if para.style.name.startswith('Heading') and para.text.strip():
-            try:
-                level = int(para.style.name.split(' ')[-1])
-                if 1 <= level <= 6:
-                    current_headings[level - 1] = para.text.strip()
-                    for i in range(level, 6):
-                        current_headings[i] = ""
-                    
-                    heading_breadcrumb = " > ".join(h for h in current_headings if h)
-                    
-                    # Store heading hierarchy
-                    heading_info = {
-                        "level": level,
-                        "text": para.text.strip(),
-                        "breadcrumb": heading_breadcrumb
-                    }
-                    structure["headings_hierarchy"].append(heading_info)
-                    
-                    # Collect headings for LLM analysis
-                    heading_content_pairs.append({
-                        "level": level,
-                        "heading": para.text.strip(),
-                        "breadcrumb": heading_breadcrumb
-                    })
-                    
-            except ValueError:
-                continue
+    # Prepare headings text for analysis
+    headings_text = "\n".join([
+        f"Level {h['level']}: {h['breadcrumb']}" 
+        for h in headings
+    ])
     
-    # If we have headings, analyze them with LLM
-    if heading_content_pairs:
-        try:
-            # Use LLM to intelligently analyze document structure
-            client = Together(api_key=os.getenv("TOGETHER_API_KEY"))
-            
-            # Prepare headings text for analysis
-            headings_text = "\n".join([
-                f"Level {h['level']}: {h['breadcrumb']}" 
-                for h in heading_content_pairs
-            ])
-            
-            analysis_prompt = f"""Analyze this document structure and extract topics, processes, and search terms dynamically. The document has these headings:
+    analysis_prompt = f"""Analyze this document structure and extract topics, processes, and search terms dynamically. The document has these headings:
 
 {headings_text}
 
@@ -296,90 +385,131 @@ Respond with ONLY a JSON object in this format:
 
 Important: Base your analysis ONLY on the actual headings provided. Don't make assumptions about content not visible in the headings."""
 
-            messages = [{"role": "user", "content": analysis_prompt}]
-            
-            response = await asyncio.to_thread(
-                robust_api_call, 
-                client, 
-                FAST_MODEL,  # Fast model for analysis
-                messages, 
-                0.1
-            )
-            
-            if response.choices and response.choices[0].message.content:
-                content = response.choices[0].message.content.strip()
-                
-                # Clean JSON if wrapped in markdown
-                if content.startswith("```json"):
-                    content = content[7:-3].strip()
-                elif content.startswith("```"):
-                    content = content[3:-3].strip()
-                
-                try:
-                    analysis = json.loads(content)
-                    
-                    # Map the LLM analysis to our structure format
-                    structure["language"] = analysis.get("language", "Unknown")
-                    structure["domain"] = analysis.get("domain", "Unknown")
-                    structure["main_topics"] = analysis.get("main_topics", [])
-                    structure["processes_list"] = analysis.get("processes", [])
-                    structure["search_terms"] = analysis.get("search_terms", [])
-                    
-                    # Build search-friendly mappings
-                    chapter_mappings = analysis.get("chapter_mappings", {})
-                    subsection_mappings = analysis.get("subsection_mappings", {})
-                    
-                    # Store both original terms and lowercase variants for better matching
-                    for term, breadcrumb in chapter_mappings.items():
-                        structure["chapters"][term] = breadcrumb
-                        structure["chapters"][term.lower()] = breadcrumb
-                    
-                    for term, breadcrumb in subsection_mappings.items():
-                        structure["subsections"][term] = breadcrumb
-                        structure["subsections"][term.lower()] = breadcrumb
-                    
-                    # Create topic-based mappings for broader search coverage
-                    for topic in analysis.get("main_topics", []):
-                        # Find headings that might relate to this topic
-                        for heading_info in heading_content_pairs:
-                            if any(word in heading_info["heading"].lower() for word in topic.lower().split()):
-                                structure["topics"][topic] = heading_info["breadcrumb"]
-                                structure["topics"][topic.lower()] = heading_info["breadcrumb"]
-                                break
-                    
-                except json.JSONDecodeError as e:
-                    print(f"Error parsing LLM analysis for {file_path}: {e}")
-                    # Fallback to basic structure
-                    pass
-                    
-        except Exception as e:
-            print(f"Error in LLM analysis for {file_path}: {e}")
-            # Continue with basic structure
-            pass
+    messages = [{"role": "user", "content": analysis_prompt}]
+    
+    try:
+        response = await asyncio.to_thread(
+            robust_api_call, 
+            client, 
+            FAST_MODEL,  # Fast model for analysis
+            messages, 
+            0.1
+        )
+    except Exception as e:
+        print(f"Error in LLM analysis for {file_path}: {e}")
+        return None
+    
+    if not (response.choices and response.choices[0].message.content):
+        return None
+    content = response.choices[0].message.content.strip()
     
+    # Clean JSON if wrapped in markdown
+    if content.startswith("```json"):
+        content = content[7:-3].strip()
+    elif content.startswith("```"):
+        content = content[3:-3].strip()
+    
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError as e:
+        print(f"Error parsing LLM analysis for {file_path}: {e}")
+        return None
+
+def _build_document_structure(file_path: str, headings: list, analysis) -> dict:
+    """Maps the headings and their LLM analysis (None: headings only) to the document structure."""
+    structure = {
+        "filename": os.path.basename(file_path),
+        "chapters": {},
+        "subsections": {},
+        "topics": {},
+        "processes": {},
+        "headings_hierarchy": [
+            {"level": h["level"], "text": h["heading"], "breadcrumb": h["breadcrumb"]}
+            for h in headings
+        ]
+    }
+    if not isinstance(analysis, dict):
+        return structure
+    
+    # Map the LLM analysis to our structure format
+    structure["language"] = analysis.get("language", "Unknown")
+    structure["domain"] = analysis.get("domain", "Unknown")
+    structure["main_topics"] = analysis.get("main_topics", [])
+    structure["processes_list"] = analysis.get("processes", [])
+    structure["search_terms"] = analysis.get("search_terms", [])
+    
+    # Store both original terms and lowercase variants for better matching
+    for term, breadcrumb in analysis.get("chapter_mappings", {}).items():
+        structure["chapters"][term] = breadcrumb
+        structure["chapters"][term.lower()] = breadcrumb
+    
+    for term, breadcrumb in analysis.get("subsection_mappings", {}).items():
+        structure["subsections"][term] = breadcrumb
+        structure["subsections"][term.lower()] = breadcrumb
+    
+    # Create topic-based mappings for broader search coverage
+    for topic in analysis.get("main_topics", []):
+        # Find headings that might relate to this topic
+        for heading_info in headings:
+            if any(word in heading_info["heading"].lower() for word in topic.lower().split()):
+                structure["topics"][topic] = heading_info["breadcrumb"]
+                structure["topics"][topic.lower()] = heading_info["breadcrumb"]
+                break
     return structure
 
-def extract_document_structure(file_path: str) -> dict:
+async def extract_document_structure_with_llm(file_path: str, analysis_cache: dict = None, stats: dict = None,
+                                              headings: list = None) -> dict:
     """
-    Wrapper for the async LLM-based structure extraction.
-    Maintains compatibility with existing sync code.
+    Intelligent, language-agnostic document structure extraction using LLM analysis.
+    Works with any document type and language without hard-coded assumptions.
+    With an analysis_cache (headings hash -> analysis), documents with known headings are not analysed again.
+    Headings already extracted during chunking can be passed; otherwise the document is parsed.
     """
-    import asyncio
-    
-    # Create new event loop if none exists
-    try:
-        loop = asyncio.get_event_loop()
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-    
-    # Run the async function
-    return loop.run_until_complete(extract_document_structure_with_llm(file_path))
+    if headings is None:
+        headings = await asyncio.to_thread(extract_document_headings, file_path)
+    analysis, key = None, None
+    if headings:
+        key = _headings_hash(headings)
+        if analysis_cache is not None and key in analysis_cache:
+            analysis = analysis_cache[key]
+            if stats is not None:
+                stats["cached"] += 1
+        else:
+            analysis = await analyze_document_headings(file_path, headings)
+            if stats is not None:
+                stats["analysed"] += 1
+            if analysis is not None and analysis_cache is not None:
+                analysis_cache[key] = analysis
+    structure = _build_document_structure(file_path, headings, analysis)
+    structure["headings_hash"] = key
+    return structure
+
+async def extract_document_structures(doc_files: list, analysis_cache: dict = None, headings_by_file: dict = None) -> tuple:
+    """
+    Extracts the structure of all documents concurrently, at most STRUCTURE_EXTRACTION_CONCURRENCY
+    at a time. headings_by_file ({file path: headings}) skips parsing for documents whose headings
+    are known. Returns ({file path: structure}, stats); failed documents are left out.
+    """
+    headings_by_file = headings_by_file or {}
+    semaphore = asyncio.Semaphore(STRUCTURE_EXTRACTION_CONCURRENCY)
+    stats = {"documents": len(doc_files), "cached": 0, "analysed": 0, "failed": 0}
+
+    async def extract(doc_file):
+        async with semaphore:
+            try:
+                return doc_file, await extract_document_structure_with_llm(doc_file, analysis_cache, stats,
+                                                                            headings_by_file.get(doc_file))
+            except Exception as e:
+                print(f"Error processing {doc_file} for index: {e}")
+                stats["failed"] += 1
+                return doc_file, None
 
-def process_docx_with_headings(file_path: str) -> list[Document]:
-    doc = docx.Document(file_path)
+    results = await asyncio.gather(*(extract(doc_file) for doc_file in doc_files))
+    return {doc_file: structure for doc_file, structure in results if structure is not None}, stats
+
+def process_docx_with_headings(file_path: str, ir: DocxIR = None) -> list[Document]:
+    ir = ir or parse_docx(file_path)
     docs = []
-    current_headings = [""] * 6
     # Extract knowledge field from the file path
     path_parts = os.path.normpath(file_path).split(os.sep)
     # The knowledge field is the directory name inside 'Documents'
@@ -389,39 +519,43 @@ def process_docx_with_headings(file_path: str) -> list[Document]:
     except (ValueError, IndexError):
         knowledge_field = "Unknown"
 
-    for para in doc.paragraphs:
-        if para.style.name.startswith('Heading'):
-            try:
-                level = int(para.style.name.split(' ')[-1])
-                if 1 <= level <= 6:
-                    current_headings[level - 1] = para.text
-                    for i in range(level, 6):
-                        current_headings[i] = ""
-            except ValueError:
-                continue
-        elif para.text.strip():
-            heading_breadcrumb = " > ".join(h for h in current_headings if h)
-            page_content = f"[Kontext: {heading_breadcrumb}] {para.text}"
+    for block in ir.blocks:
+        heading_breadcrumb = block["heading_context"]
+        for text in block["paragraphs"]:
+            page_content = f"[Kontext: {heading_breadcrumb}] {text}"
             metadata = {
                 "source": file_path, 
                 "heading": heading_breadcrumb,
                 "knowledge_field": knowledge_field,
-                "heading_level": len([h for h in current_headings if h])
+                "heading_level": block["heading_level"]
             }
             docs.append(Document(page_content=page_content, metadata=metadata))
     return docs
 
 # --- Vector Store Management ---
-vector_stores = {} # Dictionary to hold multiple vector stores
+# Knowledge field -> FAISS store; stores are loaded on first access and unloaded under memory pressure
+vector_stores = VectorStoreRegistry(
+    list_fields=lambda: _list_vector_store_fields(),
+    resolve_path=lambda field: _resolve_field_store_path(field),
+    embeddings_factory=lambda: get_embeddings(EMBEDDING_MODEL),
+)
 document_structure_index = {} # Global index for fast pre-screening
+document_prescreen_index = None # Compiled from document_structure_index when it is built or loaded
 
 # --- Document Structure Index for Fast Pre-Screening ---
+def _indexed_document_entries(field: str) -> dict:
+    """Manifest entries ({"sha256", "chunk_ids", "headings"}) of a field's current index, by normalized document path."""
+    store_path = _resolve_field_store_path(field)
+    manifest = _load_vector_store_manifest(store_path) if store_path else None
+    field_path = os.path.join(DOCUMENTS_PATH, field)
+    return {os.path.normpath(os.path.join(field_path, name)): entry for name, entry in (manifest or {}).get("files", {}).items()}
+
 def create_document_structure_index(knowledge_fields: list) -> dict:
     """
     Creates a searchable index of document structure data for fast pre-screening.
     This index contains all topics, processes, search terms, and metadata for quick keyword matching.
     """
-    global document_structure_index
+    global document_structure_index, document_prescreen_index
     
     index = {
         "topics": {},           # topic -> [field1, field2, ...]
@@ -434,12 +568,34 @@ def create_document_structure_index(knowledge_fields: list) -> dict:
     
     print("Building document structure index for fast pre-screening...")
     
+    # Headings and chunk counts of indexed documents come from the vector store manifests, so
+    # documents are only parsed here if they are not in the index
+    field_documents, indexed_files = {}, {}
     for field in knowledge_fields:
         field_path = os.path.join(DOCUMENTS_PATH, field)
-        if not os.path.isdir(field_path):
-            continue
-            
-        doc_files = get_document_list(field_path)
+        if os.path.isdir(field_path):
+            field_documents[field] = get_document_list(field_path)
+            indexed_files.update(_indexed_document_entries(field))
+    all_documents = [doc_file for doc_files in field_documents.values() for doc_file in doc_files]
+    headings_by_file = {}
+    for doc_file in all_documents:
+        entry = indexed_files.get(os.path.normpath(doc_file))
+        if entry and entry.get("headings") is not None:
+            headings_by_file[doc_file] = entry["headings"]
+    
+    # Analyse all documents concurrently; analyses of unchanged heading lists come from the cache
+    start_time = time.perf_counter()
+    analysis_cache = _load_structure_analysis_cache()
+    structures, stats = asyncio.run(extract_document_structures(all_documents, analysis_cache, headings_by_file))
+    # Only analyses of current documents are kept, so the cache does not grow with deleted or edited documents
+    _save_structure_analysis_cache({
+        structure["headings_hash"]: analysis_cache[structure["headings_hash"]]
+        for structure in structures.values() if structure.get("headings_hash") in analysis_cache
+    })
+    print(f"Document structures: {stats['documents']} documents ({len(headings_by_file)} with headings from the index), "
+          f"{stats['cached']} from cache, {stats['analysed']} analysed, {stats['failed']} failed ({time.perf_counter() - start_time:.1f}s)")
+    
+    for field, doc_files in field_documents.items():
         field_stats = {
             "doc_count": len(doc_files),
             "total_chunks": 0,
@@ -447,63 +603,57 @@ def create_document_structure_index(knowledge_fields: list) -> dict:
         }
         
         for doc_file in doc_files:
+            doc_structure = structures.get(doc_file)
+            if doc_structure is None:
+                continue
             try:
-                # Extract document structure
-                if doc_file.lower().endswith('.docx'):
-                    doc_structure = extract_document_structure(doc_file)
-                    
-                    # Add filename to index
-                    filename = os.path.basename(doc_file)
-                    base_filename = os.path.splitext(filename)[0]
-                    
-                    if filename not in index["filenames"]:
-                        index["filenames"][filename] = []
-                    index["filenames"][filename].append(field)
-                    
-                    if base_filename not in index["filenames"]:
-                        index["filenames"][base_filename] = []
-                    index["filenames"][base_filename].append(field)
-                    
-                    # Add topics
-                    for topic in doc_structure.get("main_topics", []):
-                        if topic not in index["topics"]:
-                            index["topics"][topic] = []
-                        index["topics"][topic].append(field)
-                        index["topics"][topic.lower()] = index["topics"][topic]
-                        field_stats["main_topics"].add(topic)
-                    
-                    # Add processes
-                    for process in doc_structure.get("processes_list", []):
-                        if process not in index["processes"]:
-                            index["processes"][process] = []
-                        index["processes"][process].append(field)
-                        index["processes"][process.lower()] = index["processes"][process]
-                    
-                    # Add search terms
-                    for term in doc_structure.get("search_terms", []):
-                        if term not in index["search_terms"]:
-                            index["search_terms"][term] = []
-                        index["search_terms"][term].append(field)
-                        index["search_terms"][term.lower()] = index["search_terms"][term]
-                    
-                    # Add headings
-                    for heading_info in doc_structure.get("headings_hierarchy", []):
-                        heading_text = heading_info.get("text", "")
-                        if heading_text and heading_text not in index["headings"]:
-                            index["headings"][heading_text] = []
-                        if heading_text:
-                            index["headings"][heading_text].append(field)
-                            index["headings"][heading_text.lower()] = index["headings"][heading_text]
+                # Add filename to index
+                filename = os.path.basename(doc_file)
+                base_filename = os.path.splitext(filename)[0]
+                
+                if filename not in index["filenames"]:
+                    index["filenames"][filename] = []
+                index["filenames"][filename].append(field)
+                
+                if base_filename not in index["filenames"]:
+                    index["filenames"][base_filename] = []
+                index["filenames"][base_filename].append(field)
+                
+                # Add topics
+                for topic in doc_structure.get("main_topics", []):
+                    if topic not in index["topics"]:
+                        index["topics"][topic] = []
+                    index["topics"][topic].append(field)
+                    index["topics"][topic.lower()] = index["topics"][topic]
+                    field_stats["main_topics"].add(topic)
+                
+                # Add processes
+                for process in doc_structure.get("processes_list", []):
+                    if process not in index["processes"]:
+                        index["processes"][process] = []
+                    index["processes"][process].append(field)
+                    index["processes"][process.lower()] = index["processes"][process]
+                
+                # Add search terms
+                for term in doc_structure.get("search_terms", []):
+                    if term not in index["search_terms"]:
+                        index["search_terms"][term] = []
+                    index["search_terms"][term].append(field)
+                    index["search_terms"][term.lower()] = index["search_terms"][term]
+                
+                # Add headings
+                for heading_info in doc_structure.get("headings_hierarchy", []):
+                    heading_text = heading_info.get("text", "")
+                    if heading_text and heading_text not in index["headings"]:
+                        index["headings"][heading_text] = []
+                    if heading_text:
+                        index["headings"][heading_text].append(field)
+                        index["headings"][heading_text.lower()] = index["headings"][heading_text]
+                
+                # Chunk count of the document in the vector store (documents that are not indexed have none)
+                entry = indexed_files.get(os.path.normpath(doc_file))
+                field_stats["total_chunks"] += len(entry["chunk_ids"]) if entry else 0
                     
-                    # Estimate chunk count (rough estimate based on document size)
-                    try:
-                        with open(doc_file, 'rb') as f:
-                            file_size = len(f.read())
-                        estimated_chunks = max(1, file_size // 4000)  # Rough estimate
-                        field_stats["total_chunks"] += estimated_chunks
-                    except:
-                        field_stats["total_chunks"] += 5  # Default estimate
-                        
             except Exception as e:
                 print(f"Error processing {doc_file} for index: {e}")
                 continue
@@ -514,26 +664,31 @@ def create_document_structure_index(knowledge_fields: list) -> dict:
     
     # Save index to file for persistence
     try:
-        with open(DOCUMENT_STRUCTURE_INDEX_PATH, 'w', encoding='utf-8') as f:
-            json.dump(index, f, ensure_ascii=False, indent=2)
-        print(f"Document structure index saved to {DOCUMENT_STRUCTURE_INDEX_PATH}")
+        saved_path = save_structure_index(index, DOCUMENT_STRUCTURE_INDEX_BINARY_PATH, DOCUMENT_STRUCTURE_INDEX_PATH)
+        print(f"Document structure index saved to {saved_path}")
     except Exception as e:
         print(f"Error saving document structure index: {e}")
     
     document_structure_index = index
+    document_prescreen_index = PrescreenIndex(index)
     return index
 
 def load_document_structure_index() -> dict:
     """
     Loads the document structure index from file.
     """
-    global document_structure_index
+    global document_structure_index, document_prescreen_index
     
     try:
-        if os.path.exists(DOCUMENT_STRUCTURE_INDEX_PATH):
-            with open(DOCUMENT_STRUCTURE_INDEX_PATH, 'r', encoding='utf-8') as f:
-                document_structure_index = json.load(f)
-            print(f"Document structure index loaded from {DOCUMENT_STRUCTURE_INDEX_PATH}")
+        start_time = time.perf_counter()
+        index, loaded_path = load_structure_index(DOCUMENT_STRUCTURE_INDEX_BINARY_PATH, DOCUMENT_STRUCTURE_INDEX_PATH)
+        if index is not None:
+            document_structure_index = index
+            document_prescreen_index = PrescreenIndex(document_structure_index)
+            print(f"Document structure index loaded from {loaded_path} in {time.perf_counter() - start_time:.2f}s")
+            if loaded_path == DOCUMENT_STRUCTURE_INDEX_PATH and MSGPACK_AVAILABLE:
+                # Convert an index of an earlier version, so the next start loads the compact format
+                print(f"Document structure index converted to {save_structure_index(index, DOCUMENT_STRUCTURE_INDEX_BINARY_PATH, DOCUMENT_STRUCTURE_INDEX_PATH)}")
             return document_structure_index
         else:
             print("No document structure index found. Will be created during next knowledge base update.")
@@ -555,7 +710,7 @@ def quick_vector_store_check(user_question: str, selected_fields: list, user_ema
             "reason": str
         }
     """
-    global document_structure_index
+    global document_structure_index, document_prescreen_index
     
     # Load index if not already loaded
     if not document_structure_index:
@@ -577,49 +732,11 @@ def quick_vector_store_check(user_question: str, selected_fields: list, user_ema
     else:
         accessible_fields = selected_fields
     
-    # Extract keywords from user question
-    question_words = set(user_question.lower().split())
-    # Remove common German/English stop words
-    stop_words = {'der', 'die', 'das', 'und', 'oder', 'aber', 'ist', 'sind', 'hat', 'haben', 'von', 'zu', 'mit', 'auf', 'in', 'für', 'was', 'wie', 'wo', 'wann', 'warum', 'the', 'and', 'or', 'but', 'is', 'are', 'has', 'have', 'from', 'to', 'with', 'on', 'in', 'for', 'what', 'how', 'where', 'when', 'why'}
-    meaningful_words = question_words - stop_words
-    
-    matched_terms = []
-    field_scores = {}
-    
-    # Check against all index categories
-    index_categories = [
-        ("topics", document_structure_index.get("topics", {})),
-        ("processes", document_structure_index.get("processes", {})),
-        ("search_terms", document_structure_index.get("search_terms", {})),
-        ("headings", document_structure_index.get("headings", {})),
-        ("filenames", document_structure_index.get("filenames", {}))
-    ]
-    
-    for category_name, category_index in index_categories:
-        for term, fields in category_index.items():
-            # Check for exact matches and partial matches
-            term_lower = term.lower()
-            
-            # Exact word match
-            if term_lower in meaningful_words:
-                matched_terms.append(f"{category_name}:{term}")
-                for field in fields:
-                    if field in accessible_fields:
-                        field_scores[field] = field_scores.get(field, 0) + 2.0
-            
-            # Partial match (term contains question word or vice versa)
-            elif any(word in term_lower for word in meaningful_words if len(word) > 2):
-                matched_terms.append(f"{category_name}:{term} (partial)")
-                for field in fields:
-                    if field in accessible_fields:
-                        field_scores[field] = field_scores.get(field, 0) + 1.0
-            
-            # Question word contains term
-            elif any(term_lower in word for word in meaningful_words if len(term_lower) > 2):
-                matched_terms.append(f"{category_name}:{term} (contains)")
-                for field in fields:
-                    if field in accessible_fields:
-                        field_scores[field] = field_scores.get(field, 0) + 1.0
+    # Extract keywords from user question and match them against the compiled index
+    meaningful_words = question_words(user_question)
+    if document_prescreen_index is None:
+        document_prescreen_index = PrescreenIndex(document_structure_index)
+    matched_terms, field_scores = document_prescreen_index.match(meaningful_words, accessible_fields)
     
     # Calculate overall confidence score
     max_possible_score = len(meaningful_words) * 2.0
@@ -649,107 +766,131 @@ def quick_vector_store_check(user_question: str, selected_fields: list, user_ema
         "reason": reason
     }
 
-def ultra_fast_semantic_prescreen(user_question: str, selected_fields: list, user_email: str = None, max_docs: int = 3) -> dict:
+# Cosine similarity of the best chunk above which a question is clearly answerable from the knowledge
+# base, and below which it is not unless the keyword check finds its terms (multilingual-e5
+# similarities lie in a narrow, high range). Check them for a knowledge base with
+# benchmarks/eval_retrieval_thresholds.py
+RETRIEVAL_HIGH_SIMILARITY = float(os.getenv("RETRIEVAL_HIGH_SIMILARITY", "0.86"))
+RETRIEVAL_LOW_SIMILARITY = float(os.getenv("RETRIEVAL_LOW_SIMILARITY", "0.72"))
+PRESCREEN_K = 25  # Hits per field; they are reused as the retrieval results of the question itself
+
+def ultra_fast_semantic_prescreen(user_question: str, selected_fields: list, user_email: str = None, max_docs: int = PRESCREEN_K, scored_results: dict = None) -> dict:
     """
-    Performs an ultra-fast semantic search with very few documents to check relevance.
-    Only used if keyword matching shows potential.
-    
+    Checks relevance with the real similarity scores of the question's nearest chunks.
+    The question embedding is the cached one from routing and the answer cache, so no extra
+    embedding request is needed. If scored_results ({field: [(doc, score)]}) of a finished
+    retrieval are passed, no search is run at all.
+
     Returns:
         dict: {
             "has_relevant_content": bool,
+            "decision": "high" | "low" | "uncertain",
             "max_similarity": float,
+            "field_scores": dict,
             "relevant_fields": list,
+            "results": dict,
             "reason": str
         }
     """
-    global vector_stores
-    
     if not vector_stores:
         return {
             "has_relevant_content": True,
-            "max_similarity": 0.5,
-            "relevant_fields": selected_fields,
+            "decision": "uncertain",
+            "max_similarity": 0.0,
+            "field_scores": {},
+            "relevant_fields": _accessible_field_selection(user_email, selected_fields),
+            "results": {},
             "reason": "No vector stores loaded - skipping semantic prescreen"
         }
     
-    # Apply domain-based access control
-    if user_email:
-        accessible_fields = filter_accessible_fields(user_email, selected_fields)
-    else:
-        accessible_fields = selected_fields
+    # Apply domain-based access control: only accessible fields are searched and returned
+    accessible_fields = _accessible_field_selection(user_email, selected_fields)
     
-    relevant_fields = []
-    max_similarity = 0.0
+    results = {}
+    if scored_results is not None:
+        target_fields = set(_select_target_fields(accessible_fields))
+        results = {field: hits for field, hits in scored_results.items() if field in target_fields}
+    else:
+        target_stores = _select_target_stores(accessible_fields)
+        if target_stores:
+            query_vector = embed_query_cached(user_question)
+            for field, store in target_stores.items():
+                try:
+                    results[field] = search_store_with_scores(store, query_vector, max_docs)
+                except Exception as e:
+                    print(f"Error in ultra-fast semantic prescreen for {field}: {e}")
     
-    for field in accessible_fields:
-        if field in vector_stores:
-            try:
-                # Ultra-fast search with very few documents
-                retriever = vector_stores[field].as_retriever(search_kwargs={"k": max_docs})
-                docs = retriever.invoke(user_question)
-                
-                if docs:
-                    # Simple heuristic: if we got documents, there's likely relevant content
-                    # In a full implementation, you could calculate actual similarity scores
-                    field_relevance = len(docs) / max_docs
-                    if field_relevance > 0.3:  # Arbitrary threshold
-                        relevant_fields.append(field)
-                        max_similarity = max(max_similarity, field_relevance)
-                        
-            except Exception as e:
-                print(f"Error in ultra-fast semantic prescreen for {field}: {e}")
-                continue
+    field_scores = {field: max(score for _, score in hits) for field, hits in results.items() if hits}
+    if not field_scores:
+        return {
+            "has_relevant_content": True,
+            "decision": "uncertain",
+            "max_similarity": 0.0,
+            "field_scores": {},
+            "relevant_fields": accessible_fields,
+            "results": results,
+            "reason": "No searchable knowledge fields - skipping semantic prescreen"
+        }
     
-    has_relevant_content = len(relevant_fields) > 0 or max_similarity > 0.2
+    max_similarity = max(field_scores.values())
+    relevant_fields = sorted((field for field, score in field_scores.items() if score >= RETRIEVAL_LOW_SIMILARITY),
+                             key=field_scores.get, reverse=True)
+    if max_similarity >= RETRIEVAL_HIGH_SIMILARITY:
+        decision = "high"
+    elif max_similarity < RETRIEVAL_LOW_SIMILARITY:
+        decision = "low"
+    else:
+        decision = "uncertain"
     
-    reason = f"Semantic prescreen found {len(relevant_fields)} relevant fields with max similarity {max_similarity:.2f}"
+    scores_text = ", ".join(f"{field}: {score:.2f}" for field, score in sorted(field_scores.items(), key=lambda item: item[1], reverse=True))
+    reason = f"Semantic prescreen: max similarity {max_similarity:.2f} ({decision}) - {scores_text}"
     
     return {
-        "has_relevant_content": has_relevant_content,
+        "has_relevant_content": decision != "low",
+        "decision": decision,
         "max_similarity": max_similarity,
+        "field_scores": field_scores,
         "relevant_fields": relevant_fields,
+        "results": results,
         "reason": reason
     }
 
+def _list_vector_store_fields() -> list:
+    """Returns the knowledge fields that have a vector store on disk."""
+    if not os.path.isdir(VECTOR_STORE_PATH):
+        return []
+    # Dot-directories are temporary and not knowledge fields
+    return [
+        field_name for field_name in os.listdir(VECTOR_STORE_PATH)
+        if not field_name.startswith('.') and os.path.isdir(os.path.join(VECTOR_STORE_PATH, field_name))
+        and _resolve_field_store_path(field_name)
+    ]
+
 def load_vector_store():
     """
-    Loads all available vector stores from the VECTOR_STORE_PATH.
-    Each sub-directory in VECTOR_STORE_PATH is considered a separate vector store.
+    Registers all available vector stores from the VECTOR_STORE_PATH.
+    Each sub-directory in VECTOR_STORE_PATH is considered a separate vector store; its current
+    generation is loaded the first time the field is queried.
     """
-    global vector_stores
     api_key = os.getenv("TOGETHER_API_KEY")
     if not api_key:
         print("TOGETHER_API_KEY not found in environment variables.")
         return
 
-    embeddings = TogetherEmbeddings(model=EMBEDDING_MODEL, together_api_key=api_key)
-    
-    if os.path.exists(VECTOR_STORE_PATH) and os.path.isdir(VECTOR_STORE_PATH):
-        for field_name in os.listdir(VECTOR_STORE_PATH):
-            field_path = os.path.join(VECTOR_STORE_PATH, field_name)
-            if os.path.isdir(field_path):
-                try:
-                    # The FAISS index file is expected inside this directory
-                    if os.path.exists(os.path.join(field_path, "index.faiss")):
-                        print(f"Loading vector store for knowledge field: {field_name}")
-                        vector_stores[field_name] = FAISS.load_local(field_path, embeddings, allow_dangerous_deserialization=True)
-                    else:
-                        print(f"Skipping directory {field_name}: No index.faiss file found.")
-                except Exception as e:
-                    print(f"Error loading vector store for '{field_name}': {e}")
-    else:
+    if not os.path.isdir(VECTOR_STORE_PATH):
         print("Vector store path does not exist or is not a directory.")
-        vector_stores = {}
+    fields = vector_stores.refresh()
+    print(f"Found vector stores for {len(fields)} knowledge fields: {', '.join(fields)} (loaded on first use)")
 
-def smart_chunk_document(file_path: str) -> list[Document]:
+def smart_chunk_document(file_path: str, ir: DocxIR = None) -> list[Document]:
     """
     Creates intelligent chunks based on document structure with AI-enhanced context.
     Uses adaptive chunking strategy based on document size and complexity.
     Enhanced for better context preservation with larger chunks.
+    An already parsed DocxIR of the file can be passed to avoid parsing it again.
     """
-    doc = docx.Document(file_path)
+    ir = ir or parse_docx(file_path)
     docs = []
-    current_headings = [""] * 6
     
     # Extract knowledge field from the file path - Fixed to find the correct Documents folder
     path_parts = os.path.normpath(file_path).split(os.sep)
@@ -774,42 +915,8 @@ def smart_chunk_document(file_path: str) -> list[Document]:
     except (ValueError, IndexError):
         knowledge_field = "Unknown"
 
-    # Collect paragraphs with their heading context
-    content_blocks = []
-    current_block = ""
-    current_heading_context = ""
-
-    for para in doc.paragraphs:
-        if para.style.name.startswith('Heading'):
-            # Save current block if it has content
-            if current_block.strip():
-                content_blocks.append({
-                    "content": current_block.strip(),
-                    "heading_context": current_heading_context,
-                    "knowledge_field": knowledge_field
-                })
-                current_block = ""
-            
-            # Update heading hierarchy
-            try:
-                level = int(para.style.name.split(' ')[-1])
-                if 1 <= level <= 6:
-                    current_headings[level - 1] = para.text.strip()
-                    for i in range(level, 6):
-                        current_headings[i] = ""
-                    current_heading_context = " > ".join(h for h in current_headings if h)
-            except ValueError:
-                continue
-        elif para.text.strip():
-            current_block += para.text + "\n"
-    
-    # Don't forget the last block
-    if current_block.strip():
-        content_blocks.append({
-            "content": current_block.strip(),
-            "heading_context": current_heading_context,
-            "knowledge_field": knowledge_field
-        })
+    # Paragraphs with their heading context
+    content_blocks = [dict(block, knowledge_field=knowledge_field) for block in ir.content_blocks()]
 
     # ENHANCED: Adaptive chunking based on document size and complexity
     total_content_length = sum(len(block['content']) for block in content_blocks)
@@ -882,7 +989,10 @@ def _process_pdf_for_knowledge_base(file_path: str) -> list[Document]:
     """
     Smarter PDF processing that extracts structure (headings) and adds it to chunks.
     Mirrors the logic of smart_chunk_document for DOCX files to improve searchability.
+    Parsing errors are raised, so the rebuild reports the document as failed and retries it next time.
     """
+    from unstructured.partition.auto import partition
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
     docs = []
     try:
         # Use unstructured to partition the PDF into structured elements.
@@ -950,18 +1060,353 @@ def _process_pdf_for_knowledge_base(file_path: str) -> list[Document]:
 
     except Exception as e:
         print(f"Error processing PDF {file_path} with smart chunking: {e}")
-        # On failure, return an empty list to avoid adding bad data to the vector store
-        return []
+        # Not an empty result: that would be recorded in the manifest as parsed and never retried
+        raise
         
     return docs
 
-def force_create_vector_store():
+# --- Incremental Knowledge Base Indexing ---
+# Each vector store generation contains a manifest with the content hash and the docstore IDs
+# of the chunks of every indexed document, so a rebuild only re-embeds changed files. It also
+# records the document's headings, which the document structure index is built from.
+VECTOR_STORE_MANIFEST_FILE = "manifest.json"
+VECTOR_STORE_MANIFEST_VERSION = 1  # Bump to force a full rebuild (e.g. after chunking changes)
+
+def _file_sha256(file_path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+def _load_vector_store_manifest(field_store_path: str):
+    """Returns the manifest of a field's vector store, or None if it is missing, outdated or unreadable."""
+    manifest_path = os.path.join(field_store_path, VECTOR_STORE_MANIFEST_FILE)
+    if not os.path.exists(manifest_path) or not os.path.exists(os.path.join(field_store_path, "index.faiss")):
+        return None
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Could not read vector store manifest {manifest_path}: {e}")
+        return None
+    if manifest.get("version") != VECTOR_STORE_MANIFEST_VERSION or manifest.get("embedding_model") != EMBEDDING_MODEL:
+        return None
+    return manifest
+
+def _write_vector_store_manifest(field_store_path: str, files: dict):
+    manifest = {
+        "version": VECTOR_STORE_MANIFEST_VERSION,
+        "embedding_model": EMBEDDING_MODEL,
+        "updated": datetime.now().isoformat(),
+        "files": files,
+    }
+    with open(os.path.join(field_store_path, VECTOR_STORE_MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+
+def _remove_field_vector_store(field: str):
+    import shutil
+    vector_stores.pop(field, None)
+    field_store_path = os.path.join(VECTOR_STORE_PATH, field)
+    if os.path.exists(field_store_path):
+        shutil.rmtree(field_store_path, ignore_errors=True)
+    answer_cache.invalidate_field(field)
+
+# --- Vector Store Generations ---
+# Every build of a field is written to its own generation directory
+# VECTOR_STORE_PATH/<field>/generations/<name>/. The 'current' symlink (plus a CURRENT pointer file,
+# used where symlinks are not available) names the generation that is served. A new generation is
+# validated before it is switched to, and older generations are kept for rollback.
+VECTOR_STORE_GENERATIONS_DIR = "generations"
+VECTOR_STORE_CURRENT_LINK = "current"
+VECTOR_STORE_CURRENT_POINTER = "CURRENT"
+VECTOR_STORE_KEEP_GENERATIONS = max(1, int(os.getenv("VECTOR_STORE_KEEP_GENERATIONS", "3")))
+VECTOR_STORE_LEGACY_FILES = ("index.faiss", "index.pkl", VECTOR_STORE_MANIFEST_FILE)
+
+def _field_generations_path(field: str) -> str:
+    return os.path.join(VECTOR_STORE_PATH, field, VECTOR_STORE_GENERATIONS_DIR)
+
+def list_vector_store_generations(field: str) -> list:
+    """Returns the complete generations of a field, oldest first."""
+    generations_path = _field_generations_path(field)
+    if not os.path.isdir(generations_path):
+        return []
+    return sorted(
+        name for name in os.listdir(generations_path)
+        if not name.startswith('.') and os.path.exists(os.path.join(generations_path, name, "index.faiss"))
+    )
+
+def get_current_generation(field: str):
+    """Returns the name of the generation a field is served from, or None."""
+    field_path = os.path.join(VECTOR_STORE_PATH, field)
+    link_path = os.path.join(field_path, VECTOR_STORE_CURRENT_LINK)
+    if os.path.islink(link_path):
+        return os.path.basename(os.path.normpath(os.readlink(link_path)))
+    pointer_path = os.path.join(field_path, VECTOR_STORE_CURRENT_POINTER)
+    if os.path.exists(pointer_path):
+        with open(pointer_path, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    return None
+
+def _resolve_field_store_path(field: str):
+    """Returns the directory of the served index of a field (current generation or pre-generation layout)."""
+    generation = get_current_generation(field)
+    if generation:
+        generation_path = os.path.join(_field_generations_path(field), generation)
+        if os.path.exists(os.path.join(generation_path, "index.faiss")):
+            return generation_path
+    legacy_path = os.path.join(VECTOR_STORE_PATH, field)
+    if os.path.exists(os.path.join(legacy_path, "index.faiss")):
+        return legacy_path
+    return None
+
+def _set_current_generation(field: str, generation: str):
+    """Atomically points a field at a generation: the pointer file and the symlink are replaced via os.replace."""
+    field_path = os.path.join(VECTOR_STORE_PATH, field)
+    tmp_suffix = uuid.uuid4().hex[:8]
+    pointer_tmp = os.path.join(field_path, f".{VECTOR_STORE_CURRENT_POINTER}.{tmp_suffix}")
+    with open(pointer_tmp, "w", encoding="utf-8") as f:
+        f.write(generation)
+    os.replace(pointer_tmp, os.path.join(field_path, VECTOR_STORE_CURRENT_POINTER))
+    link_tmp = os.path.join(field_path, f".{VECTOR_STORE_CURRENT_LINK}.{tmp_suffix}")
+    try:
+        os.symlink(os.path.join(VECTOR_STORE_GENERATIONS_DIR, generation), link_tmp, target_is_directory=True)
+        os.replace(link_tmp, os.path.join(field_path, VECTOR_STORE_CURRENT_LINK))
+    except (OSError, NotImplementedError) as e:
+        # e.g. Windows without symlink privilege - the pointer file is used instead
+        print(f"Could not create 'current' symlink for '{field}' ({e}); using the pointer file.")
+        link_path = os.path.join(field_path, VECTOR_STORE_CURRENT_LINK)
+        if os.path.islink(link_path):
+            os.remove(link_path)  # A stale link would take precedence over the pointer file
+
+def _cleanup_field_directory(field: str, keep: int = VECTOR_STORE_KEEP_GENERATIONS):
+    """Removes old generations beyond 'keep', unfinished builds and files of the pre-generation layout."""
+    import shutil
+    field_path = os.path.join(VECTOR_STORE_PATH, field)
+    current = get_current_generation(field)
+    if not current:
+        return
+    for name in VECTOR_STORE_LEGACY_FILES:
+        legacy_file = os.path.join(field_path, name)
+        if os.path.isfile(legacy_file):
+            os.remove(legacy_file)
+    generations_path = _field_generations_path(field)
+    for name in os.listdir(generations_path):
+        if name.startswith('.') and name.endswith('.building'):
+            shutil.rmtree(os.path.join(generations_path, name), ignore_errors=True)
+    generations = list_vector_store_generations(field)
+    for generation in generations[:max(0, len(generations) - keep)]:
+        if generation != current:
+            shutil.rmtree(os.path.join(generations_path, generation), ignore_errors=True)
+
+def _validate_vector_store(store, expected_chunks: int):
+    """Checks a freshly built store before it is served. Returns None if it is sound, otherwise the reason."""
+    if store.index.ntotal != expected_chunks:
+        return f"index contains {store.index.ntotal} vectors, expected {expected_chunks}"
+    if len(store.index_to_docstore_id) != store.index.ntotal:
+        return f"{len(store.index_to_docstore_id)} docstore IDs for {store.index.ntotal} vectors"
+    if expected_chunks == 0:
+        return None
+    # Test query: a stored vector must find its own chunk
+    position = expected_chunks // 2
+    try:
+        probe_vector = store.index.reconstruct(position)
+    except RuntimeError:
+        return None  # Index type without stored vectors; the count checks above have to do
+    expected_doc = store.docstore.search(store.index_to_docstore_id[position])
+    if not isinstance(expected_doc, Document):
+        return f"chunk {store.index_to_docstore_id[position]} is missing from the docstore"
+    results = store.similarity_search_by_vector(probe_vector.tolist(), k=1)
+    if not results or results[0].page_content != expected_doc.page_content:
+        return "test query did not return the expected chunk"
+    return None
+
+def _publish_vector_store_generation(field: str, store, manifest_files: dict, embeddings_model):
+    """
+    Writes a store as a new generation, validates the copy on disk and switches the field to it.
+    Returns (store loaded from the new generation, generation name). Raises ValueError if validation
+    fails; the previous generation keeps being served in that case.
+    """
+    import shutil
+    generations_path = _field_generations_path(field)
+    os.makedirs(generations_path, exist_ok=True)
+    generation = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    build_path = os.path.join(generations_path, f".{generation}.building")
+    generation_path = os.path.join(generations_path, generation)
+    try:
+        save_field_store(store, build_path)
+        _write_vector_store_manifest(build_path, manifest_files)
+        os.rename(build_path, generation_path)
+        # Validate the store exactly as it will be served (memory-mapped index, SQLite docstore)
+        expected_chunks = sum(len(entry["chunk_ids"]) for entry in manifest_files.values())
+        published_store = load_field_store(generation_path, embeddings_model)
+        problem = _validate_vector_store(published_store, expected_chunks)
+        if problem:
+            raise ValueError(f"Validation of the new index failed: {problem}")
+    except Exception:
+        shutil.rmtree(build_path, ignore_errors=True)
+        shutil.rmtree(generation_path, ignore_errors=True)
+        raise
+    _set_current_generation(field, generation)
+    # Replaces the registry entry at once: questions in flight keep using the previous store object
+    vector_stores[field] = published_store
+    _cleanup_field_directory(field)
+    return published_store, generation
+
+def rollback_vector_store(field: str, generation: str = None) -> str:
+    """
+    Serves an earlier generation of a field again (default: the one before the current one).
+    Returns the generation name.
+    """
+    generations = list_vector_store_generations(field)
+    current = get_current_generation(field)
+    if generation is None:
+        older = [name for name in generations if current is None or name < current]
+        if not older:
+            raise ValueError(f"No earlier generation of '{field}' to roll back to")
+        generation = older[-1]
+    elif generation not in generations:
+        raise ValueError(f"Generation '{generation}' of '{field}' does not exist")
+    store = load_field_store(os.path.join(_field_generations_path(field), generation), get_embeddings(EMBEDDING_MODEL))
+    _set_current_generation(field, generation)
+    vector_stores[field] = store
+    answer_cache.invalidate_field(field)
+    print(f"Knowledge field '{field}' rolled back to generation {generation}")
+    return generation
+
+# Documents are parsed in worker processes, so a slow hi_res PDF does not block the other files
+# and parsing runs in parallel to embedding. KB_PARSE_WORKERS=1 parses in-process, one file at a time.
+KB_PARSE_WORKERS = int(os.getenv("KB_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+KB_PARSE_TIMEOUT = float(os.getenv("KB_PARSE_TIMEOUT", "900"))  # Seconds per document
+# Parsed chunks are handed to the embedding stage in segments of at least this many chunks
+KB_EMBED_SEGMENT_SIZE = int(os.getenv("KB_EMBED_SEGMENT_SIZE", "256"))
+
+def _chunk_knowledge_document(doc_path: str) -> list:
+    """Returns the chunks of a DOCX or PDF document."""
+    if doc_path.lower().endswith('.docx'):
+        return smart_chunk_document(doc_path)
+    if doc_path.lower().endswith('.pdf'):
+        return _process_pdf_for_knowledge_base(doc_path)
+    return []
+
+def _parse_knowledge_document(doc_path: str):
+    """
+    Process pool entry point: returns (chunks, headings, parse seconds) for one document.
+    A DOCX is parsed once; its chunks and the headings for the structure index come from the same DocxIR.
+    """
+    start = time.perf_counter()
+    if doc_path.lower().endswith('.docx'):
+        ir = parse_docx(doc_path)
+        chunks, headings = smart_chunk_document(doc_path, ir), ir.headings
+    else:
+        chunks, headings = _chunk_knowledge_document(doc_path), extract_document_headings(doc_path)
+    return chunks, headings, time.perf_counter() - start
+
+def _parse_process_pool(workers: int) -> concurrent.futures.ProcessPoolExecutor:
+    """
+    Worker processes are spawned, not forked: the server process runs threads (job worker, HTTP
+    pools, streams), and a forked child can inherit a lock held by one of them and hang.
+    """
+    return concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+def _terminate_process_pool(executor):
+    """
+    Stops a process pool without waiting for documents that are still being parsed. Queued
+    documents are cancelled; running workers are terminated where the executor supports it
+    (ProcessPoolExecutor.terminate_workers, Python 3.14+). On older Pythons a running worker
+    finishes its current document in the background and exits; its result is discarded.
+    """
+    executor.shutdown(wait=False, cancel_futures=True)
+    terminate_workers = getattr(executor, "terminate_workers", None)
+    if terminate_workers is not None:
+        try:
+            terminate_workers()
+        except Exception as e:
+            print(f"Could not terminate parse workers: {e}")
+
+def _parse_knowledge_documents(documents: dict):
+    """
+    Parses {name: path} and yields ("parsed", name, chunks, seconds, headings) or ("failed", name, reason)
+    as soon as each document is done, in completion order.
+
+    Up to KB_PARSE_WORKERS documents are parsed in worker processes. A document that is still
+    being parsed after KB_PARSE_TIMEOUT seconds is reported as failed; its worker is terminated
+    once the remaining documents are done. If the caller stops early (e.g. a cancelled rebuild),
+    running workers are terminated instead of waited for.
+    """
+    workers = min(KB_PARSE_WORKERS, len(documents))
+    if workers <= 1:
+        for name, doc_path in documents.items():
+            try:
+                chunks, headings, seconds = _parse_knowledge_document(doc_path)
+            except Exception as e:
+                yield ("failed", name, str(e))
+                continue
+            yield ("parsed", name, chunks, seconds, headings)
+        return
+
+    executor = _parse_process_pool(workers)
+    timed_out, finished = False, False
+    try:
+        futures = {executor.submit(_parse_knowledge_document, doc_path): name for name, doc_path in documents.items()}
+        pending = set(futures)
+        started = {}
+        while pending:
+            done, pending = concurrent.futures.wait(pending, timeout=1.0, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                try:
+                    chunks, headings, seconds = future.result()
+                except Exception as e:
+                    yield ("failed", futures[future], str(e) or type(e).__name__)
+                    continue
+                yield ("parsed", futures[future], chunks, seconds, headings)
+
+            # The timeout counts from the moment a document was handed to a worker
+            now = time.monotonic()
+            for future in list(pending):
+                if not future.running():
+                    continue
+                if now - started.setdefault(future, now) > KB_PARSE_TIMEOUT:
+                    pending.discard(future)
+                    timed_out = True
+                    yield ("failed", futures[future], f"parsing timed out after {KB_PARSE_TIMEOUT:.0f}s")
+        finished = True
+    finally:
+        if timed_out or not finished:
+            _terminate_process_pool(executor)
+        else:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+def _embed_texts(embeddings_model, texts: list) -> dict:
+    """
+    Returns the embeddings for texts plus statistics. Embeddings found in the persistent embedding
+    cache are not requested from the API again, the rest is embedded by the EmbeddingScheduler
+    with several batches in flight.
+    """
+    all_embeddings = embedding_cache.get_many(EMBEDDING_MODEL, texts) if EMBEDDING_CACHE_ENABLED else [None] * len(texts)
+    missing = [i for i, embedding in enumerate(all_embeddings) if embedding is None]
+    missing_texts = [texts[j] for j in missing]
+    scheduler = EmbeddingScheduler(embeddings_model.embed_documents)
+    for batch in scheduler.iter_batches(missing_texts):
+        batch_texts = [missing_texts[k] for k in batch.indices]
+        for k, embedding in zip(batch.indices, batch.embeddings):
+            all_embeddings[missing[k]] = embedding
+        if EMBEDDING_CACHE_ENABLED:
+            embedding_cache.put_many(EMBEDDING_MODEL, batch_texts, batch.embeddings)
+    return {"embeddings": all_embeddings, "cached": len(texts) - len(missing), "rate_limited": scheduler.rate_limited}
+
+def force_create_vector_store(full_rebuild: bool = False):
     """
     Clean and simple knowledge base creation using smart chunking and pure semantic search.
     Relies entirely on the excellent multilingual embeddings for understanding German technical terms.
+
+    The rebuild is incremental: a per-field manifest records the content hash and chunk IDs of every
+    indexed document. Only added or changed documents are parsed and embedded, the vectors of changed
+    and deleted documents are removed from the existing index. The new index is written as a new
+    generation, validated and then switched to, so the previous generation keeps serving queries
+    until then and remains available for rollback_vector_store(). With full_rebuild=True (or without a valid manifest) a field is indexed from scratch.
     """
     global vector_stores
-    BATCH_SIZE = 64  # Optimized batch size for efficiency
     
     if not os.path.isdir(DOCUMENTS_PATH):
         yield "Documents directory not found. Knowledge base creation skipped."
@@ -975,108 +1420,175 @@ def force_create_vector_store():
         return
 
     yield f"Found {len(knowledge_fields)} knowledge fields: {', '.join(knowledge_fields)}"
-    
-    # Clear existing vector stores from memory
-    yield "Clearing existing vector stores from memory..."
-    vector_stores.clear()
-    gc.collect()
-    
-    # Remove existing vector store directory
-    if os.path.exists(VECTOR_STORE_PATH):
-        yield "Removing existing vector store directory..."
-        import shutil
-        try:
-            shutil.rmtree(VECTOR_STORE_PATH)
-        except OSError as e:
-            yield f"Warning: Could not remove vector store directory: {e}. Continuing with creation..."
+    if full_rebuild:
+        yield "Full rebuild requested - all documents will be re-indexed."
     
     os.makedirs(VECTOR_STORE_PATH, exist_ok=True)
 
+    # Remove vector stores of knowledge fields that no longer exist
+    for field_name in os.listdir(VECTOR_STORE_PATH):
+        if not field_name.startswith('.') and field_name not in knowledge_fields and os.path.isdir(os.path.join(VECTOR_STORE_PATH, field_name)):
+            yield f"Removing vector store of deleted knowledge field '{field_name}'..."
+            _remove_field_vector_store(field_name)
+
     # Initialize embeddings with the excellent multilingual model
-    embeddings_model = TogetherEmbeddings(model=EMBEDDING_MODEL, together_api_key=os.getenv("TOGETHER_API_KEY"))
+    embeddings_model = get_embeddings(EMBEDDING_MODEL)
+    knowledge_base_changed = False
     
     # Process each knowledge field separately
     for field in knowledge_fields:
         yield f"--- Processing Knowledge Field: {field} ---"
         field_path = os.path.join(DOCUMENTS_PATH, field)
+        field_save_path = os.path.join(VECTOR_STORE_PATH, field)
+        served_store_path = _resolve_field_store_path(field)
         doc_files = get_document_list(field_path)
 
         if not doc_files:
             yield f"No documents found for '{field}'. Skipping."
+            if os.path.exists(field_save_path):
+                _remove_field_vector_store(field)
+                knowledge_base_changed = True
             continue
 
-        yield f"Found {len(doc_files)} documents for '{field}'. Creating smart chunks..."
-        
-        all_docs = []
-        
-        for i, doc_path in enumerate(doc_files):
-            filename = os.path.basename(doc_path)
-            yield f"  - Processing document {i+1}/{len(doc_files)}: {filename}"
+        # --- Determine what changed since the last build ---
+        current_files = {os.path.relpath(doc_path, field_path): {"path": doc_path, "sha256": _file_sha256(doc_path)} for doc_path in doc_files}
+        manifest = None if full_rebuild or not served_store_path else _load_vector_store_manifest(served_store_path)
+        indexed_files = manifest["files"] if manifest else {}
+
+        added = [name for name in current_files if name not in indexed_files]
+        changed = [name for name in current_files if name in indexed_files and indexed_files[name]["sha256"] != current_files[name]["sha256"]]
+        deleted = [name for name in indexed_files if name not in current_files]
+
+        if manifest and not (added or changed or deleted):
+            yield f"No changes in '{field}' ({len(current_files)} documents) - keeping existing index."
+            continue
+
+        knowledge_base_changed = True
+        field_store = None
+        if manifest:
+            yield f"'{field}': {len(added)} added, {len(changed)} changed, {len(deleted)} deleted, {len(current_files) - len(added) - len(changed)} unchanged documents"
             try:
-                chunks = []
-                if doc_path.lower().endswith('.docx'):
-                    yield f"    - Using DOCX processor..."
-                    chunks = smart_chunk_document(doc_path)
-                    yield f"    - Created {len(chunks)} intelligent chunks from DOCX."
-                elif doc_path.lower().endswith('.pdf'):
-                    yield f"    - Using PDF processor..."
-                    chunks = _process_pdf_for_knowledge_base(doc_path)
-                    yield f"    - Created {len(chunks)} intelligent chunks from PDF."
-                
+                # Work on a copy loaded from disk; the in-memory store keeps serving queries
+                field_store = load_field_store(served_store_path, embeddings_model, writable=True)
+                stale_ids = [chunk_id for name in changed + deleted for chunk_id in indexed_files[name]["chunk_ids"]]
+                if stale_ids:
+                    field_store.delete(stale_ids)
+                    yield f"  - Removed {len(stale_ids)} outdated chunks from the index."
+            except Exception as e:
+                yield f"  - Could not update existing index incrementally ({e}). Rebuilding '{field}' from scratch..."
+                field_store = None
+
+        if field_store is None:
+            documents_to_index = list(current_files)
+            manifest_files = {}
+            yield f"Found {len(doc_files)} documents for '{field}'. Creating smart chunks..."
+        else:
+            documents_to_index = added + changed
+            manifest_files = {name: indexed_files[name] for name in current_files if name not in documents_to_index}
+
+        texts, metadatas, ids = [], [], []
+        documents = {name: current_files[name]["path"] for name in documents_to_index}
+        workers = max(1, min(KB_PARSE_WORKERS, len(documents)))
+        if documents:
+            yield f"  - Parsing {len(documents)} documents with {workers} worker process(es)..."
+        # Parsed chunks are embedded in a background thread while the remaining documents are parsed;
+        # the EmbeddingScheduler inside keeps several embedding requests in flight.
+        embed_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="kb-embed")
+        embedding_segments = []  # Futures in text order
+        segment_start = 0
+        parse_start, parse_seconds = time.perf_counter(), 0.0
+        try:
+            for done_count, event in enumerate(_parse_knowledge_documents(documents), 1):
+                name = event[1]
+                progress = f"{done_count}/{len(documents)}"
+                if event[0] == "failed":
+                    yield f"  - CRITICAL ERROR processing {os.path.basename(name)} ({progress}): {event[2]}"
+                    continue  # Not recorded in the manifest, so it is retried on the next rebuild
+
+                chunks, seconds, headings = event[2], event[3], event[4]
+                parse_seconds += seconds
+                chunk_ids = [uuid.uuid4().hex for _ in chunks]
+                # The headings are kept for the document structure index, so it does not parse the document again
+                manifest_files[name] = {"sha256": current_files[name]["sha256"], "chunk_ids": chunk_ids, "headings": headings}
                 if chunks:
-                    all_docs.extend(chunks)
-                    yield f"    - Successfully added {len(chunks)} chunks to the knowledge base."
+                    texts.extend(doc.page_content for doc in chunks)
+                    metadatas.extend(doc.metadata for doc in chunks)
+                    ids.extend(chunk_ids)
+                    yield f"  - Parsed {os.path.basename(name)} ({progress}) in {seconds:.1f}s: {len(chunks)} chunks"
                 else:
-                    yield f"    - WARNING: No chunks were created for this document. It might be empty or unreadable."
-
-            except Exception as e:
-                yield f"  - CRITICAL ERROR processing {filename}: {e}"
-                continue
+                    yield f"  - Parsed {os.path.basename(name)} ({progress}) in {seconds:.1f}s - WARNING: No chunks were created. It might be empty or unreadable."
+
+                if len(texts) - segment_start >= KB_EMBED_SEGMENT_SIZE:
+                    embedding_segments.append(embed_executor.submit(_embed_texts, embeddings_model, texts[segment_start:]))
+                    segment_start = len(texts)
+
+            if len(documents) > 1:
+                yield f"  - Parsed {len(documents)} documents in {time.perf_counter() - parse_start:.1f}s ({parse_seconds:.1f}s parse time in total)"
+
+            if texts:
+                if len(texts) > segment_start:
+                    embedding_segments.append(embed_executor.submit(_embed_texts, embeddings_model, texts[segment_start:]))
+                yield f"Creating embeddings for '{field}' with multilingual model..."
+                all_embeddings, rate_limited = [], 0
+                for number, future in enumerate(embedding_segments, 1):
+                    result = future.result()
+                    all_embeddings.extend(result["embeddings"])
+                    rate_limited += result["rate_limited"]
+                    yield f"  - Created embeddings for '{field}' (Segment {number} of {len(embedding_segments)}, {len(result['embeddings'])} chunks, {result['cached']} from the embedding cache)"
+                if rate_limited:
+                    yield f"  - Embedding API rate limits hit {rate_limited} times (requests were retried)"
+
+                yield f"Building semantic search index for '{field}'..."
+                text_embedding_pairs = list(zip(texts, all_embeddings))
+                if field_store is None:
+                    field_store = FAISS.from_embeddings(text_embedding_pairs, embeddings_model, metadatas=metadatas, ids=ids)
+                else:
+                    field_store.add_embeddings(text_embedding_pairs, metadatas=metadatas, ids=ids)
+        except Exception as e:
+            # The other fields are still updated; this one keeps its previous generation
+            yield f"  - ERROR: Updating the index of '{field}' failed ({e}). The previous index stays in use."
+            continue
+        finally:
+            embed_executor.shutdown(wait=False, cancel_futures=True)
 
-        if not all_docs:
+        if field_store is None or field_store.index.ntotal == 0:
             yield f"No content could be extracted from documents in '{field}'. Skipping."
+            _remove_field_vector_store(field)
             continue
 
-        yield f"Creating embeddings for '{field}' with multilingual model..."
-        
-        # Prepare texts and metadata for embedding
-        texts = [doc.page_content for doc in all_docs]
-        metadatas = [doc.metadata for doc in all_docs]
-
-        # Create embeddings in optimized batches
-        all_embeddings = []
-        total_batches = (len(texts) + BATCH_SIZE - 1) // BATCH_SIZE
-        for i in range(0, len(texts), BATCH_SIZE):
-            batch_texts = texts[i:i+BATCH_SIZE]
-            yield f"  - Creating embeddings for '{field}' (Batch {i//BATCH_SIZE + 1} of {total_batches})"
-            batch_embeddings = embeddings_model.embed_documents(batch_texts)
-            all_embeddings.extend(batch_embeddings)
-
-        yield f"Building semantic search index for '{field}'..."
-        text_embedding_pairs = list(zip(texts, all_embeddings))
-        
-        # Create the field-specific vector store
-        field_vector_store = FAISS.from_embeddings(text_embedding_pairs, embeddings_model, metadatas=metadatas)
-        
-        # Save it in its own directory
-        field_save_path = os.path.join(VECTOR_STORE_PATH, field)
-        os.makedirs(field_save_path, exist_ok=True)
-        field_vector_store.save_local(field_save_path)
+        # Write the new index as a new generation; the previous one keeps serving queries until
+        # the new one has been validated and switched to
+        try:
+            field_store, generation = _publish_vector_store_generation(field, field_store, manifest_files, embeddings_model)
+        except Exception as e:
+            yield f"  - ERROR: New index for '{field}' was not published ({e}). The previous index stays in use."
+            continue
+        yield f"  - Switched '{field}' to index generation {generation}"
+        invalidated = answer_cache.invalidate_field(field)
+        if invalidated:
+            yield f"  - Invalidated {invalidated} cached answers for '{field}'"
         
-        yield f"✅ Knowledge base for '{field}' successfully created with {len(all_docs)} intelligent chunks"
-
-    yield "--- Knowledge base creation complete. Loading into memory... ---"
-    # Reload all vector stores into memory
-    load_vector_store()
+        yield f"✅ Knowledge base for '{field}' successfully updated: {field_store.index.ntotal} intelligent chunks from {len(manifest_files)} documents"
+
+    yield "--- Knowledge base update complete. ---"
+    if EMBEDDING_CACHE_ENABLED:
+        cache_stats = embedding_cache.get_statistics()
+        yield f"Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses (hit rate {cache_stats['hit_rate']:.0%}), {cache_stats['size_mb']} MB"
+    # Cached answers from knowledge fields that no longer exist are dropped
+    vector_stores.refresh()
+    answer_cache.retain_fields(vector_stores.keys())
     
     # Create document structure index for fast pre-screening
-    yield "--- Creating document structure index for fast pre-screening... ---"
-    try:
-        create_document_structure_index(knowledge_fields)
-        yield "✅ Document structure index created successfully"
-    except Exception as e:
-        yield f"Warning: Could not create document structure index: {e}"
-        print(f"Error creating document structure index: {e}")
+    if knowledge_base_changed or not structure_index_exists(DOCUMENT_STRUCTURE_INDEX_BINARY_PATH, DOCUMENT_STRUCTURE_INDEX_PATH):
+        yield "--- Creating document structure index for fast pre-screening... ---"
+        try:
+            create_document_structure_index(knowledge_fields)
+            yield "✅ Document structure index created successfully"
+        except Exception as e:
+            yield f"Warning: Could not create document structure index: {e}"
+            print(f"Error creating document structure index: {e}")
+    else:
+        yield "No document changes - keeping existing document structure index."
     
     yield "🎉 Enhanced semantic search system with fast pre-screening ready!"
 
@@ -1089,6 +1601,7 @@ def analyze_pdf_complexity(file_path: str) -> dict:
         return {"complexity": "unknown", "use_fallback": True}
     
     try:
+        import fitz  # PyMuPDF
         doc = fitz.open(file_path)
         analysis = {
             'page_count': len(doc),
@@ -1136,74 +1649,126 @@ def analyze_pdf_complexity(file_path: str) -> dict:
         return {"complexity": "unknown", "use_fallback": True}
 
 def extract_text_with_pymupdf(file_path: str) -> str:
-    """Fast PDF text extraction using PyMuPDF."""
+    """Fast PDF text extraction using PyMuPDF (page ranges in parallel worker processes)."""
     if not PYMUPDF_AVAILABLE:
         raise ImportError("PyMuPDF not available")
     
-    doc = fitz.open(file_path)
-    text = ""
-    for page in doc:
-        text += page.get_text() + "\n\n"
-    doc.close()
-    return text
+    return extract_pdf_text(file_path, "pymupdf")
 
 def extract_text_with_pdfplumber(file_path: str) -> str:
-    """PDF text extraction with better table support using pdfplumber."""
+    """PDF text extraction with better table support using pdfplumber (page ranges in parallel worker processes)."""
     if not PDFPLUMBER_AVAILABLE:
         raise ImportError("pdfplumber not available")
     
-    text = ""
-    with pdfplumber.open(file_path) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n\n"
-    return text
+    return extract_pdf_text(file_path, "pdfplumber")
 
 def extract_text_with_unstructured(file_path: str, strategy: str = "fast") -> str:
     """PDF text extraction using unstructured with specified strategy."""
+    from unstructured.partition.auto import partition
     elements = partition(filename=file_path, include_metadata=True, strategy=strategy)
     return "\n\n".join([str(element) for element in elements if str(element).strip()])
 
+# Progress message every this many pages while a PDF is extracted page by page
+PDF_PROGRESS_PAGES = 25
+
+async def _stream_pdf_extraction(file_path: str, method: str, label: str, min_chars: int, cancellation_check=lambda: False):
+    """
+    Extracts a PDF page by page (page ranges in parallel worker processes). As soon as the text
+    extracted so far is longer than min_chars - so the method is known to succeed - it is yielded
+    as {"status": "partial", "text"} events in page order, and the caller can process early pages
+    while later ones are extracted. Ends with {"status": "complete", "text": whole text}, or
+    without a complete event if the whole text stays at or below min_chars. With method "auto"
+    the complete event also has "page_classes" ({page class: pages}, see pdf_pages.classify_page).
+
+    If page-wise extraction fails after text has been streamed, the remaining pages are extracted
+    in-process, one after the other, instead of failing the upload. A failure before that is
+    raised, so the caller can try another method.
+    """
+    parts, stripped_length, accepted = [], 0, False
+    page_classes = {}
+    next_page, failure = 0, None
+    try:
+        async for number, pages, text, page_class in aiter_pdf_pages(file_path, method):
+            if cancellation_check(): return
+            next_page = number + 1
+            page_classes[page_class] = page_classes.get(page_class, 0) + 1
+            if pages > PDF_PROGRESS_PAGES and (number + 1) % PDF_PROGRESS_PAGES == 0:
+                yield {"status": "processing", "message": f"Extracted page {number + 1} of {pages} ({label})..."}
+            if method == "pdfplumber" and not text:
+                continue  # pdfplumber pages without text are left out
+            part = text + "\n\n"
+            parts.append(part)
+            if accepted:
+                yield {"status": "partial", "text": part, "method": label}
+                continue
+            # The whole text, stripped, is at least as long as its stripped pages together
+            stripped_length += len(text.strip())
+            if stripped_length > min_chars:
+                accepted = True
+                yield {"status": "partial", "text": "".join(parts), "method": label}
+    except Exception as e:
+        if not accepted:
+            raise
+        failure = e
+
+    if failure is not None:
+        # The caller already processes the streamed pages, so only the rest is extracted again
+        fallback_method = "pdfplumber" if method == "pdfplumber" else "pymupdf"
+        print(f"Page-wise extraction of {os.path.basename(file_path)} failed after {next_page} pages ({failure}); "
+              f"extracting the remaining pages in-process with {fallback_method}")
+        yield {"status": "processing", "message": f"Extracting the remaining pages from page {next_page + 1} ({fallback_method})..."}
+        for text in await asyncio.to_thread(extract_pages_in_process, file_path, next_page, fallback_method):
+            if cancellation_check(): return
+            if method == "pdfplumber" and not text:
+                continue
+            part = text + "\n\n"
+            parts.append(part)
+            yield {"status": "partial", "text": part, "method": label}
+    text = "".join(parts)
+    if accepted or len(text.strip()) > min_chars:
+        complete = {"status": "complete", "text": text, "method": label}
+        if method == "auto":
+            summary = ", ".join(f"{count} {page_class}" for page_class, count in sorted(page_classes.items()))
+            print(f"Per-page extraction of {os.path.basename(file_path)}: {summary} pages")
+            complete["page_classes"] = page_classes
+        yield complete
+
 async def smart_pdf_extraction(file_path: str, cancellation_check=lambda: False):
     """
     Intelligently extracts text from PDF using the best available method.
-    Returns tuple of (text, method_used).
+    With PyMuPDF every page is classified and extracted with the method it needs (PyMuPDF for
+    text, pdfplumber for tables, OCR for scans), so only those pages pay for the slower
+    extractors; whole-document unstructured extraction is the fallback if that yields too little
+    text. Yields status events; the text of page-wise extractions is streamed as
+    {"status": "partial"} events before the final {"status": "complete", "text", "method"}.
     """
     try:
-        # Step 1: Analyze PDF complexity
-        yield {"status": "processing", "message": "Analyzing PDF structure..."}
-        analysis = await asyncio.to_thread(analyze_pdf_complexity, file_path)
-        
-        if cancellation_check(): return
-        
-        # Step 2: Try PyMuPDF first (fastest)
-        if PYMUPDF_AVAILABLE and analysis['complexity'] in ['simple', 'medium']:
+        # Step 1: Per-page extraction (PyMuPDF; pdfplumber for table pages, OCR for scanned pages),
+        # Step 2: pdfplumber for the whole document without PyMuPDF
+        page_methods = []
+        if PYMUPDF_AVAILABLE:
+            page_methods.append(("auto", "per page (PyMuPDF, pdfplumber for tables, OCR for scans)", 1000,
+                                 "Extracting text page by page (PyMuPDF; pdfplumber for table pages, OCR for scanned pages)..."))
+        elif PDFPLUMBER_AVAILABLE:
+            page_methods.append(("pdfplumber", "pdfplumber (table-optimized)", 500, "Extracting text with table-optimized method (pdfplumber)..."))
+        for method, label, min_chars, message in page_methods:
+            streamed = False
             try:
-                yield {"status": "processing", "message": "Extracting text with fast method (PyMuPDF)..."}
-                text = await asyncio.to_thread(extract_text_with_pymupdf, file_path)
-                if len(text.strip()) > 1000:  # Good extraction
-                    yield {"status": "complete", "text": text, "method": "PyMuPDF (fast)"}
-                    return
+                yield {"status": "processing", "message": message}
+                async for event in _stream_pdf_extraction(file_path, method, label, min_chars, cancellation_check):
+                    yield event
+                    if event["status"] == "complete":
+                        return
+                    streamed = streamed or event["status"] == "partial"
             except Exception as e:
-                print(f"PyMuPDF extraction failed: {e}")
-        
-        if cancellation_check(): return
-        
-        # Step 3: Try pdfplumber for tables
-        if PDFPLUMBER_AVAILABLE and analysis.get('has_tables', False):
-            try:
-                yield {"status": "processing", "message": "Extracting text with table-optimized method (pdfplumber)..."}
-                text = await asyncio.to_thread(extract_text_with_pdfplumber, file_path)
-                if len(text.strip()) > 500:  # Reasonable extraction
-                    yield {"status": "complete", "text": text, "method": "pdfplumber (table-optimized)"}
+                if streamed:
+                    # The caller already received part of this text, so no other method can take over
+                    yield {"status": "error", "message": f"{label} extraction failed: {e}"}
                     return
-            except Exception as e:
-                print(f"pdfplumber extraction failed: {e}")
-        
-        if cancellation_check(): return
+                print(f"{label} extraction failed: {e}")
+            if cancellation_check(): return
         
-        # Step 4: Try unstructured with fast strategy
+        # Step 3: Try unstructured with fast strategy
         try:
             yield {"status": "processing", "message": "Extracting text with structured method (unstructured-fast)..."}
             text = await asyncio.to_thread(extract_text_with_unstructured, file_path, "fast")
@@ -1215,7 +1780,8 @@ async def smart_pdf_extraction(file_path: str, cancellation_check=lambda: False)
         
         if cancellation_check(): return
         
-        # Step 5: Ask user for hi_res processing (slow but thorough)
+        # Step 4: Ask user for hi_res processing (slow but thorough)
+        analysis = await asyncio.to_thread(analyze_pdf_complexity, file_path)
         file_size_mb = analysis.get('file_size_mb', 0)
         estimated_time = "5-15 minutes" if file_size_mb > 10 else "2-5 minutes"
         
@@ -1234,17 +1800,70 @@ async def smart_pdf_extraction(file_path: str, cancellation_check=lambda: False)
     except Exception as e:
         yield {"status": "error", "message": f"All extraction methods failed: {e}"}
 
+# Uploads below this many characters are analysed as full text, longer ones are chunked for RAG
+UPLOAD_FULLTEXT_THRESHOLD = 200000
+# Once a PDF is known to be chunked, its text is chunked and embedded in segments of about this many
+# characters while the remaining pages are still being extracted
+UPLOAD_EMBED_SEGMENT_CHARS = 100000
+
+def _upload_text_splitter():
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter(
+        chunk_size=DEFAULT_CHUNK_SIZE,  # Reduced from 1500 for better granularity
+        chunk_overlap=DEFAULT_OVERLAP,  # Added overlap for better continuity
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
+
+async def _chunk_and_embed_upload_segment(text: str, embeddings, embed_lock: asyncio.Lock, cancellation_check=lambda: False) -> dict:
+    """
+    Chunks one text segment of an uploaded document and embeds the chunks. Chunks embedded before
+    come from the embedding cache; segments are embedded one at a time (embed_lock), each with
+    several token-budgeted batches in flight.
+    """
+    chunks = [chunk for chunk in await asyncio.to_thread(_upload_text_splitter().split_text, text) if chunk.strip()]
+    async with embed_lock:
+        if EMBEDDING_CACHE_ENABLED:
+            all_embeddings = await asyncio.to_thread(embedding_cache.get_many, EMBEDDING_MODEL, chunks)
+        else:
+            all_embeddings = [None] * len(chunks)
+        missing = [i for i, embedding in enumerate(all_embeddings) if embedding is None]
+        missing_texts = [chunks[i] for i in missing]
+
+        # 429s are retried with backoff
+        scheduler = EmbeddingScheduler(embeddings.embed_documents)
+        async for batch in scheduler.aiter_batches(missing_texts, cancellation_check=cancellation_check):
+            if cancellation_check():
+                break
+            batch_texts = [missing_texts[k] for k in batch.indices]
+            for k, embedding in zip(batch.indices, batch.embeddings):
+                all_embeddings[missing[k]] = embedding
+            if EMBEDDING_CACHE_ENABLED:
+                await asyncio.to_thread(embedding_cache.put_many, EMBEDDING_MODEL, batch_texts, batch.embeddings)
+    return {"chunks": chunks, "embeddings": all_embeddings, "cached": len(chunks) - len(missing)}
+
 async def create_vector_store_for_document(file_path: str, vector_store_path: str, cancellation_check=lambda: False):
     """
     Intelligently processes uploaded documents: uses full-text analysis for documents under 200k characters,
     RAG with chunking for larger documents. Only affects user-uploaded documents, not the global knowledge base.
+    The pages of a large PDF are chunked and embedded while its later pages are still being extracted.
     """
+    embed_lock = asyncio.Lock()
+    segment_tasks = []  # Chunking and embedding of the text segments, in text order
+    embeddings = None
+
+    def start_segment(text: str):
+        nonlocal embeddings
+        embeddings = embeddings or get_embeddings(EMBEDDING_MODEL)
+        segment_tasks.append(asyncio.create_task(_chunk_and_embed_upload_segment(text, embeddings, embed_lock, cancellation_check)))
+
+    text_parts, segmented_parts, segmented_length = [], 0, 0
     try:
         # Use smart extraction for PDFs
         if file_path.lower().endswith('.pdf'):
             extraction_complete = False
             extracted_text = ""
             method_used = ""
+            text_length = 0
             
             async for result in smart_pdf_extraction(file_path, cancellation_check):
                 if cancellation_check(): return
@@ -1254,12 +1873,22 @@ async def create_vector_store_for_document(file_path: str, vector_store_path: st
                 
                 if status == "processing":
                     yield {"status": "processing", "message": message}
+                elif status == "partial":
+                    # Pages in document order
+                    text_parts.append(result["text"])
+                    text_length += len(result["text"])
+                    # Already over the full-text limit, so the document will be chunked: start with the pages so far
+                    if text_length >= UPLOAD_FULLTEXT_THRESHOLD and text_length - segmented_length >= UPLOAD_EMBED_SEGMENT_CHARS:
+                        if not segment_tasks:
+                            yield {"status": "processing", "message": f"Document has more than {UPLOAD_FULLTEXT_THRESHOLD:,} characters - chunking and embedding pages while the rest is extracted..."}
+                        start_segment("".join(text_parts[segmented_parts:]))
+                        segmented_parts, segmented_length = len(text_parts), text_length
                 elif status == "user_confirmation_needed":
                     # For now, we'll auto-proceed. In a full implementation,
                     # this could be sent to the frontend for user decision
                     yield {"status": "processing", "message": "PDF requires advanced processing. Proceeding with thorough extraction..."}
                 elif status == "complete":
-                    extracted_text = result.get("text", "")
+                    extracted_text = "".join(text_parts) if text_parts else result.get("text", "")
                     method_used = result.get("method", "unknown")
                     extraction_complete = True
                     yield {"status": "processing", "message": f"Text extracted successfully using {method_used}"}
@@ -1278,6 +1907,7 @@ async def create_vector_store_for_document(file_path: str, vector_store_path: st
         else:
             # Use original method for non-PDF files
             yield {"status": "processing", "message": "Analyzing and partitioning document..."}
+            from unstructured.partition.auto import partition
             elements = await asyncio.to_thread(partition, filename=file_path, include_metadata=True, strategy="hi_res")
             if cancellation_check(): return
             full_text = "\n\n".join([str(element) for element in elements if str(element).strip()])
@@ -1286,9 +1916,8 @@ async def create_vector_store_for_document(file_path: str, vector_store_path: st
 
         # INTELLIGENT PROCESSING DECISION: Full-text vs RAG based on document size
         text_length = len(full_text)
-        FULLTEXT_THRESHOLD = 200000  # 200k characters
         
-        if text_length < FULLTEXT_THRESHOLD:
+        if text_length < UPLOAD_FULLTEXT_THRESHOLD:
             # Use full-text processing for better table analysis
             yield {"status": "processing", "message": f"Document size: {text_length:,} characters - Using full-text analysis for optimal results"}
             
@@ -1305,48 +1934,26 @@ async def create_vector_store_for_document(file_path: str, vector_store_path: st
             # Use traditional RAG processing for large documents
             yield {"status": "processing", "message": f"Document size: {text_length:,} characters - Using RAG with chunking for large document"}
             
-            # Use RecursiveCharacterTextSplitter for better chunking with overlap
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=DEFAULT_CHUNK_SIZE,  # Reduced from 1500 for better granularity
-                chunk_overlap=DEFAULT_OVERLAP,  # Added overlap for better continuity
-                separators=["\n\n", "\n", ". ", " ", ""]
-            )
-            
-            # Create documents with metadata
-            docs = []
-            chunks = text_splitter.split_text(full_text)
-            for i, chunk in enumerate(chunks):
-                if chunk.strip():
-                    docs.append(Document(
-                        page_content=chunk,
-                        metadata={
-                            "source": file_path,
-                            "chunk_id": i,
-                            "total_chunks": len(chunks)
-                        }
-                    ))
+            # Text not yet handed to a segment (all of it, unless early pages are already being embedded)
+            remaining_text = "".join(text_parts[segmented_parts:]) if segment_tasks else full_text
+            if remaining_text.strip():
+                start_segment(remaining_text)
 
-            if not docs:
+            yield {"status": "processing", "message": "Creating embeddings with optimized batching..."}
+            texts, all_embeddings = [], []
+            for number, task in enumerate(segment_tasks, 1):
+                segment = await task
+                if cancellation_check(): return
+                texts.extend(segment["chunks"])
+                all_embeddings.extend(segment["embeddings"])
+                yield {"status": "processing", "message": f"Processing embeddings part {number}/{len(segment_tasks)} ({len(segment['chunks'])} chunks, {segment['cached']} from the embedding cache)..."}
+
+            if not texts:
                 yield {"status": "error", "message": "Could not extract any text from the document. The document might be empty, image-based without readable text, or corrupted."}
                 return
 
-            yield {"status": "processing", "message": "Creating embeddings with optimized batching..."}
-            api_key = os.getenv("TOGETHER_API_KEY")
-            embeddings = TogetherEmbeddings(model=EMBEDDING_MODEL, together_api_key=api_key)
-            
-            # Optimized batch processing for embeddings
-            BATCH_SIZE = 64  # Increased batch size for better efficiency
-            all_embeddings = []
-            texts = [doc.page_content for doc in docs]
-            metadatas = [doc.metadata for doc in docs]
-            
-            total_batches = (len(texts) + BATCH_SIZE - 1) // BATCH_SIZE
-            for i in range(0, len(texts), BATCH_SIZE):
-                if cancellation_check(): return
-                batch_texts = texts[i:i+BATCH_SIZE]
-                yield {"status": "processing", "message": f"Processing embeddings batch {i//BATCH_SIZE + 1}/{total_batches}..."}
-                batch_embeddings = await asyncio.to_thread(embeddings.embed_documents, batch_texts)
-                all_embeddings.extend(batch_embeddings)
+            # Create documents with metadata
+            metadatas = [{"source": file_path, "chunk_id": i, "total_chunks": len(texts)} for i in range(len(texts))]
 
             # Create FAISS index with embeddings
             text_embedding_pairs = list(zip(texts, all_embeddings))
@@ -1363,110 +1970,95 @@ async def create_vector_store_for_document(file_path: str, vector_store_path: st
 
     except Exception as e:
         yield {"status": "error", "message": f"Error processing document: {e}"}
+    finally:
+        # Cancelled or failed uploads do not keep embedding in the background
+        for task in segment_tasks:
+            if not task.done():
+                task.cancel()
+
 
+def _load_upload_store(vector_store_path: str) -> tuple:
+    """Loads the RAG data of an uploaded document: ("fulltext", text) or ("vector", FAISS store)."""
+    fulltext_marker_path = os.path.join(vector_store_path, "fulltext_content.txt")
+    if os.path.exists(fulltext_marker_path):
+        with open(fulltext_marker_path, 'r', encoding='utf-8') as f:
+            return "fulltext", f.read()
+    return "vector", FAISS.load_local(vector_store_path, get_embeddings(EMBEDDING_MODEL), allow_dangerous_deserialization=True)
 
 async def get_answer_from_rag(conversation_history: list, vector_store_path: str, cancellation_check=lambda: False):
     """
     Intelligently chooses between full-text analysis and RAG based on document processing method.
     Checks for fulltext marker and uses appropriate processing method.
     """
+    condense_task = None
     try:
-        # Check if this document was processed with full-text analysis
-        fulltext_marker_path = os.path.join(vector_store_path, "fulltext_content.txt")
+        # Loaded from disk on the first question only; follow-up questions reuse the cached handle
+        rag_start = time.perf_counter()
+        handle_kind, handle = await asyncio.to_thread(upload_store_cache.get, vector_store_path, _load_upload_store)
         
-        if os.path.exists(fulltext_marker_path):
+        # Check if this document was processed with full-text analysis
+        if handle_kind == "fulltext":
             # Use full-text analysis for better table/structured data processing
             yield {"type": "status", "data": "Using full-text analysis (optimal for tables and structured data)..."}
             
-            # Read the full document content
-            with open(fulltext_marker_path, 'r', encoding='utf-8') as f:
-                document_content = f.read()
-            
             # Use the direct document processing function
-            async for result in get_answer_from_document(conversation_history, document_content, file_type="text", cancellation_check=cancellation_check):
+            async for result in get_answer_from_document(conversation_history, handle, file_type="text", cancellation_check=cancellation_check):
                 yield result
             return
         
         # Fall back to traditional RAG processing
         yield {"type": "status", "data": "Loading document context..."}
-        api_key = os.getenv("TOGETHER_API_KEY")
-        client = Together(api_key=api_key)
-        embeddings = TogetherEmbeddings(model=EMBEDDING_MODEL, together_api_key=api_key)
+        timings = {"load document": time.perf_counter() - rag_start}
+        client = get_together_client()
+        embeddings = get_embeddings(EMBEDDING_MODEL)
         last_question = conversation_history[-1]['content']
-        
-        # Load the vector store. This is synchronous.
-        vector_store = await asyncio.to_thread(FAISS.load_local, vector_store_path, embeddings, allow_dangerous_deserialization=True)
-        
-        # Optimized retrieval: Increased for better table coverage
-        retriever = vector_store.as_retriever(search_kwargs={"k": 15})  # Increased for better coverage
+        vector_store = handle
+        # Condensing a follow-up into a standalone question runs while the document is searched and reranked
+        condense_task = _start_timed_task(timings, "condense question", asyncio.to_thread(
+            condense_question_with_history, client, conversation_history, cancellation_check))
         
         # Simplified query expansion - limit to 2 additional queries max
         yield {"type": "status", "data": "Optimizing search queries..."}
         expanded_queries = await asyncio.to_thread(expand_query_with_llm_optimized, client, conversation_history, cancellation_check)
         if cancellation_check(): return
-
-        # Retrieve documents for all expanded queries
-        all_docs = []
-        tasks = [retriever.ainvoke(query) for query in expanded_queries]
-        retrieved_results = await asyncio.gather(*tasks)
-        for result in retrieved_results:
-            if cancellation_check(): return
-            all_docs.extend(result)
-        
-        # Get unique documents
-        docs = list({(doc.page_content, doc.metadata.get('source', 'N/A')): doc for doc in all_docs}.values())
+        if not expanded_queries:
+            expanded_queries = [last_question]
+
+        # Retrieve documents for all expanded queries (k=15 each, increased for better table coverage):
+        # one embedding request for all queries, one index search, best score per chunk
+        query_vectors = await asyncio.to_thread(embed_queries, embeddings, expanded_queries)
+        best_scores = await asyncio.to_thread(best_position_scores, vector_store, query_vectors, 15)
+        positions = sorted(best_scores, key=best_scores.get, reverse=True)
         if cancellation_check(): return
 
         # Two-stage re-ranking for better performance
-        if docs:
+        docs = []
+        if positions:
             yield {"type": "status", "data": "Smart re-ranking for relevance..."}
             
             # Stage 1: Fast similarity filtering if we have too many docs
-            if len(docs) > 25:  # Increased threshold to be less aggressive
-                # Quick cosine similarity filtering
-                doc_embeddings = await asyncio.to_thread(embeddings.embed_documents, [doc.page_content for doc in docs])
-                query_embedding = await asyncio.to_thread(embeddings.embed_query, last_question)
-                
-                # Calculate cosine similarities
-                import numpy as np
-                similarities = []
-                for doc_emb in doc_embeddings:
-                    similarity = np.dot(query_embedding, doc_emb) / (np.linalg.norm(query_embedding) * np.linalg.norm(doc_emb))
-                    similarities.append(similarity)
-                
-                # Keep top 18 based on cosine similarity (increased from 10)
-                doc_sim_pairs = list(zip(docs, similarities))
-                doc_sim_pairs.sort(key=lambda x: x[1], reverse=True)
-                docs = [doc for doc, sim in doc_sim_pairs[:18]]
+            if len(positions) > 25:  # Increased threshold to be less aggressive
+                # Cosine similarity to the question (first query) using the vectors stored in the index
+                try:
+                    stored_vectors = await asyncio.to_thread(reconstruct_vectors, vector_store, positions)
+                    # Keep top 18 based on cosine similarity (increased from 10)
+                    scored_positions = [(positions[row], similarity) for row, similarity in top_by_cosine(stored_vectors, query_vectors[0], 18)]
+                except Exception as e:
+                    print(f"Could not read stored vectors ({e}) - filtering by search score")
+                    scored_positions = [(position, best_scores[position]) for position in positions[:18]]
+            else:
+                scored_positions = [(position, best_scores[position]) for position in positions]
+            scored_docs = merge_scored_results(documents_for_positions(vector_store, scored_positions))
             
-            # Stage 2: Cross-encoder re-ranking on filtered docs using cached model
-            reranker_model = await get_cached_reranker()
-            pairs = [[last_question, doc.page_content] for doc in docs]
-            scores = await asyncio.to_thread(reranker_model.predict, pairs)
-            scored_docs = sorted(list(zip(scores, docs)), key=lambda x: x[0], reverse=True)
-            docs = [doc for score, doc in scored_docs[:7]] # Keep top 7
-
-        # Create a new retriever with the re-ranked documents
-        if docs:
-            new_vector_store = await asyncio.to_thread(FAISS.from_documents, docs, embeddings)
-            retriever = new_vector_store.as_retriever()
-
-        llm = ChatTogether(
-            model=LLM_MODEL,
-            temperature=0.0,
-            max_tokens=2048,
-            together_api_key=api_key
-        )
-
-        # Set up memory
-        memory = ConversationBufferMemory(memory_key='chat_history', return_messages=True)
-        for msg in conversation_history[:-1]: # Populate memory with previous messages
-            if msg['role'] == 'user':
-                memory.chat_memory.add_user_message(msg['content'])
-            elif msg['role'] == 'assistant':
-                memory.chat_memory.add_ai_message(msg['content'])
+            # Stage 2: Cross-encoder re-ranking on filtered docs; keeps the vector order if over its latency budget
+            reranked_docs, rerank_info = await asyncio.to_thread(get_reranker().rerank, last_question, scored_docs, 7)  # Keep top 7
+            docs = [doc for doc, _ in reranked_docs]
+            if rerank_info["reranked"]:
+                print(f"Reranked {len(scored_docs)} chunks in {rerank_info['seconds'] * 1000:.0f}ms ({rerank_info['cache_hits']} cached scores)")
+            else:
+                print(f"Reranking skipped: {rerank_info['reason']} - using vector score order")
 
-        # Create the conversational chain with generic document analysis prompt
+        # Generic document analysis prompt; the selected chunks are passed as they are (no second embedding round)
         prompt_template = """Sie sind ein Experte für Dokumentenanalyse und Informationsextraktion. Ihre Aufgabe ist es, die Frage des Benutzers basierend *ausschließlich* auf dem bereitgestellten Kontext aus einem Dokument zu beantworten.
 
 **INTELLIGENTE ABKÜRZUNGS- UND BEGRIFFSERKENNUNG:**
@@ -1500,39 +2092,30 @@ async def get_answer_from_rag(conversation_history: list, vector_store_path: str
 {question}
 
 Antwort:"""
-        QA_PROMPT = PromptTemplate(
-            template=prompt_template, input_variables=["context", "question"]
-        )
-
-        qa_chain = ConversationalRetrievalChain.from_llm(
-            llm=llm,
-            retriever=retriever,
-            memory=memory,
-            verbose=False, # for debugging
-            combine_docs_chain_kwargs={"prompt": QA_PROMPT}
-        )
+        # The standalone question from the parallel condense step replaces the follow-up question
+        standalone_question = await condense_task
+        if cancellation_check(): return
+        context = "\n\n".join(doc.page_content for doc in docs)
+        messages = [{"role": "user", "content": prompt_template.format(context=context, question=standalone_question)}]
 
         yield {"type": "status", "data": "Formulating answer from document..."}
-        last_question = conversation_history[-1]['content']
-
-        # The chain's `ainvoke` will handle history and retrieval
-        response = await qa_chain.ainvoke({"question": last_question})
-        answer = response.get("answer", "I could not find an answer in the document.")
-
-        # Since the chain doesn't stream, we stream the final answer manually
-        # In a real scenario, you might use a custom streaming chain.
-        # For now, we simulate the streaming behavior.
-        
-        # First, send metadata
-        sources_text = "\n".join(sorted(list(set([f"- {os.path.basename(doc.metadata.get('source', 'Unknown'))}" for doc in response.get('source_documents', [])]))))
+        sources_text = "\n".join(sorted(set(f"- {os.path.basename(doc.metadata.get('source', 'Unknown'))}" for doc in docs)))
         yield {"type": "meta", "data": {"sources": f"**Document sources:**\n{sources_text}", "keywords": "N/A", "follow_ups": [], "source_mode": "rag_document"}}
 
-        # Then, stream the answer
-        chunk_size = 20
-        for i in range(0, len(answer), chunk_size):
+        # Stream the answer tokens as they arrive
+        answer_started = False
+        async for chunk in async_stream_completion(client, LLM_MODEL, messages, 0.0, cancellation_check=cancellation_check):
             if cancellation_check(): return
-            yield {"type": "chunk", "data": answer[i:i+chunk_size]}
-            await asyncio.sleep(0.01) # small delay to simulate streaming
+            if chunk.choices and chunk.choices[0].delta.content:
+                if not answer_started:
+                    answer_started = True
+                    timings["time to first chunk"] = time.perf_counter() - rag_start
+                yield {"type": "chunk", "data": chunk.choices[0].delta.content}
+        if cancellation_check(): return
+        if not answer_started:
+            yield {"type": "chunk", "data": "I could not find an answer in the document."}
+        timings["total"] = time.perf_counter() - rag_start
+        print(f"Document answer timings: {_format_step_timings(timings)}")
 
         yield {"type": "end"}
 
@@ -1542,42 +2125,20 @@ Antwort:"""
         yield {"type": "meta", "data": {"sources": "No sources", "keywords": "N/A", "follow_ups": []}}
         yield {"type": "chunk", "data": error_message}
         yield {"type": "end"}
+    finally:
+        if condense_task is not None and not condense_task.done():
+            condense_task.cancel()
 
 
-# --- Cached Reranker Model ---
-_cached_reranker = None
-
-async def get_cached_reranker():
+def init():
     """
-    Returns a cached reranker model instance for better performance.
-    Creates the model on first use and reuses it for subsequent calls.
+    Startup hook, called from the FastAPI startup event: registers the knowledge base vector
+    stores (loaded on first use), creates the web cache directory and starts loading the
+    reranker model in the background. Importing this module has no such side effects.
     """
-    global _cached_reranker
-    if _cached_reranker is None:
-        try:
-            # Use a simple dummy reranker for now since we don't have sentence-transformers installed
-            # In a production environment, you would use something like:
-            # from sentence_transformers import CrossEncoder
-            # _cached_reranker = CrossEncoder('cross-encoder/ms-marco-MiniLM-L-12-v2')
-            class DummyReranker:
-                def predict(self, pairs):
-                    # Simple fallback: return scores based on query length match
-                    import random
-                    return [random.uniform(0.3, 0.9) for _ in pairs]
-            
-            _cached_reranker = DummyReranker()
-        except Exception as e:
-            print(f"Error initializing reranker: {e}")
-            # Fallback dummy reranker
-            class DummyReranker:
-                def predict(self, pairs):
-                    import random
-                    return [random.uniform(0.3, 0.9) for _ in pairs]
-            _cached_reranker = DummyReranker()
-    
-    return _cached_reranker
-
-load_vector_store()
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    load_vector_store()
+    get_reranker().warm_up()
 
 
 # --- Conversational AI Functions ---
@@ -1802,6 +2363,32 @@ def expand_query_with_llm_optimized(client, conversation_history: list, cancella
         print(f"Error during optimized query expansion: {e}")
         return [conversation_history[-1]['content']]
 
+def condense_question_with_history(client, conversation_history: list, cancellation_check=lambda: False) -> str:
+    """
+    Rephrases the latest question as a standalone question using the chat history (the
+    condense step of ConversationalRetrievalChain). Returns the question unchanged for the
+    first message of a chat or if the call fails.
+    """
+    last_question = conversation_history[-1]['content']
+    history = [msg for msg in conversation_history[:-1] if msg['role'] in ['user', 'assistant']]
+    if not history:
+        return last_question
+    chat_history = "\n".join(f"{'Human' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}" for msg in history)
+    prompt = f"""Given the following conversation and a follow up question, rephrase the follow up question to be a standalone question, in its original language.
+
+Chat History:
+{chat_history}
+Follow Up Input: {last_question}
+Standalone question:"""
+    try:
+        if cancellation_check(): return last_question
+        response = robust_api_call(client, LLM_MODEL, [{"role": "user", "content": prompt}], 0.0, cancellation_check=cancellation_check)
+        if response.choices and response.choices[0].message.content:
+            return response.choices[0].message.content.strip()
+    except Exception as e:
+        print(f"Error condensing question: {e}")
+    return last_question
+
 def generate_follow_up_questions(client, conversation_history: list, answer: str, context: str) -> list[str]:
     system_prompt = """You are a creative and helpful assistant. Your primary goal is to keep the conversation going by providing insightful follow-up questions.
 
@@ -1825,6 +2412,29 @@ Based on the user's question, the provided answer, and the available context, ge
         pass
     return []
 
+async def stream_answer_with_follow_ups(client, model: str, messages: list, temperature: float, conversation_history: list, follow_up_context: str, cancellation_check=lambda: False):
+    """
+    Streams the answer exactly once and collects it while streaming.
+    Follow-up questions are generated from the collected answer afterwards and
+    yielded as a separate 'follow_ups' event, so the answer is never generated twice.
+    """
+    if cancellation_check(): return
+    collected_chunks = []
+    async for chunk in async_stream_completion(client, model, messages, temperature, cancellation_check=cancellation_check):
+        if cancellation_check(): return
+        if chunk.choices and chunk.choices[0].delta.content:
+            content = chunk.choices[0].delta.content
+            collected_chunks.append(content)
+            yield {"type": "chunk", "data": content}
+
+    if cancellation_check(): return
+    answer = "".join(collected_chunks).strip()
+    if not answer:
+        return
+    follow_ups = await asyncio.to_thread(generate_follow_up_questions, client, conversation_history, answer, follow_up_context)
+    if follow_ups:
+        yield {"type": "follow_ups", "data": follow_ups}
+
 def can_answer_without_context(client, conversation_history: list) -> bool:
     """
     Checks if the LLM can answer the question without any external context.
@@ -2020,43 +2630,31 @@ def extract_context_keywords(client, conversation_history: list) -> list[str]:
         # PERFORMANCE OPTIMIZATION: Return empty list on error instead of crashing
         return []
 
-def evaluate_vector_store_quality(docs: list, last_question: str, min_docs: int = 3, min_avg_score: float = 0.3, high_quality_threshold: float = 0.7) -> dict:
+def evaluate_vector_store_quality(scored_docs: list, last_question: str, min_docs: int = 3, min_avg_score: float = None, high_quality_threshold: float = None) -> dict:
     """
     Evaluates the quality of vector store results to determine if fallback is needed.
+    Uses the similarity scores of the retrieved (doc, score) pairs; scores below
+    RETRIEVAL_LOW_SIMILARITY count as irrelevant, scores above RETRIEVAL_HIGH_SIMILARITY as highly relevant.
     Now prioritizes quality over quantity - allows fewer documents if they are highly relevant.
     Returns a dict with 'quality_sufficient', 'reason', and 'stats'.
     """
-    if not docs:
+    if min_avg_score is None:
+        min_avg_score = RETRIEVAL_LOW_SIMILARITY
+    if high_quality_threshold is None:
+        high_quality_threshold = RETRIEVAL_HIGH_SIMILARITY
+    
+    if not scored_docs:
         return {
             "quality_sufficient": False, 
             "reason": "Keine Dokumente gefunden",
             "stats": {"doc_count": 0, "avg_score": 0.0}
         }
     
-    # Simple content relevance check - look for key terms from question in documents
-    question_words = set(last_question.lower().split())
-    # Remove common German stop words
-    stop_words = {'der', 'die', 'das', 'und', 'oder', 'aber', 'ist', 'sind', 'hat', 'haben', 'von', 'zu', 'mit', 'auf', 'in', 'für', 'was', 'wie', 'wo', 'wann', 'warum'}
-    question_words = question_words - stop_words
-    
-    if not question_words:
-        # If no meaningful words left, assume it's complex enough
-        return {
-            "quality_sufficient": True,
-            "reason": "Komplexe Abfrage - Vector Store wird verwendet",
-            "stats": {"doc_count": len(docs), "avg_score": 1.0}
-        }
-    
-    # Calculate relevance scores for each document
-    relevance_scores = []
-    for doc in docs:
-        doc_content = doc.page_content.lower()
-        matches = sum(1 for word in question_words if word in doc_content)
-        score = matches / len(question_words) if question_words else 0
-        relevance_scores.append(score)
-    
+    # Only documents that are at least plausibly relevant count towards the minimum
+    relevance_scores = [score for _, score in scored_docs]
+    docs = [doc for doc, score in scored_docs if score >= RETRIEVAL_LOW_SIMILARITY]
     avg_score = sum(relevance_scores) / len(relevance_scores)
-    max_score = max(relevance_scores) if relevance_scores else 0
+    max_score = max(relevance_scores)
     
     # NEW LOGIC: Prioritize quality over quantity
     
@@ -2124,7 +2722,55 @@ def detect_explicit_web_search_request(user_question: str) -> bool:
     user_question_lower = user_question.lower()
     return any(keyword in user_question_lower for keyword in web_search_keywords)
 
+# --- Question Embeddings ---
+@functools.lru_cache(maxsize=256)
+def embed_query_cached(text: str) -> tuple:
+    """
+    Embeds a question once per process. The local router and the answer cache both
+    need the embedding of the same question, this avoids a second embedding request.
+    """
+    return tuple(get_embeddings(EMBEDDING_MODEL).embed_query(text))
+
+def detect_question_language(text: str) -> str:
+    try:
+        return detect(text)
+    except LangDetectException:
+        return "unknown"
+
+# --- Local Query Router ---
+_local_query_router = None
+_local_query_router_lock = threading.Lock()
+
+def get_local_query_router() -> LocalQueryRouter:
+    """Returns the local first-stage router, loading the trained model on first use."""
+    global _local_query_router
+    if _local_query_router is None:
+        with _local_query_router_lock:
+            if _local_query_router is None:
+                _local_query_router = LocalQueryRouter.load(
+                    QUERY_ROUTER_MODEL_PATH,
+                    embed_fn=embed_query_cached,
+                    embedding_model=EMBEDDING_MODEL,
+                )
+    return _local_query_router
+
 def route_query(client, conversation_history: list, cancellation_check=lambda: False) -> str:
+    """
+    Classifies the user's query to determine the best information source.
+    The local router (keyword rules + embedding centroids) decides first; only when it is
+    not confident the LLM router is asked.
+    Returns 'vector_store', 'web_search', 'direct_answer', or 'image_generation'.
+    """
+    if cancellation_check(): return "direct_answer"
+    start = time.perf_counter()
+    label, confidence, reason = get_local_query_router().classify(conversation_history[-1]['content'])
+    if label:
+        print(f"Query routed locally to {label} in {(time.perf_counter() - start) * 1000:.0f}ms ({reason})")
+        return label
+    print(f"Local routing not confident ({reason}) - asking LLM router")
+    return route_query_with_llm(client, conversation_history, cancellation_check)
+
+def route_query_with_llm(client, conversation_history: list, cancellation_check=lambda: False) -> str:
     """
     Classifies the user's query to determine the best information source using a powerful LLM.
     Returns 'vector_store', 'web_search', 'direct_answer', or 'image_generation'.
@@ -2189,8 +2835,7 @@ Respond with ONLY one of the following keywords: `vector_store`, `web_search`, `
 
 
 # --- Web Search Cache ---
-CACHE_DIR = os.path.join(SCRIPT_DIR, "web_cache")
-os.makedirs(CACHE_DIR, exist_ok=True)
+CACHE_DIR = os.path.join(SCRIPT_DIR, "web_cache")  # Created by init() or on the first cache write
 
 def get_url_hash(url: str) -> str:
     """Generate a hash for URL to use as cache key."""
@@ -2216,6 +2861,7 @@ def cache_content(url: str, content: str) -> None:
     """Cache content for a URL."""
     cache_file = os.path.join(CACHE_DIR, f"{get_url_hash(url)}.json")
     try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
         cache_data = {
             'url': url,
             'content': content,
@@ -2229,6 +2875,7 @@ def cache_content(url: str, content: str) -> None:
 def smart_content_extraction(html: str) -> str:
     """Extract only relevant content from HTML, focusing on paragraphs and articles."""
     try:
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(html, 'html.parser')
         
         # Remove unwanted elements
@@ -2473,6 +3120,104 @@ def check_for_ambiguity(client, conversation_history: list, cancellation_check=l
     # Even clear questions like "Wie erzeuge ich ein Bild?" were triggering clarifications
     return {"clarification_needed": False}
 
+# Chunk size used when replaying a cached answer as a stream
+CACHED_ANSWER_CHUNK_SIZE = 200
+
+# --- Parallel Decision Stage Helpers ---
+def _start_timed_task(timings: dict, name: str, coro) -> asyncio.Task:
+    """Starts a coroutine as a task and records its duration (seconds) in timings[name]."""
+    async def runner():
+        start = time.perf_counter()
+        try:
+            result = await coro
+        except asyncio.CancelledError:
+            timings[f"{name} (cancelled)"] = time.perf_counter() - start
+            raise
+        timings[name] = time.perf_counter() - start
+        return result
+    return asyncio.create_task(runner())
+
+def _cancel_branch(task: asyncio.Task, cancel_event: threading.Event):
+    """
+    Cancels a speculative branch. The event stops the worker thread at its next
+    cancellation check; the task itself is cancelled so nobody waits for it.
+    """
+    cancel_event.set()
+    if task and not task.done():
+        task.cancel()
+
+async def _await_speculative(task: asyncio.Task):
+    """Returns the result of a speculative task, or None if it was cancelled or failed."""
+    if task is None:
+        return None
+    try:
+        # Shielded so that cancelling the caller does not cancel the shared task and vice versa
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        if not task.cancelled():
+            raise  # The caller itself is being cancelled
+        return None
+    except Exception as e:
+        print(f"Speculative task failed: {e}")
+        return None
+
+def _format_step_timings(timings: dict) -> str:
+    return ", ".join(f"{name} {duration:.2f}s" for name, duration in timings.items())
+
+def _accessible_field_selection(user_email: str, selected_fields: list):
+    """
+    The knowledge fields a question may search: None (all fields) if nothing is selected and there
+    is no user to check, otherwise the selected fields - or all fields, if none are selected - that
+    the user may access. An empty list means nothing may be searched.
+    """
+    if not selected_fields:
+        return filter_accessible_fields(user_email, list(vector_stores)) if user_email else None
+    return filter_accessible_fields(user_email, selected_fields) if user_email else list(selected_fields)
+
+def _select_target_fields(selected_fields: list) -> list:
+    """
+    Returns the selected knowledge fields that have a vector store: all of them for None, none for
+    an empty list (see _accessible_field_selection).
+    """
+    if selected_fields is None:
+        return list(vector_stores)
+    return [field for field in selected_fields if field in vector_stores]
+
+def _select_target_stores(selected_fields: list) -> dict:
+    """
+    Returns the vector stores for the selected knowledge fields (all stores for None, none for an
+    empty list). Loads stores that are not in memory yet, so call it in a worker thread from async code.
+    """
+    stores = {}
+    for field in _select_target_fields(selected_fields):
+        store = vector_stores.get(field)  # None if the store could not be loaded
+        if store is not None:
+            stores[field] = store
+    return stores
+
+async def search_vector_stores(target_stores: dict, queries: list, k: int = 25, cancellation_check=lambda: False) -> tuple[dict, dict, dict]:
+    """
+    Embeds all queries with one request and searches every target store with the whole query matrix.
+    Returns (results, errors, stats): the (Document, score) pairs per field ordered by similarity,
+    the exception per failed field, and the embedding calls and search latencies (see retrieval.py).
+    """
+    return await batched_search(target_stores, queries, get_embeddings(EMBEDDING_MODEL), k=k, cancellation_check=cancellation_check)
+
+async def _embed_for_answer_cache(question: str):
+    """Question embedding for the answer cache lookup, or None if the embedding request fails."""
+    try:
+        return await asyncio.to_thread(embed_query_cached, question)
+    except Exception as e:
+        print(f"Answer cache lookup failed: {e}")
+        return None
+
+async def _speculative_retrieval(expansion_task: asyncio.Task, target_stores: dict, cancellation_check=lambda: False):
+    """Waits for the speculative query expansion and immediately searches the target stores with it."""
+    expanded_queries = await _await_speculative(expansion_task)
+    if cancellation_check() or not expanded_queries:
+        return None
+    return expanded_queries, await search_vector_stores(target_stores, expanded_queries, cancellation_check=cancellation_check)
+
 async def get_answer(conversation_history: list, source_mode: str = None, selected_fields: list = None, image_b64: str = None, user_email: str = None, cancellation_check=lambda: False):
     """
     Orchestrator for retrieving answers.
@@ -2480,8 +3225,14 @@ async def get_answer(conversation_history: list, source_mode: str = None, select
     It uses a persistent source_mode ('vector_store' or 'web_search') for the entire session.
     Now includes domain-based access control for knowledge fields.
     """
+    # Speculative branches of the decision stage (see below); cancelled when no longer needed
+    expansion_task = None
+    retrieval_task = None
+    speculative_tasks = []
+    # Set by a quality fallback response or by the mode decision below
+    determined_source_mode = None
     try:
-        client = Together(api_key=os.getenv("TOGETHER_API_KEY"))
+        client = get_together_client()
         last_question = conversation_history[-1]["content"]
 
         # --- QUALITY FALLBACK CLARIFICATION HANDLING ---
@@ -2507,12 +3258,27 @@ async def get_answer(conversation_history: list, source_mode: str = None, select
                 yield {"type": "end"}
                 return
 
+        # --- SEMANTIC ANSWER CACHE ---
+        # Standalone knowledge base questions (first message of a chat) are answered from the cache
+        # if a very similar question was answered from the same accessible knowledge fields before.
+        # The question is embedded here, alongside the decision stage; the cache is only consulted
+        # once the question has been routed to the knowledge base.
+        cache_key_fields = None
+        cache_embedding_task = None
+        if (ANSWER_CACHE_ENABLED and len(conversation_history) == 1 and not image_b64
+                and source_mode != "image_generation" and determined_source_mode is None
+                and not detect_explicit_web_search_request(last_question)):
+            cache_key_fields = sorted(_select_target_fields(_accessible_field_selection(user_email, selected_fields))) or None
+            if cache_key_fields:
+                cache_language = detect_question_language(last_question)
+                cache_embedding_task = asyncio.create_task(_embed_for_answer_cache(last_question))
+                speculative_tasks.append(cache_embedding_task)
+
         # --- AMBIGUITY CHECK ---
         # First, check if the user's query is ambiguous and needs clarification.
         # This is only necessary if no file has been uploaded (image_b64 is None).
         # Skip this check if we're handling a quality fallback response
-        if (not image_b64 and 
-            'determined_source_mode' not in locals()):
+        if not image_b64 and determined_source_mode is None:
             yield {"type": "status", "data": "Checking for ambiguity..."}
             ambiguity_result = await asyncio.to_thread(check_for_ambiguity, client, conversation_history, cancellation_check)
             if ambiguity_result.get("clarification_needed"):
@@ -2529,7 +3295,7 @@ async def get_answer(conversation_history: list, source_mode: str = None, select
         # If the session is already in image_generation mode, keep it there.
         if source_mode == "image_generation":
             determined_source_mode = "image_generation"
-        elif 'determined_source_mode' not in locals():
+        elif determined_source_mode is None:
             # Only do routing if we haven't already determined the source mode from quality fallback
             
             # STEP 1: Check for explicit web search request (HIGHEST PRIORITY)
@@ -2545,16 +3311,52 @@ async def get_answer(conversation_history: list, source_mode: str = None, select
                     yield {"type": "status", "data": "Web search disabled or not selected - falling back to direct answer"}
                     determined_source_mode = 'direct_answer'
             else:
-                # STEP 2: Check if we can answer from conversation context (Hybrid Approach)
-                yield {"type": "status", "data": "Analyzing conversation context..."}
+                # STEP 2: Parallel decision stage
+                # The context check, context quality assessment and routing are independent LLM calls,
+                # so they run at the same time. Query expansion and retrieval start speculatively while
+                # routing is still running; branches that turn out not to be needed are cancelled.
+                yield {"type": "status", "data": "Analyzing conversation context and routing query in parallel..."}
+                if cancellation_check(): return
+
+                decision_start = time.perf_counter()
+                decision_timings = {}
+                quality_cancelled = threading.Event()
+                route_cancelled = threading.Event()
+                expansion_cancelled = threading.Event()
+                retrieval_cancelled = threading.Event()
+
+                def branch_check(cancel_event):
+                    return lambda: cancellation_check() or cancel_event.is_set()
+
+                context_task = _start_timed_task(decision_timings, "context check", asyncio.to_thread(
+                    can_answer_from_conversation_context, client, conversation_history))
+                quality_task = _start_timed_task(decision_timings, "context quality", asyncio.to_thread(
+                    assess_context_quality_for_followup, client, conversation_history, branch_check(quality_cancelled)))
+                route_task = _start_timed_task(decision_timings, "routing", asyncio.to_thread(
+                    route_query, client, conversation_history, branch_check(route_cancelled)))
+                expansion_task = _start_timed_task(decision_timings, "query expansion", asyncio.to_thread(
+                    expand_query_with_llm, client, conversation_history, branch_check(expansion_cancelled)))
+                speculative_tasks.extend([context_task, quality_task, route_task, expansion_task])
+
+                speculative_stores = await asyncio.to_thread(
+                    _select_target_stores, _accessible_field_selection(user_email, selected_fields)
+                )
+                if speculative_stores:
+                    retrieval_task = _start_timed_task(decision_timings, "speculative retrieval", _speculative_retrieval(
+                        expansion_task, speculative_stores, branch_check(retrieval_cancelled)))
+                    speculative_tasks.append(retrieval_task)
+
+                can_use_context = await context_task
                 if cancellation_check(): return
-                
-                can_use_context = await asyncio.to_thread(can_answer_from_conversation_context, client, conversation_history)
                 
                 if can_use_context:
+                    _cancel_branch(route_task, route_cancelled)
                     # NEW: Additional context quality assessment for better fallback decisions
                     yield {"type": "status", "data": "Assessing context quality for comprehensive answer..."}
-                    context_quality = await asyncio.to_thread(assess_context_quality_for_followup, client, conversation_history, cancellation_check)
+                    context_quality = await quality_task
+                    if retrieval_task:
+                        _cancel_branch(retrieval_task, retrieval_cancelled)
+                        retrieval_task = None
                     
                     if context_quality["quality_score"] >= 0.6:  # High quality threshold
                         yield {"type": "status", "data": f"Context quality sufficient ({context_quality['quality_score']:.2f}) - using conversation context"}
@@ -2575,11 +3377,12 @@ async def get_answer(conversation_history: list, source_mode: str = None, select
                         yield {"type": "status", "data": f"Context quality acceptable ({context_quality['quality_score']:.2f}) - using conversation context"}
                         determined_source_mode = "context_answer"
                 else:
+                    _cancel_branch(quality_task, quality_cancelled)
                     # STEP 3: Normal routing logic for questions that need external sources
                     yield {"type": "status", "data": "Routing query for external sources..."}
                     if cancellation_check(): return
                     
-                    routed_mode = await asyncio.to_thread(route_query, client, conversation_history, cancellation_check)
+                    routed_mode = await route_task
 
                     # --- Routing logic with context enhancement ---
                     determined_source_mode = "direct_answer" # Default to direct answer
@@ -2611,6 +3414,18 @@ async def get_answer(conversation_history: list, source_mode: str = None, select
                     
                     yield {"type": "status", "data": f"Query routed to: {determined_source_mode.replace('_', ' ')}"}
 
+                # Cancel the speculative branches the chosen mode does not need
+                if determined_source_mode not in ("vector_store", "web_search"):
+                    _cancel_branch(expansion_task, expansion_cancelled)
+                    expansion_task = None
+                if determined_source_mode != "vector_store" and retrieval_task:
+                    _cancel_branch(retrieval_task, retrieval_cancelled)
+                    retrieval_task = None
+
+                decision_total = time.perf_counter() - decision_start
+                timing_summary = f"Decision stage took {decision_total:.2f}s (sum of steps: {sum(decision_timings.values()):.2f}s) - {_format_step_timings(decision_timings)}"
+                print(timing_summary)
+
         # --- Answer Generation based on determined mode ---
         if determined_source_mode == "image_generation":
             # Check if image generation feature is enabled
@@ -2652,22 +3467,12 @@ Be specific and reference the previous information directly."""
                 {"role": "user", "content": conversation_history[-1]['content']}
             ]
             
-            # Generate temporary answer for follow-ups
-            temp_response = await asyncio.to_thread(robust_api_call, client, LLM_MODEL, messages, 0.1, stream=False)
-            temp_answer = ""
-            if temp_response.choices and temp_response.choices[0].message.content:
-                temp_answer = temp_response.choices[0].message.content.strip()
-
-            follow_ups = await asyncio.to_thread(generate_follow_up_questions, client, conversation_history, temp_answer, "conversation context")
-            
-            yield {"type": "meta", "data": {"sources": "Conversation Context", "keywords": "N/A", "follow_ups": follow_ups, "source_mode": determined_source_mode}}
+            # Follow-ups are generated from the streamed answer and sent afterwards
+            yield {"type": "meta", "data": {"sources": "Conversation Context", "keywords": "N/A", "follow_ups": [], "source_mode": determined_source_mode}}
 
+            async for event in stream_answer_with_follow_ups(client, LLM_MODEL, messages, 0.1, conversation_history, "conversation context", cancellation_check):
+                yield event
             if cancellation_check(): return
-            stream = robust_api_call(client, LLM_MODEL, messages, 0.1, stream=True, cancellation_check=cancellation_check)
-            for chunk in stream:
-                if cancellation_check(): return
-                if chunk.choices and chunk.choices[0].delta.content:
-                    yield {"type": "chunk", "data": chunk.choices[0].delta.content}
             yield {"type": "end"}
             return
 
@@ -2683,105 +3488,119 @@ Be specific and reference the previous information directly."""
             system_prompt = "You are a helpful assistant. Answer the user's question based on your general knowledge and the conversation history."
             messages = create_contextual_messages(conversation_history, system_prompt)
             
-            temp_response = await asyncio.to_thread(robust_api_call, client, LLM_MODEL, messages, 0.1, stream=False)
-            temp_answer = ""
-            if temp_response.choices and temp_response.choices[0].message.content:
-                temp_answer = temp_response.choices[0].message.content.strip()
-
-            follow_ups = await asyncio.to_thread(generate_follow_up_questions, client, conversation_history, temp_answer, "")
-            
             # source_mode is None for direct answers
-            yield {"type": "meta", "data": {"sources": "General Knowledge", "keywords": "N/A", "follow_ups": follow_ups, "source_mode": None}}
+            yield {"type": "meta", "data": {"sources": "General Knowledge", "keywords": "N/A", "follow_ups": [], "source_mode": None}}
 
+            async for event in stream_answer_with_follow_ups(client, LLM_MODEL, messages, 0.1, conversation_history, "", cancellation_check):
+                yield event
             if cancellation_check(): return
-            stream = robust_api_call(client, LLM_MODEL, messages, 0.1, stream=True)
-            for chunk in stream:
-                if cancellation_check(): return
-                if chunk.choices and chunk.choices[0].delta.content:
-                    yield {"type": "chunk", "data": chunk.choices[0].delta.content}
             yield {"type": "end"}
             return
 
         if determined_source_mode == "vector_store" or determined_source_mode == "vector_store_forced":
+            # Apply domain-based access control
+            # Filter selected fields based on user's domain permissions; nothing selected means all accessible fields
+            accessible_fields = _accessible_field_selection(user_email, selected_fields)
+            if user_email and selected_fields and len(accessible_fields) < len(selected_fields):
+                excluded_fields = set(selected_fields) - set(accessible_fields)
+                yield {"type": "status", "data": f"Access restricted: Knowledge fields {excluded_fields} not accessible from your domain"}
+            selected_fields = accessible_fields
+
+            # Answer cache: only questions routed to the knowledge base are served from it
+            cached = None
+            if determined_source_mode == "vector_store" and cache_embedding_task is not None:
+                cache_embedding = await cache_embedding_task
+                if cache_embedding is None:
+                    cache_key_fields = None
+                else:
+                    cached = answer_cache.lookup(cache_embedding, cache_key_fields, cache_language)
+            if cached:
+                if retrieval_task is not None:
+                    retrieval_task.cancel()
+                print(f"Answer cache hit (similarity {cached['similarity']:.3f}): '{cached['question'][:60]}'")
+                yield {"type": "status", "data": "Answering from cache (same question answered recently)..."}
+                yield {"type": "meta", "data": {"sources": cached["sources"], "keywords": cached["keywords"], "follow_ups": [], "source_mode": cached["source_mode"], "cached": True}}
+                answer = cached["answer"]
+                for i in range(0, len(answer), CACHED_ANSWER_CHUNK_SIZE):
+                    if cancellation_check(): return
+                    yield {"type": "chunk", "data": answer[i:i + CACHED_ANSWER_CHUNK_SIZE]}
+                    await asyncio.sleep(0)
+                if cached["follow_ups"]:
+                    yield {"type": "follow_ups", "data": cached["follow_ups"]}
+                yield {"type": "end"}
+                return
+
+            # The speculative retrieval from the decision stage is reused if it has already finished
+            speculative_retrieval = None
+            if retrieval_task is not None and retrieval_task.done():
+                speculative_retrieval = await _await_speculative(retrieval_task)
+
+            prescreen_results = {}
+            prescreen_decision = None
             # NEW: Fast pre-screening system to avoid unnecessary RAG processing
             if determined_source_mode == "vector_store":  # Skip pre-screening if forced
                 yield {"type": "status", "data": "Running fast pre-screening to check relevance..."}
                 
-                # Step 1: Quick keyword-based pre-screening
-                prescreening_result = await asyncio.to_thread(
-                    quick_vector_store_check, 
-                    conversation_history[-1]['content'], 
-                    selected_fields, 
-                    user_email
+                # Step 1: Similarity scores of the question's nearest chunks (no extra embedding request)
+                semantic_result = await asyncio.to_thread(
+                    ultra_fast_semantic_prescreen,
+                    last_question,
+                    selected_fields,
+                    user_email,
+                    scored_results=speculative_retrieval[1][0] if speculative_retrieval else None
                 )
+                yield {"type": "status", "data": semantic_result["reason"]}
+                prescreen_results = semantic_result["results"]
+                prescreen_decision = semantic_result["decision"]
+                has_relevant_content = semantic_result["has_relevant_content"]
                 
-                yield {"type": "status", "data": prescreening_result["reason"]}
-                
-                # If pre-screening suggests low relevance, do ultra-fast semantic check
-                if prescreening_result["likely_relevant"] and prescreening_result["confidence_score"] < 0.7:
-                    yield {"type": "status", "data": "Running ultra-fast semantic validation..."}
-                    
-                    semantic_result = await asyncio.to_thread(
-                        ultra_fast_semantic_prescreen,
-                        conversation_history[-1]['content'],
-                        prescreening_result["suggested_fields"],
-                        user_email,
-                        max_docs=3
+                # Step 2: If the scores are inconclusive or low, the keyword check decides, so a
+                # question naming terms of the knowledge base is not suppressed by its score alone
+                if prescreen_decision in ("uncertain", "low"):
+                    prescreening_result = await asyncio.to_thread(
+                        quick_vector_store_check, 
+                        last_question, 
+                        selected_fields, 
+                        user_email
                     )
+                    yield {"type": "status", "data": prescreening_result["reason"]}
+                    has_relevant_content = prescreening_result["likely_relevant"]
+                
+                # Irrelevant questions end here, before the full search
+                if not has_relevant_content:
+                    features = load_features()
+                    web_search_available = features.get("web_search", True) and 'Web' in (selected_fields or [])
                     
-                    yield {"type": "status", "data": semantic_result["reason"]}
-                    
-                    # If both pre-screening and semantic check suggest low relevance, offer fallback
-                    if not semantic_result["has_relevant_content"]:
-                        features = load_features()
-                        web_search_available = features.get("web_search", True) and 'Web' in selected_fields
-                        
-                        if web_search_available:
-                            yield {
-                                "type": "clarification",
-                                "data": {
-                                    "question": f"Pre-screening suggests limited relevant content in the knowledge base (confidence: {prescreening_result['confidence_score']:.2f}). Would you like me to:",
-                                    "options": [
-                                        "Search the web instead",
-                                        "Proceed with knowledge base search anyway",
-                                        "Let me rephrase my question"
-                                    ],
-                                    "clarification_type": "pre_screening_fallback"
-                                }
+                    if web_search_available:
+                        yield {
+                            "type": "clarification",
+                            "data": {
+                                "question": f"Pre-screening suggests limited relevant content in the knowledge base (similarity: {semantic_result['max_similarity']:.2f}). Would you like me to:",
+                                "options": [
+                                    "Search the web instead",
+                                    "Proceed with knowledge base search anyway",
+                                    "Let me rephrase my question"
+                                ],
+                                "clarification_type": "pre_screening_fallback"
                             }
-                            return
-                        else:
-                            yield {"type": "status", "data": "Web search not available - proceeding with knowledge base search..."}
+                        }
+                        return
                     else:
-                        # Use the suggested fields from semantic pre-screening
-                        selected_fields = semantic_result["relevant_fields"] or selected_fields
+                        yield {"type": "status", "data": "Web search not available - proceeding with knowledge base search..."}
+                elif semantic_result["relevant_fields"]:
+                    # Focus on the fields whose best chunk is relevant (never beyond the accessible ones)
+                    relevant_fields = semantic_result["relevant_fields"]
+                    if user_email:
+                        relevant_fields = filter_accessible_fields(user_email, relevant_fields)
+                    if relevant_fields:
+                        selected_fields = relevant_fields
                         yield {"type": "status", "data": f"Pre-screening passed - focusing on relevant fields: {', '.join(selected_fields)}"}
-                else:
-                    yield {"type": "status", "data": f"Pre-screening confidence high ({prescreening_result['confidence_score']:.2f}) - proceeding with full search"}
             else:
                 yield {"type": "status", "data": "Skipping pre-screening (forced mode) - proceeding with full search"}
             
             yield {"type": "status", "data": "Searching internal knowledge base with pure semantic search..."}
             
-            # Clean approach: Pure semantic search with excellent multilingual embeddings
-            expanded_queries = await asyncio.to_thread(expand_query_with_llm, client, conversation_history)
-            
-            # Apply domain-based access control
-            if user_email:
-                # Filter selected fields based on user's domain permissions
-                accessible_fields = filter_accessible_fields(user_email, selected_fields)
-                if len(accessible_fields) < len(selected_fields):
-                    excluded_fields = set(selected_fields) - set(accessible_fields)
-                    yield {"type": "status", "data": f"Access restricted: Knowledge fields {excluded_fields} not accessible from your domain"}
-                selected_fields = accessible_fields
-            
-            target_stores = {}
-            if selected_fields:
-                for field in selected_fields:
-                    if field in vector_stores:
-                        target_stores[field] = vector_stores[field]
-            else:
-                target_stores = vector_stores
+            target_stores = await asyncio.to_thread(_select_target_stores, selected_fields)
 
             if not target_stores:
                 yield {"type": "meta", "data": {"sources": "No sources", "keywords": "N/A", "follow_ups": []}}
@@ -2789,54 +3608,53 @@ Be specific and reference the previous information directly."""
                 yield {"type": "end"}
                 return
 
-            all_retrieved_docs = []
-            for field_name, store in target_stores.items():
-                yield {"type": "status", "data": f"Semantic search in '{field_name}' with multilingual embeddings..."}
-                try:
-                    # Increased retrieval for better coverage with smart chunks
-                    retriever = store.as_retriever(search_kwargs={"k": 25})
-                    tasks = [retriever.ainvoke(query) for query in expanded_queries]
-                    retrieved_results = await asyncio.gather(*tasks)
-                    for result in retrieved_results:
-                        if cancellation_check(): return
-                        all_retrieved_docs.extend(result)
-                except Exception as e:
-                    print(f"Error searching in vector store '{field_name}': {e}")
+            # Clean approach: Pure semantic search with excellent multilingual embeddings
+            # Reuse the speculative expansion and retrieval from the decision stage if available
+            if speculative_retrieval is None and prescreen_decision == "high":
+                # The question itself clearly matches: answer from the prescreen hits without waiting for query expansion
+                speculative_retrieval = ([last_question], ({}, {}, None))
+                yield {"type": "status", "data": "Pre-screening similarity high - skipping the expanded query search"}
+            elif speculative_retrieval is None:
+                speculative_retrieval = await _await_speculative(retrieval_task)
+            if speculative_retrieval:
+                expanded_queries, (speculative_results, _, speculative_stats) = speculative_retrieval
+            else:
+                speculative_results, speculative_stats = {}, None
+                expanded_queries = await _await_speculative(expansion_task)
+                if not expanded_queries:
+                    expanded_queries = await asyncio.to_thread(expand_query_with_llm, client, conversation_history, cancellation_check)
+            if cancellation_check(): return
+
+            all_scored_docs = []
+            reused_fields = [field_name for field_name in target_stores if field_name in speculative_results]
+            if reused_fields:
+                yield {"type": "status", "data": f"Using speculative semantic search results for: {', '.join(reused_fields)}"}
+            remaining_stores = {field_name: store for field_name, store in target_stores.items() if field_name not in speculative_results}
+            # The prescreen already searched with the question itself; its hits are merged instead of searching again
+            remaining_queries = expanded_queries
+            if remaining_stores and all(field_name in prescreen_results for field_name in remaining_stores):
+                remaining_queries = [query for query in expanded_queries if query != last_question]
+                for field_name in remaining_stores:
+                    all_scored_docs.extend(prescreen_results[field_name])
+            if remaining_stores and remaining_queries:
+                yield {"type": "status", "data": f"Semantic search in {', '.join(remaining_stores)} with multilingual embeddings..."}
+            # Increased retrieval (k=25) for better coverage with smart chunks
+            search_results, search_errors, search_stats = await search_vector_stores(remaining_stores, remaining_queries, cancellation_check=cancellation_check)
+            if cancellation_check(): return
+            for field_name in target_stores:
+                if field_name in search_errors:
+                    print(f"Error searching in vector store '{field_name}': {search_errors[field_name]}")
                     yield {"type": "status", "data": f"Warning: Vector store '{field_name}' needs to be rebuilt with the new multilingual model. Please update the knowledge base."}
                     continue
+                all_scored_docs.extend(speculative_results.get(field_name) or search_results.get(field_name, []))
 
-            unique_docs = list({(doc.page_content, doc.metadata.get('source', 'N/A')): doc for doc in all_retrieved_docs}.values())
-            
-            # Pure semantic search with balanced field selection
-            if unique_docs:
-                # Create a balanced selection from both fields
-                field_docs = {}
-                for doc in unique_docs:
-                    field = doc.metadata.get('knowledge_field', 'Unknown')
-                    if field not in field_docs:
-                        field_docs[field] = []
-                    field_docs[field].append(doc)
-                
-                # Balanced selection: alternate between fields to ensure fair representation
-                top_docs = []
-                max_per_field = 10 // len(field_docs) if field_docs else 0
-                remainder = 10 % len(field_docs) if field_docs else 0
-                
-                for field, docs in field_docs.items():
-                    take_count = max_per_field + (1 if remainder > 0 else 0)
-                    if remainder > 0:
-                        remainder -= 1
-                    top_docs.extend(docs[:take_count])
-                
-                # If we still need more docs, fill from any remaining
-                if len(top_docs) < 10:
-                    remaining_docs = [doc for docs in field_docs.values() for doc in docs[max_per_field:]]
-                    additional_needed = 10 - len(top_docs)
-                    top_docs.extend(remaining_docs[:additional_needed])
-                
-                top_docs = top_docs[:10]  # Ensure exactly 10 docs
-            else:
-                top_docs = []
+            for stats in (speculative_stats, search_stats):
+                if stats and stats["embedding_calls"]:
+                    print(f"Vector search: {format_search_stats(stats)}")
+
+            # Merge across fields by similarity score; duplicates keep their best score
+            top_scored_docs = merge_scored_results(all_scored_docs, limit=10)
+            top_docs = [doc for doc, _ in top_scored_docs]
             
             # NEW: Evaluate quality of vector store results and implement fallback
             # BUT ONLY if the user hasn't already decided to use Knowledge Base anyway
@@ -2846,7 +3664,7 @@ Be specific and reference the previous information directly."""
                 quality_eval = {"quality_sufficient": True, "reason": "User chose to use Knowledge Base anyway"}
             else:
                 yield {"type": "status", "data": "Evaluating search result quality..."}
-                quality_eval = evaluate_vector_store_quality(top_docs, last_question)
+                quality_eval = evaluate_vector_store_quality(top_scored_docs, last_question)
                 
                 # Check if we should fallback to web search
                 if not quality_eval["quality_sufficient"]:
@@ -2854,7 +3672,7 @@ Be specific and reference the previous information directly."""
                     
                     # Check if web search is available as fallback
                     features = load_features()
-                    web_search_available = features.get("web_search", True) and 'Web' in selected_fields
+                    web_search_available = features.get("web_search", True) and 'Web' in (selected_fields or [])
                     
                     if web_search_available:
                         # Ask user for confirmation before fallback
@@ -2909,22 +3727,24 @@ Be specific and reference the previous information directly."""
             messages = create_contextual_messages(conversation_history, system_prompt)
             messages.append({"role": "system", "content": f"Internal Context:\n\n{context}"})
             
-            temp_response = await asyncio.to_thread(robust_api_call, client, LLM_MODEL, messages, 0.0, stream=False)
-            temp_answer = ""
-            if temp_response.choices and temp_response.choices[0].message.content:
-                temp_answer = temp_response.choices[0].message.content.strip()
-            
-            follow_ups = await asyncio.to_thread(generate_follow_up_questions, client, conversation_history, temp_answer, context)
-            
             sources_text = "\n".join(sorted(list(set([f"- {os.path.basename(doc.metadata['source'])}" for doc in top_docs])))) if top_docs else "No internal sources found."
-            yield {"type": "meta", "data": {"sources": f"**Internal sources:**\n{sources_text}", "keywords": "N/A", "follow_ups": follow_ups, "source_mode": determined_source_mode}}
-
+            sources = f"**Internal sources:**\n{sources_text}"
+            yield {"type": "meta", "data": {"sources": sources, "keywords": "N/A", "follow_ups": [], "source_mode": determined_source_mode}}
+
+            answer_parts, follow_ups = [], []
+            async for event in stream_answer_with_follow_ups(client, LLM_MODEL, messages, 0.0, conversation_history, context, cancellation_check):
+                if event["type"] == "chunk":
+                    answer_parts.append(event["data"])
+                elif event["type"] == "follow_ups":
+                    follow_ups = event["data"]
+                yield event
             if cancellation_check(): return
-            stream = robust_api_call(client, LLM_MODEL, messages, 0.0, stream=True)
-            for chunk in stream:
-                if cancellation_check(): return
-                if chunk.choices and chunk.choices[0].delta.content:
-                    yield {"type": "chunk", "data": chunk.choices[0].delta.content}
+
+            # Only complete, good-quality answers to standalone questions go into the answer cache.
+            # Stored before "end": the consumer (api.stream_and_process_response) stops iterating there.
+            if cache_key_fields and determined_source_mode == "vector_store" and quality_eval["quality_sufficient"] and top_docs:
+                answer_cache.store(last_question, cache_embedding, cache_key_fields, cache_language,
+                                   "".join(answer_parts), sources, "N/A", follow_ups, determined_source_mode)
             yield {"type": "end"}
             return
 
@@ -2936,8 +3756,11 @@ Be specific and reference the previous information directly."""
             yield {"type": "status", "data": "Extracting context keywords from conversation..."}
             context_keywords = await asyncio.to_thread(extract_context_keywords, client, conversation_history)
             
-            # Get search queries in the user's language
-            search_queries = await asyncio.to_thread(expand_query_with_llm, client, conversation_history)
+            # Get search queries in the user's language (reusing the speculative expansion if available)
+            search_queries = await _await_speculative(expansion_task)
+            if not search_queries:
+                search_queries = await asyncio.to_thread(expand_query_with_llm, client, conversation_history, cancellation_check)
+            if cancellation_check(): return
             
             # Enhance queries with context keywords (with validation)
             if context_keywords:
@@ -3090,24 +3913,14 @@ Be specific and reference the previous information directly."""
             messages = create_contextual_messages(conversation_history, system_prompt)
             messages.append({"role": "system", "content": f"Web Search Context:\n\n{final_context}"})
 
-            # Generate follow-ups first
-            temp_response = await asyncio.to_thread(robust_api_call, client, LLM_MODEL, messages, 0.0, stream=False)
-            temp_answer = ""
-            if temp_response.choices and temp_response.choices[0].message.content:
-                temp_answer = temp_response.choices[0].message.content.strip()
-            follow_ups = await asyncio.to_thread(generate_follow_up_questions, client, conversation_history, temp_answer, consolidated_content)
-
             # Yield metadata with a clean list of URLs
-            yield {"type": "meta", "data": {"sources": search_results, "keywords": web_search_query, "follow_ups": follow_ups, "source_mode": determined_source_mode}}
+            yield {"type": "meta", "data": {"sources": search_results, "keywords": web_search_query, "follow_ups": [], "source_mode": determined_source_mode}}
 
             # Stream the answer
             yield {"type": "status", "data": "Formulating answer based on web search..."}
+            async for event in stream_answer_with_follow_ups(client, LLM_MODEL, messages, 0.0, conversation_history, consolidated_content, cancellation_check):
+                yield event
             if cancellation_check(): return
-            stream = robust_api_call(client, LLM_MODEL, messages, 0.0, stream=True)
-            for chunk in stream:
-                if cancellation_check(): return
-                if chunk.choices and chunk.choices[0].delta.content:
-                    yield {"type": "chunk", "data": chunk.choices[0].delta.content}
             yield {"type": "end"}
 
     except Exception as e:
@@ -3118,6 +3931,11 @@ Be specific and reference the previous information directly."""
         yield {"type": "meta", "data": {"sources": "No sources", "keywords": "N/A", "follow_ups": []}}
         yield {"type": "chunk", "data": "An error occurred while processing your request. Please try again."}
         yield {"type": "end"}
+    finally:
+        # Never leave speculative work running after the answer is done or the request was cancelled
+        for task in speculative_tasks:
+            if not task.done():
+                task.cancel()
 
 def needs_python_script(client, conversation_history: list) -> bool:
     """
@@ -3151,7 +3969,7 @@ def get_python_code(conversation_history: list, file_path: str = None, cancellat
     Generates Python code and a natural language explanation to answer a question.
     """
     try:
-        client = Together(api_key=os.getenv("TOGETHER_API_KEY"))
+        client = get_together_client()
         
         base_system_prompt = """You are an expert Python programmer and a helpful assistant. Your task is to write a Python script to answer the user's question and also provide a simple, natural language explanation of how the script works.
 
@@ -3409,7 +4227,7 @@ async def get_answer_from_document(conversation_history: list, document_content:
     TEMPORARY: Using full document content without chunking for testing.
     """
     try:
-        client = Together(api_key=os.getenv("TOGETHER_API_KEY"))
+        client = get_together_client()
         
         yield {"type": "status", "data": "Analyzing question..."}
 
@@ -3450,15 +4268,14 @@ async def get_answer_from_document(conversation_history: list, document_content:
 
             try:
                 # Use the dedicated image model for the API call and add a long timeout
-                stream = robust_api_call(client, IMAGE_MODEL, messages, 0.1, stream=True, timeout=180)
-                
                 has_content = False
-                for chunk in stream:
+                async for chunk in async_stream_completion(client, IMAGE_MODEL, messages, 0.1, timeout=180, cancellation_check=cancellation_check):
                     if cancellation_check(): return
                     if chunk.choices and chunk.choices[0].delta.content:
                         has_content = True
                         yield {"type": "chunk", "data": chunk.choices[0].delta.content}
-                
+
+                if cancellation_check(): return
                 if not has_content:
                     # This can happen if the model returns an empty stream for non-text images
                     raise ValueError("The model returned an empty response, likely due to no text in the image.")
@@ -3541,9 +4358,7 @@ async def get_answer_from_document(conversation_history: list, document_content:
         yield {"type": "status", "data": "Formulating a response based on the FULL document..."}
         
         if cancellation_check(): return
-        stream = robust_api_call(client, LLM_MODEL, messages, 0.1, stream=True)
-        
-        for chunk in stream:
+        async for chunk in async_stream_completion(client, LLM_MODEL, messages, 0.1, cancellation_check=cancellation_check):
             if cancellation_check(): return
             if chunk.choices and chunk.choices[0].delta.content:
                 yield {"type": "chunk", "data": chunk.choices[0].delta.content}
@@ -3616,7 +4431,7 @@ async def generate_image(conversation_history: list, last_image_bytes: bytes = N
     it refines that image. Otherwise, it generates a new one from a detailed prompt.
     It now returns the image bytes along with the URL for server-side caching.
     """
-    client = Together(api_key=os.getenv("TOGETHER_API_KEY"))
+    client = get_together_client()
     try:
         yield {"type": "status", "data": "Starting image generation..."}
         
@@ -3678,7 +4493,7 @@ async def generate_image(conversation_history: list, last_image_bytes: bytes = N
             try:
                 # Download the newly created image to get its bytes for caching
                 yield {"type": "status", "data": "Caching new image..."}
-                response = requests.get(image_url, timeout=20)
+                response = await asyncio.to_thread(requests.get, image_url, timeout=20)
                 response.raise_for_status()
                 new_image_bytes = response.content
             except Exception as e:
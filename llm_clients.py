@@ -0,0 +1,212 @@
+"""
+Process-wide registry for Together AI clients.
+
+Building a Together client or a LangChain Together wrapper per request throws away
+HTTP keep-alive connections and TLS sessions. This module hands out shared, lazily
+created instances backed by a tuned connection pool and enforces per-model
+concurrency limits for chat completions. The native Together client uses the shared
+pool if the installed SDK accepts an http_client (together >= 2); older SDK versions
+keep their own connection pool.
+
+Model slots are taken by blocking calls in worker threads. On a thread that runs an
+event loop acquire_model_slot never waits: a request that finds no free slot there
+proceeds without one, because blocking the loop would also stop the streams that
+are about to release their slots.
+
+Environment variables:
+    TOGETHER_MAX_CONNECTIONS      - size of the HTTP connection pool (default 32)
+    TOGETHER_MAX_KEEPALIVE        - idle keep-alive connections kept open (default 16)
+    TOGETHER_KEEPALIVE_EXPIRY     - seconds an idle connection is kept (default 60)
+    TOGETHER_MAX_CONCURRENCY      - default concurrent requests per model (default 8)
+    TOGETHER_MODEL_CONCURRENCY    - per-model overrides, e.g. "model-a=4,model-b=2"
+    TOGETHER_SLOT_TIMEOUT         - seconds to wait for a free model slot (default 120)
+"""
+import asyncio
+import inspect
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+MAX_CONNECTIONS = int(os.getenv("TOGETHER_MAX_CONNECTIONS", "32"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("TOGETHER_MAX_KEEPALIVE", "16"))
+KEEPALIVE_EXPIRY = float(os.getenv("TOGETHER_KEEPALIVE_EXPIRY", "60"))
+DEFAULT_MODEL_CONCURRENCY = int(os.getenv("TOGETHER_MAX_CONCURRENCY", "8"))
+MODEL_SLOT_TIMEOUT = float(os.getenv("TOGETHER_SLOT_TIMEOUT", "120"))
+HTTP_TIMEOUT = httpx.Timeout(180.0, connect=10.0) if HTTPX_AVAILABLE else None
+
+_lock = threading.Lock()
+_together_client = None
+_http_client = None
+_embeddings = {}
+_chat_models = {}
+_model_semaphores = {}
+
+
+def _parse_model_concurrency(value: str) -> dict:
+    """Parses "model=n,model=n" into a dict. Invalid entries are ignored."""
+    limits = {}
+    for entry in (value or "").split(","):
+        model, sep, limit = entry.strip().rpartition("=")
+        if not sep or not model:
+            continue
+        try:
+            limits[model.strip()] = max(1, int(limit))
+        except ValueError:
+            print(f"Warning: Ignoring invalid TOGETHER_MODEL_CONCURRENCY entry '{entry}'")
+    return limits
+
+
+MODEL_CONCURRENCY = _parse_model_concurrency(os.getenv("TOGETHER_MODEL_CONCURRENCY", ""))
+
+
+def _api_key():
+    return os.getenv("TOGETHER_API_KEY")
+
+
+def get_http_client():
+    """Returns the shared, pooled httpx client (None if httpx is not installed)."""
+    global _http_client
+    if not HTTPX_AVAILABLE:
+        return None
+    if _http_client is None:
+        with _lock:
+            if _http_client is None:
+                _http_client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=MAX_CONNECTIONS,
+                        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=KEEPALIVE_EXPIRY,
+                    ),
+                    timeout=HTTP_TIMEOUT,
+                )
+    return _http_client
+
+
+def get_together_client():
+    """Returns the shared Together client, creating it on first use."""
+    global _together_client
+    if _together_client is None:
+        http_client = get_http_client()
+        with _lock:
+            if _together_client is None:
+                from together import Together
+                kwargs = {"api_key": _api_key()}
+                if http_client is not None and "http_client" in inspect.signature(Together).parameters:
+                    kwargs["http_client"] = http_client
+                _together_client = Together(**kwargs)
+    return _together_client
+
+
+def get_embeddings(model: str):
+    """Returns a shared TogetherEmbeddings instance for the given model."""
+    embeddings = _embeddings.get(model)
+    if embeddings is None:
+        http_client = get_http_client()
+        with _lock:
+            embeddings = _embeddings.get(model)
+            if embeddings is None:
+                from langchain_together.embeddings import TogetherEmbeddings
+                kwargs = {"model": model, "together_api_key": _api_key()}
+                if http_client is not None:
+                    kwargs["http_client"] = http_client
+                embeddings = TogetherEmbeddings(**kwargs)
+                _embeddings[model] = embeddings
+    return embeddings
+
+
+def get_chat_model(model: str, temperature: float = 0.0, max_tokens: int = None):
+    """Returns a shared ChatTogether instance for the given model settings."""
+    key = (model, temperature, max_tokens)
+    chat_model = _chat_models.get(key)
+    if chat_model is None:
+        http_client = get_http_client()
+        with _lock:
+            chat_model = _chat_models.get(key)
+            if chat_model is None:
+                from langchain_together import ChatTogether
+                kwargs = {"model": model, "temperature": temperature, "together_api_key": _api_key()}
+                if max_tokens is not None:
+                    kwargs["max_tokens"] = max_tokens
+                if http_client is not None:
+                    kwargs["http_client"] = http_client
+                chat_model = ChatTogether(**kwargs)
+                _chat_models[key] = chat_model
+    return chat_model
+
+
+def get_model_semaphore(model: str) -> threading.BoundedSemaphore:
+    """Returns the semaphore limiting concurrent requests for a model."""
+    semaphore = _model_semaphores.get(model)
+    if semaphore is None:
+        with _lock:
+            semaphore = _model_semaphores.get(model)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(MODEL_CONCURRENCY.get(model, DEFAULT_MODEL_CONCURRENCY))
+                _model_semaphores[model] = semaphore
+    return semaphore
+
+
+def _on_event_loop_thread() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+def acquire_model_slot(model: str):
+    """
+    Waits for a free request slot for the model. Returns a release callable.
+    If no slot frees up within MODEL_SLOT_TIMEOUT the request proceeds anyway,
+    so a leaked slot can never deadlock the application. On an event loop thread
+    the slot is only taken if one is free right away (see module docstring).
+    """
+    semaphore = get_model_semaphore(model)
+    if _on_event_loop_thread():
+        acquired = semaphore.acquire(blocking=False)
+        if not acquired:
+            print(f"Warning: Blocking request for model {model} made on the event loop and no slot is free. Proceeding without limit.")
+            return lambda: None
+    else:
+        acquired = semaphore.acquire(timeout=MODEL_SLOT_TIMEOUT)
+    if acquired:
+        released = threading.Event()
+
+        def release():
+            if not released.is_set():
+                released.set()
+                semaphore.release()
+        return release
+    print(f"Warning: No free request slot for model {model} after {MODEL_SLOT_TIMEOUT}s. Proceeding without limit.")
+    return lambda: None
+
+
+@contextmanager
+def model_slot(model: str):
+    """Context manager holding a request slot for the model."""
+    release = acquire_model_slot(model)
+    try:
+        yield
+    finally:
+        release()
+
+
+def reset_clients():
+    """Drops all cached clients (e.g. after the API key changed)."""
+    global _together_client, _http_client
+    with _lock:
+        if _http_client is not None:
+            try:
+                _http_client.close()
+            except Exception:
+                pass
+        _together_client = None
+        _http_client = None
+        _embeddings.clear()
+        _chat_models.clear()
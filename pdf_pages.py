@@ -0,0 +1,377 @@
+"""
+Page-parallel PDF text extraction.
+
+A PDF is split into page ranges that are extracted in worker processes (PyMuPDF or pdfplumber),
+so a 300+ page report is not read page by page in a single thread. Pages are yielded in page
+order as soon as a page and all pages before it are extracted, so callers can chunk and embed
+the beginning of a document while later ranges are still being extracted. Page texts are
+returned individually and joined once by the caller, never by repeated string concatenation.
+
+Small documents (at most one range per worker) and PDF_EXTRACT_WORKERS=1 are extracted
+in-process, without the process pool start-up cost. Larger documents share one module-level
+pool that is started on first use and reused across uploads. Its workers are spawned, not
+forked, because forking the threaded server process can leave a child waiting on a lock that
+another thread held.
+
+Extraction methods:
+    "pymupdf"     - PyMuPDF text of every page
+    "pdfplumber"  - pdfplumber text of every page
+    "auto"        - every page is classified (classify_page) and only extracted with an expensive
+                    method if it needs one: PyMuPDF for text pages, pdfplumber for table pages and
+                    OCR (unstructured hi_res on a PDF of just those pages) for scanned pages
+
+pdfplumber costs about 0.1s per table page against a few milliseconds for PyMuPDF, but keeps the
+rows and columns of ruled tables in reading order, where PyMuPDF follows the order in which the
+cells were drawn. PDF_TABLE_PAGE_EXTRACTOR=pymupdf keeps the PyMuPDF text for table pages too.
+The pdfplumber document is opened on the first table page and kept open for the following page
+ranges of the same file (in each worker process), since opening it and building its page list
+costs more than extracting a page. If pdfplumber finds no text on a page, the PyMuPDF text is kept.
+
+Environment variables:
+    PDF_EXTRACT_WORKERS           - worker processes per extraction (default min(4, CPU count))
+    PDF_PAGES_PER_TASK            - pages per worker task (default 16)
+    PDF_PAGE_MIN_TEXT_CHARS       - pages with less text are checked for scans (default 40)
+    PDF_PAGE_SCANNED_COVERAGE     - share of such a page covered by images to count as scanned (default 0.5)
+    PDF_PAGE_TABLE_RULINGS        - horizontal/vertical rulings from which a page counts as a table (default 30)
+    PDF_PAGE_TABLE_NUMERIC_LINES  - share of mostly numeric lines from which a page counts as a table (default 0.4)
+    PDF_TABLE_PAGE_EXTRACTOR      - "pdfplumber" or "pymupdf": extractor for table pages with "auto" (default pdfplumber)
+"""
+import asyncio
+import concurrent.futures
+import importlib.util
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures.process import BrokenProcessPool
+
+PDFPLUMBER_AVAILABLE = importlib.util.find_spec("pdfplumber") is not None
+UNSTRUCTURED_AVAILABLE = importlib.util.find_spec("unstructured") is not None
+
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PAGES_PER_TASK = max(1, int(os.getenv("PDF_PAGES_PER_TASK", "16")))
+PDF_PAGE_MIN_TEXT_CHARS = int(os.getenv("PDF_PAGE_MIN_TEXT_CHARS", "40"))
+PDF_PAGE_SCANNED_COVERAGE = float(os.getenv("PDF_PAGE_SCANNED_COVERAGE", "0.5"))
+PDF_PAGE_TABLE_RULINGS = int(os.getenv("PDF_PAGE_TABLE_RULINGS", "30"))
+PDF_PAGE_TABLE_NUMERIC_LINES = float(os.getenv("PDF_PAGE_TABLE_NUMERIC_LINES", "0.4"))
+MIN_TABLE_LINES = 8  # Pages with fewer text lines are not checked for numeric tables
+NUMERIC_CHARACTERS = set("0123456789.,;:%+-–()/€$")
+PDF_TABLE_PAGE_EXTRACTOR = os.getenv("PDF_TABLE_PAGE_EXTRACTOR", "pdfplumber").lower()
+USE_PDFPLUMBER_FOR_TABLES = PDF_TABLE_PAGE_EXTRACTOR == "pdfplumber" and PDFPLUMBER_AVAILABLE
+
+# Page classes
+PAGE_TEXT = "text"
+PAGE_TABLE = "table"
+PAGE_SCANNED = "scanned"
+
+
+def open_pdf(file_path: str, method: str = "pymupdf"):
+    if method in ("pymupdf", "auto"):
+        import fitz  # PyMuPDF
+        return fitz.open(file_path)
+    if method == "pdfplumber":
+        import pdfplumber
+        return pdfplumber.open(file_path)
+    raise ValueError(f"Unknown PDF page extractor: {method}")
+
+
+def _page_count(doc, method: str) -> int:
+    return len(doc.pages) if method == "pdfplumber" else len(doc)
+
+
+def _page_texts(doc, start: int, stop: int, method: str) -> list:
+    """Texts of pages start..stop-1 of an open document ("" for pages without text)."""
+    if method == "pymupdf":
+        return [doc[number].get_text() for number in range(start, stop)]
+    return [doc.pages[number].extract_text() or "" for number in range(start, stop)]
+
+
+# --- Per-page classification ---
+
+def _ruling_count(page) -> int:
+    """Horizontal and vertical lines drawn on the page (table borders and cell rules)."""
+    rulings, page_area = 0, abs(page.rect) or 1.0
+    for path in page.get_drawings():
+        for item in path["items"]:
+            if item[0] == "l" and (abs(item[1].y - item[2].y) < 1 or abs(item[1].x - item[2].x) < 1):
+                rulings += 1
+            elif item[0] == "re":
+                rect = item[1]
+                if min(rect.width, rect.height) < 2:
+                    rulings += 1  # Thin rectangle drawn as a rule
+                elif abs(rect) < 0.25 * page_area:
+                    rulings += 4  # Cell or box border (not a page background)
+    return rulings
+
+
+def _numeric_line_share(text: str) -> float:
+    """Share of text lines that consist mostly of numbers (columns of figures)."""
+    lines = [line.replace(" ", "") for line in text.splitlines() if line.strip()]
+    if len(lines) < MIN_TABLE_LINES:
+        return 0.0
+    numeric = sum(1 for line in lines if sum(ch in NUMERIC_CHARACTERS for ch in line) >= 0.6 * len(line))
+    return numeric / len(lines)
+
+
+def _image_coverage(page) -> float:
+    """Share of the page covered by images."""
+    import fitz  # PyMuPDF
+    page_area = abs(page.rect) or 1.0
+    image_area = sum(abs(fitz.Rect(info["bbox"]) & page.rect) for info in page.get_image_info())
+    return min(1.0, image_area / page_area)
+
+
+def classify_page(page, text: str = None) -> str:
+    """
+    PAGE_SCANNED for pages with (almost) no text layer that are mostly images, PAGE_TABLE for pages
+    with ruled tables or columns of figures, PAGE_TEXT otherwise. page is a PyMuPDF page.
+    """
+    text = page.get_text() if text is None else text
+    if len(text.strip()) < PDF_PAGE_MIN_TEXT_CHARS:
+        return PAGE_SCANNED if _image_coverage(page) >= PDF_PAGE_SCANNED_COVERAGE else PAGE_TEXT
+    if _numeric_line_share(text) >= PDF_PAGE_TABLE_NUMERIC_LINES or _ruling_count(page) >= PDF_PAGE_TABLE_RULINGS:
+        return PAGE_TABLE
+    return PAGE_TEXT
+
+
+class _TablePageReader:
+    """pdfplumber text of table pages; the document stays open until a different file is read or close()."""
+
+    def __init__(self):
+        self._key = None
+        self._pdf = None
+
+    def text(self, file_path: str, number: int) -> str:
+        key = (file_path, os.path.getmtime(file_path))
+        if key != self._key:
+            self.close()
+            import pdfplumber
+            self._pdf = pdfplumber.open(file_path)
+            self._key = key
+        page = self._pdf.pages[number]
+        try:
+            return page.extract_text() or ""
+        finally:
+            page.close()  # Drops the parsed page objects, the document handle stays open
+
+    def close(self):
+        if self._pdf is not None:
+            self._pdf.close()
+        self._key, self._pdf = None, None
+
+
+# Reader of a worker process, kept across the page ranges (and files) the worker extracts
+_worker_table_reader = _TablePageReader()
+
+
+def _range_entries(doc, file_path: str, start: int, stop: int, method: str, table_reader: _TablePageReader = None) -> list:
+    """
+    [(page class, text)] for pages start..stop-1 of an open document. With "auto", scanned pages
+    have the text None if OCR is available; their OCR runs in the calling process (ocr_pages).
+    """
+    if method != "auto":
+        return [(method, text) for text in _page_texts(doc, start, stop, method)]
+    entries = []
+    for number in range(start, stop):
+        page = doc[number]
+        text = page.get_text()
+        page_class = classify_page(page, text)
+        if page_class == PAGE_TABLE and USE_PDFPLUMBER_FOR_TABLES and table_reader is not None:
+            text = table_reader.text(file_path, number) or text
+        elif page_class == PAGE_SCANNED and UNSTRUCTURED_AVAILABLE:
+            text = None
+        entries.append((page_class, text))
+    return entries
+
+
+def extract_page_range(file_path: str, start: int, stop: int, method: str = "pymupdf") -> list:
+    """Process pool entry point: returns [(page class, text)] for pages start..stop-1 (see _range_entries)."""
+    with open_pdf(file_path, method) as doc:
+        return _range_entries(doc, file_path, start, stop, method, _worker_table_reader)
+
+
+def ocr_pages(file_path: str, page_numbers: list) -> dict:
+    """
+    {page number: text} of scanned pages: unstructured hi_res (layout detection and OCR) runs
+    once on a PDF that contains only these pages.
+    """
+    import fitz  # PyMuPDF
+    from unstructured.partition.auto import partition
+    fd, subset_path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    try:
+        with fitz.open(file_path) as source, fitz.open() as subset:
+            for number in page_numbers:
+                subset.insert_pdf(source, from_page=number, to_page=number)
+            subset.save(subset_path)
+        elements = partition(filename=subset_path, include_metadata=True, strategy="hi_res")
+    finally:
+        os.remove(subset_path)
+    parts = {number: [] for number in page_numbers}
+    for element in elements:
+        subset_page = (getattr(element.metadata, "page_number", None) or 1) - 1
+        if str(element).strip() and 0 <= subset_page < len(page_numbers):
+            parts[page_numbers[subset_page]].append(str(element))
+    return {number: "\n\n".join(texts) for number, texts in parts.items()}
+
+
+def _complete_ocr(file_path: str, start: int, entries: list) -> list:
+    """Fills in the text of the scanned pages of a range (PyMuPDF text if OCR fails)."""
+    scanned = [start + i for i, (_, text) in enumerate(entries) if text is None]
+    if not scanned:
+        return entries
+    try:
+        texts = ocr_pages(file_path, scanned)
+    except Exception as e:
+        print(f"OCR of pages {[number + 1 for number in scanned]} of {os.path.basename(file_path)} failed: {e}")
+        with open_pdf(file_path) as doc:
+            texts = {number: doc[number].get_text() for number in scanned}
+    return [(page_class, texts[start + i] if text is None else text) for i, (page_class, text) in enumerate(entries)]
+
+
+def _page_ranges(pages: int, pages_per_task: int) -> list:
+    return [(start, min(start + pages_per_task, pages)) for start in range(0, pages, pages_per_task)]
+
+
+def _use_processes(pages: int, workers: int, pages_per_task: int) -> bool:
+    return workers > 1 and pages > pages_per_task
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _process_pool(workers: int) -> concurrent.futures.ProcessPoolExecutor:
+    """The shared extraction pool with this many workers (spawn context), created on first use."""
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pools[workers] = pool
+        return pool
+
+
+def _discard_pool(workers: int, pool):
+    """Drops a broken pool (a worker died), so the next extraction starts a new one."""
+    with _pools_lock:
+        if _pools.get(workers) is pool:
+            del _pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit_ranges(pool, file_path: str, pages: int, pages_per_task: int, method: str) -> dict:
+    return {pool.submit(extract_page_range, file_path, start, stop, method): start
+            for start, stop in _page_ranges(pages, pages_per_task)}
+
+
+def extract_pages_in_process(file_path: str, first_page: int, method: str = "pymupdf") -> list:
+    """
+    Texts of the pages from first_page to the end, extracted in the calling process, one page
+    after the other. The fallback when page-parallel extraction fails part way through.
+    """
+    with open_pdf(file_path, method) as doc:
+        return _page_texts(doc, first_page, _page_count(doc, method), method)
+
+
+def _yield_in_order(done_ranges: dict, next_page: int, pages: int):
+    """Pops the extracted ranges that continue at next_page; returns ([(page, (class, text))], next page)."""
+    ready = []
+    while next_page < pages and next_page in done_ranges:
+        entries = done_ranges.pop(next_page)
+        ready.extend(enumerate(entries, next_page))
+        next_page += len(entries)
+    return ready, next_page
+
+
+def iter_pdf_pages(file_path: str, method: str = "pymupdf", workers: int = None, pages_per_task: int = None):
+    """
+    Yields (page number, page count, text, page class) in page order; page ranges are extracted in
+    parallel. The page class is the method for "pymupdf"/"pdfplumber" and PAGE_* for "auto".
+    """
+    workers = PDF_EXTRACT_WORKERS if workers is None else workers
+    pages_per_task = pages_per_task or PDF_PAGES_PER_TASK
+    with open_pdf(file_path, method) as doc:
+        pages = _page_count(doc, method)
+        if not _use_processes(pages, workers, pages_per_task):
+            # In-process: the document is opened once
+            table_reader = _TablePageReader()
+            try:
+                for start, stop in _page_ranges(pages, pages_per_task):
+                    entries = _complete_ocr(file_path, start, _range_entries(doc, file_path, start, stop, method, table_reader))
+                    for number, (page_class, text) in enumerate(entries, start):
+                        yield number, pages, text, page_class
+            finally:
+                table_reader.close()
+            return
+
+    pool = _process_pool(workers)
+    futures = {}
+    try:
+        futures = _submit_ranges(pool, file_path, pages, pages_per_task, method)
+        done_ranges, next_page = {}, 0
+        for future in concurrent.futures.as_completed(futures):
+            start = futures[future]
+            done_ranges[start] = _complete_ocr(file_path, start, future.result())
+            ready, next_page = _yield_in_order(done_ranges, next_page, pages)
+            for number, (page_class, text) in ready:
+                yield number, pages, text, page_class
+    except BrokenProcessPool:
+        _discard_pool(workers, pool)
+        raise
+    finally:
+        # A caller that stops early does not wait for its remaining ranges; the pool stays up
+        for future in futures:
+            future.cancel()
+
+
+async def aiter_pdf_pages(file_path: str, method: str = "pymupdf", workers: int = None, pages_per_task: int = None):
+    """Async variant of iter_pdf_pages; the event loop is not blocked while pages are extracted."""
+    workers = PDF_EXTRACT_WORKERS if workers is None else workers
+    pages_per_task = pages_per_task or PDF_PAGES_PER_TASK
+    doc = await asyncio.to_thread(open_pdf, file_path, method)
+    try:
+        pages = _page_count(doc, method)
+        if not _use_processes(pages, workers, pages_per_task):
+            # In-process: the document is opened once, ranges are extracted off the event loop
+            table_reader = _TablePageReader()
+            try:
+                for start, stop in _page_ranges(pages, pages_per_task):
+                    entries = await asyncio.to_thread(_range_entries, doc, file_path, start, stop, method, table_reader)
+                    entries = await asyncio.to_thread(_complete_ocr, file_path, start, entries)
+                    for number, (page_class, text) in enumerate(entries, start):
+                        yield number, pages, text, page_class
+            finally:
+                table_reader.close()
+            return
+    finally:
+        doc.close()
+
+    pool = _process_pool(workers)
+    futures = {}
+    try:
+        futures = {asyncio.wrap_future(future): start
+                   for future, start in _submit_ranges(pool, file_path, pages, pages_per_task, method).items()}
+        done_ranges, next_page = {}, 0
+        pending = set(futures)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                start = futures[future]
+                done_ranges[start] = await asyncio.to_thread(_complete_ocr, file_path, start, future.result())
+            ready, next_page = _yield_in_order(done_ranges, next_page, pages)
+            for number, (page_class, text) in ready:
+                yield number, pages, text, page_class
+    except BrokenProcessPool:
+        _discard_pool(workers, pool)
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def extract_pdf_text(file_path: str, method: str = "pymupdf") -> str:
+    """Whole document text with a blank line after every page (pdfplumber: after every page with text)."""
+    texts = (text for _, _, text, _ in iter_pdf_pages(file_path, method))
+    if method == "pdfplumber":
+        texts = (text for text in texts if text)
+    return "".join(text + "\n\n" for text in texts)
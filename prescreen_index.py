@@ -0,0 +1,125 @@
+"""
+Compiled keyword prescreen over the document structure index.
+
+quick_vector_store_check used to loop over every term of every category and compare it with
+every question word, so its cost grew with the corpus. The structure index is now compiled
+once, when it is built or loaded:
+
+- exact matches: postings from the lower-cased term to its term ids
+- partial matches (question word inside a term): a trigram index over the terms; the
+  candidates are the intersection of the word's trigram postings, verified by substring check
+- contains matches (term inside a question word): every substring of the word with at least
+  3 characters is looked up in the exact postings
+- field scores are accumulated with numpy over term -> field arrays
+
+Matching rules and weights are those of the linear scan: 2.0 for an exact match, 1.0 for a
+partial or contains match, per field of the term and once per term.
+"""
+import string
+
+import numpy as np
+
+CATEGORIES = ("topics", "processes", "search_terms", "headings", "filenames")
+# Common German/English stop words
+STOP_WORDS = {'der', 'die', 'das', 'und', 'oder', 'aber', 'ist', 'sind', 'hat', 'haben', 'von', 'zu', 'mit', 'auf', 'in', 'für', 'was', 'wie', 'wo', 'wann', 'warum', 'the', 'and', 'or', 'but', 'is', 'are', 'has', 'have', 'from', 'to', 'with', 'on', 'in', 'for', 'what', 'how', 'where', 'when', 'why'}
+WORD_PUNCTUATION = string.punctuation + "„“”‚‘’«»"
+MIN_MATCH_LENGTH = 3  # Partial and contains matches need at least this many characters
+EXACT_WEIGHT = 2.0
+PARTIAL_WEIGHT = 1.0
+
+
+def question_words(question: str) -> set:
+    """Lower-cased question words without surrounding punctuation and stop words."""
+    words = {word.strip(WORD_PUNCTUATION) for word in question.lower().split()}
+    return {word for word in words if word} - STOP_WORDS
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class PrescreenIndex:
+    """Exact, trigram and per-field score arrays compiled from a document structure index."""
+
+    def __init__(self, structure_index: dict):
+        field_ids = {}
+        self.labels = []        # term id -> "category:term"
+        self.terms = []         # term id -> lower-cased term
+        self._exact = {}        # lower-cased term -> [term ids]
+        trigram_postings = {}
+        offsets, term_fields = [0], []
+        for category in CATEGORIES:
+            for term, fields in (structure_index.get(category) or {}).items():
+                term_id = len(self.labels)
+                term_lower = term.lower()
+                self.labels.append(f"{category}:{term}")
+                self.terms.append(term_lower)
+                self._exact.setdefault(term_lower, []).append(term_id)
+                for trigram in _trigrams(term_lower):
+                    trigram_postings.setdefault(trigram, []).append(term_id)
+                term_fields.extend(field_ids.setdefault(field, len(field_ids)) for field in fields)
+                offsets.append(len(term_fields))
+        self.fields = list(field_ids)
+        # Term ids are added in increasing order, so every posting list is sorted and unique
+        self._trigrams = {trigram: np.asarray(ids, dtype=np.int64) for trigram, ids in trigram_postings.items()}
+        self._offsets = np.asarray(offsets, dtype=np.int64)
+        self._term_fields = np.asarray(term_fields, dtype=np.int64)
+        self._max_term_length = max((len(term) for term in self.terms), default=0)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def _partial_matches(self, word: str) -> set:
+        """Terms that contain the word."""
+        postings = [self._trigrams.get(trigram) for trigram in _trigrams(word)]
+        if any(posting is None for posting in postings):
+            return set()
+        postings.sort(key=len)
+        candidates = postings[0]
+        for posting in postings[1:]:
+            candidates = np.intersect1d(candidates, posting, assume_unique=True)
+            if not len(candidates):
+                return set()
+        if len(word) == MIN_MATCH_LENGTH:
+            return set(candidates.tolist())
+        return {term_id for term_id in candidates.tolist() if word in self.terms[term_id]}
+
+    def _contained_terms(self, word: str) -> set:
+        """Terms with at least 3 characters that occur inside the word."""
+        matches = set()
+        for length in range(MIN_MATCH_LENGTH, min(len(word), self._max_term_length) + 1):
+            for start in range(len(word) - length + 1):
+                matches.update(self._exact.get(word[start:start + length], ()))
+        return matches
+
+    def match(self, words: set, accessible_fields) -> tuple:
+        """
+        Returns (matched_terms, field_scores) for the question words: the matched term labels
+        in index order, and the score per accessible field.
+        """
+        exact, partial, contains = set(), set(), set()
+        for word in words:
+            exact.update(self._exact.get(word, ()))
+            if len(word) >= MIN_MATCH_LENGTH:
+                partial |= self._partial_matches(word)
+            contains |= self._contained_terms(word)
+        partial -= exact
+        contains -= exact | partial
+
+        term_ids = np.asarray(sorted(exact | partial | contains), dtype=np.int64)
+        matched_terms = []
+        for term_id in term_ids.tolist():
+            suffix = "" if term_id in exact else " (partial)" if term_id in partial else " (contains)"
+            matched_terms.append(self.labels[term_id] + suffix)
+        if not len(term_ids):
+            return matched_terms, {}
+
+        weights = np.asarray([EXACT_WEIGHT if term_id in exact else PARTIAL_WEIGHT for term_id in term_ids.tolist()])
+        starts = self._offsets[term_ids]
+        counts = self._offsets[term_ids + 1] - starts
+        # Positions of all (term, field) entries of the matched terms in _term_fields
+        positions = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+        scores = np.bincount(self._term_fields[positions], weights=np.repeat(weights, counts), minlength=len(self.fields))
+        accessible = set(accessible_fields or [])
+        field_scores = {field: float(scores[i]) for i, field in enumerate(self.fields) if scores[i] > 0 and field in accessible}
+        return matched_terms, field_scores
@@ -0,0 +1,194 @@
+"""
+Local first-stage query router.
+
+Classifies a question into one of the route labels used by llm.route_query
+(vector_store / web_search / image_generation / direct_answer) without an LLM call:
+
+1. Keyword and regex rules for unambiguous cases (imperative image commands,
+   internal product terms, clearly time-sensitive questions). A time-sensitive
+   keyword only decides if the question has no reference to the organisation
+   ("Was ist heute unser Urlaubsanspruch?" is a knowledge base question); such
+   questions are left to the next stages. An image command needs the image as the
+   direct object of the verb ("Erstelle ein Bild von ..."); a command that only
+   mentions an image ("Erstelle eine Präsentation über unser Logo") is left to the
+   LLM router.
+2. A nearest-centroid model over question embeddings, trained offline from logged
+   ChatQuestionLog questions labelled by the LLM router
+   (see benchmarks/eval_query_router.py).
+
+If neither stage is confident, classify() returns None and the caller falls back
+to the LLM router.
+"""
+import json
+import os
+import re
+from datetime import datetime
+
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+QUERY_ROUTER_MODEL_PATH = os.getenv("QUERY_ROUTER_MODEL_PATH", os.path.join(SCRIPT_DIR, "query_router_model.json"))
+QUERY_ROUTER_MODEL_VERSION = 1
+ROUTE_LABELS = ("vector_store", "web_search", "image_generation", "direct_answer")
+# Minimum gap between the best and second-best centroid similarity to trust the local model.
+# Tuned by the evaluation harness and stored with the model; this is only the default.
+DEFAULT_MIN_MARGIN = 0.03
+# Questions shorter than this depend too much on the conversation ("und das?", "mehr dazu")
+MIN_QUESTION_WORDS = 3
+
+QUESTION_START = re.compile(
+    r"^\s*(wie|was|wer|wo|wann|warum|wieso|weshalb|welche[rsmn]?|kann|kannst|können|gibt|ist|sind|"
+    r"how|what|who|where|when|why|which|can|could|do|does|is|are)\b",
+    re.IGNORECASE,
+)
+IMAGE_VERBS = r"(erzeuge|erstelle|generiere|zeichne|male|mach|mache|draw|create|generate|paint|make|render)"
+IMAGE_NOUNS = (r"(bild|bilder|foto|fotos|grafik|illustration|zeichnung|logo|image|images|picture|pictures|photo|photos|"
+               r"drawing)")
+# The image noun is the direct object: verb, optional "mir"/"me", optional article or number,
+# at most one adjective, then the noun - followed by the end or a word that describes it
+IMAGE_COMMAND = re.compile(
+    r"^\s*(bitte\s+)?" + IMAGE_VERBS + r"\s+((mir|uns|me|us)\s+)?"
+    r"((ein|eine|einen|an|a|\d+|zwei|drei|vier|some)\s+)?([\w-]+\s+)?" + IMAGE_NOUNS +
+    r"(?=\s*[.,:;!]|\s*$|\s+(von|vom|mit|für|zu|zum|zur|eines|einer|einem|auf|als|in|im|das|der|die|"
+    r"of|with|for|showing|depicting|about|on|in|as|that|which|where)\b)",
+    re.IGNORECASE,
+)
+# An image command verb and an image word anywhere: too ambiguous for a rule or the centroid model
+IMAGE_MENTION = re.compile(r"^\s*(bitte\s+)?" + IMAGE_VERBS + r"\b.*\b" + IMAGE_NOUNS + r"\b", re.IGNORECASE)
+# Product and company terms that only exist in the internal knowledge base
+INTERNAL_TERMS = re.compile(r"\b(4plan|s4u|hrcc|ermittlungstyp\w*|software4you)\b", re.IGNORECASE)
+TIME_SENSITIVE = re.compile(
+    r"\b(heute|heutige[nrs]?|neueste[nrs]?|nachrichten|schlagzeilen|wetter|börsenkurs|aktienkurs|"
+    r"latest|today|breaking|news|headlines|weather|stock price)\b",
+    re.IGNORECASE,
+)
+# Words that tie a question to the organisation and its documents rather than to the news
+ORGANIZATION_CONTEXT = re.compile(
+    r"\b(unser|unsere[nmrs]?|uns|wir|intern\w*|firma|unternehmen|mitarbeiter\w*|kolleg\w*|richtlinie\w*|"
+    r"urlaub\w*|abteilung\w*|our|we|us|internal|company|policy|policies|employees?|colleagues?|department)\b",
+    re.IGNORECASE,
+)
+
+
+def classify_with_rules(question: str):
+    """
+    Applies the keyword/regex rules. Returns (label, reason), or (None, None) if no rule
+    applies. (None, reason) means the question must be left to the LLM router.
+    Mirrors the rules of the LLM routing prompt: questions about images are never
+    image_generation, only imperative commands are.
+    """
+    is_question = bool(QUESTION_START.match(question)) or question.strip().endswith("?")
+    if not is_question and IMAGE_COMMAND.match(question):
+        return "image_generation", "rule: imperative image command"
+    if INTERNAL_TERMS.search(question):
+        return "vector_store", "rule: internal product term"
+    if TIME_SENSITIVE.search(question) and not ORGANIZATION_CONTEXT.search(question):
+        return "web_search", "rule: time-sensitive question"
+    if not is_question and IMAGE_MENTION.match(question):
+        return None, "rule: command mentions an image that is not its object"
+    return None, None
+
+
+class LocalQueryRouter:
+    """Keyword rules plus a nearest-centroid classifier over question embeddings."""
+
+    def __init__(self, embed_fn=None, centroids: dict = None, min_margin: float = DEFAULT_MIN_MARGIN, embedding_model: str = None):
+        self.embed_fn = embed_fn
+        self.embedding_model = embedding_model
+        self.min_margin = min_margin
+        self.labels = []
+        self.centroid_matrix = None
+        if centroids:
+            self._set_centroids(centroids)
+
+    def _set_centroids(self, centroids: dict):
+        self.labels = [label for label in ROUTE_LABELS if label in centroids]
+        matrix = np.array([centroids[label] for label in self.labels], dtype=np.float32)
+        self.centroid_matrix = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroid_matrix is not None and len(self.labels) >= 2
+
+    def embed(self, questions: list) -> np.ndarray:
+        vectors = np.array([self.embed_fn(question) for question in questions], dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def fit(self, questions: list, labels: list, embeddings: np.ndarray = None):
+        """Computes one centroid per label from labelled questions (embeddings can be passed in precomputed)."""
+        if embeddings is None:
+            embeddings = self.embed(questions)
+        centroids = {}
+        for label in ROUTE_LABELS:
+            mask = np.array([l == label for l in labels])
+            if mask.any():
+                centroids[label] = embeddings[mask].mean(axis=0).tolist()
+        self._set_centroids(centroids)
+        return self
+
+    def score(self, embedding: np.ndarray):
+        """Returns (label, margin) for a normalized question embedding."""
+        similarities = self.centroid_matrix @ embedding
+        order = np.argsort(similarities)[::-1]
+        margin = float(similarities[order[0]] - similarities[order[1]])
+        return self.labels[order[0]], margin
+
+    def classify(self, question: str):
+        """
+        Returns (label, confidence, reason). label is None when the local router is
+        not confident and the LLM should decide.
+        """
+        label, reason = classify_with_rules(question)
+        if label:
+            return label, 1.0, reason
+        if reason:
+            return None, 0.0, reason
+        if len(question.split()) < MIN_QUESTION_WORDS:
+            return None, 0.0, "question too short for local routing"
+        if not self.is_trained or self.embed_fn is None:
+            return None, 0.0, "no local routing model"
+        try:
+            label, margin = self.score(self.embed([question])[0])
+        except Exception as e:
+            print(f"Local query router failed: {e}")
+            return None, 0.0, f"local routing error: {e}"
+        if margin < self.min_margin:
+            return None, margin, f"low confidence ({label}, margin {margin:.3f})"
+        return label, margin, f"centroid model (margin {margin:.3f})"
+
+    def save(self, path: str = QUERY_ROUTER_MODEL_PATH, trained_on: int = 0):
+        data = {
+            "version": QUERY_ROUTER_MODEL_VERSION,
+            "embedding_model": self.embedding_model,
+            "min_margin": self.min_margin,
+            "trained_on": trained_on,
+            "created": datetime.now().isoformat(),
+            "centroids": {label: self.centroid_matrix[i].tolist() for i, label in enumerate(self.labels)},
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    @classmethod
+    def load(cls, path: str = QUERY_ROUTER_MODEL_PATH, embed_fn=None, embedding_model: str = None):
+        """
+        Loads a trained model. Without a model file (or for a different embedding model)
+        only the keyword rules are used.
+        """
+        router = cls(embed_fn=embed_fn, embedding_model=embedding_model)
+        if not os.path.exists(path):
+            return router
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != QUERY_ROUTER_MODEL_VERSION:
+                print(f"Ignoring query router model with unsupported version {data.get('version')}")
+                return router
+            if embedding_model and data.get("embedding_model") != embedding_model:
+                print(f"Ignoring query router model trained for {data.get('embedding_model')} (current: {embedding_model})")
+                return router
+            router.min_margin = data.get("min_margin", DEFAULT_MIN_MARGIN)
+            router._set_centroids(data["centroids"])
+            print(f"Loaded local query router ({data.get('trained_on', 0)} training questions, min margin {router.min_margin:.3f})")
+        except Exception as e:
+            print(f"Could not load query router model: {e}")
+        return router
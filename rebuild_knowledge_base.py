@@ -6,9 +6,14 @@ Erstellt die Knowledge Base neu mit dem korrigierten Knowledge Field Bug
 
 import sys
 import os
+import argparse
 from app_logic import AppLogic
 
 def main():
+    parser = argparse.ArgumentParser(description="Rebuild the knowledge base")
+    parser.add_argument("--full", action="store_true", help="Re-index all documents instead of only changed ones")
+    args = parser.parse_args()
+
     print("🔄 Rebuilding Knowledge Base with corrected Knowledge Field detection...")
     print("="*70)
     
@@ -17,7 +22,7 @@ def main():
     
     # Führe Knowledge Base Update durch
     try:
-        for status_message in logic.update_knowledge_base():
+        for status_message in logic.update_knowledge_base(full_rebuild=args.full):
             print(f"📌 {status_message}")
         
         print("\n🎉 Knowledge Base Update erfolgreich abgeschlossen!")
@@ -0,0 +1,226 @@
+"""
+Local cross-encoder reranker for document questions.
+
+Scores (question, chunk) pairs with a small cross-encoder on the CPU. By default the
+sentence-transformers ONNX backend is used with a quantized model file; if the installed
+sentence-transformers has no ONNX support or the file is missing, the regular model is used.
+The model is loaded once, in the background on first use (or at startup via warm_up()).
+
+Pairs are scored in batches on a small thread pool. Scores are cached per (question hash,
+chunk hash), so follow-up questions over the same chunks and repeated questions are not
+scored again. Reranking has a latency budget: if the model is still loading or scoring takes
+longer than the budget, the chunks keep their vector-score order (batches that are still
+running finish in the background and fill the cache).
+
+Environment variables:
+    RERANKER_ENABLED            - "true"/"false" (default true)
+    RERANKER_MODEL              - cross-encoder model (default cross-encoder/mmarco-mMiniLMv2-L12-H384-v1, multilingual)
+    RERANKER_BACKEND            - "onnx" or "torch" (default onnx)
+    RERANKER_ONNX_FILE          - ONNX file inside the model repository (default onnx/model_qint8_avx512_vnni.onnx)
+    RERANKER_MAX_LENGTH         - maximum tokens per pair (default 512)
+    RERANKER_BATCH_SIZE         - pairs per batch (default 16)
+    RERANKER_WORKERS            - threads scoring batches in parallel (default 2)
+    RERANKER_LATENCY_BUDGET_MS  - time allowed for reranking one question (default 1500)
+    RERANKER_CACHE_SIZE         - cached pair scores (default 20000)
+"""
+import concurrent.futures
+import hashlib
+import importlib.util
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+SENTENCE_TRANSFORMERS_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None
+
+RERANKER_ENABLED = os.getenv("RERANKER_ENABLED", "true").lower() == "true"
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+RERANKER_BACKEND = os.getenv("RERANKER_BACKEND", "onnx").lower()
+RERANKER_ONNX_FILE = os.getenv("RERANKER_ONNX_FILE", "onnx/model_qint8_avx512_vnni.onnx")
+RERANKER_MAX_LENGTH = int(os.getenv("RERANKER_MAX_LENGTH", "512"))
+RERANKER_BATCH_SIZE = int(os.getenv("RERANKER_BATCH_SIZE", "16"))
+RERANKER_WORKERS = int(os.getenv("RERANKER_WORKERS", "2"))
+RERANKER_LATENCY_BUDGET_MS = float(os.getenv("RERANKER_LATENCY_BUDGET_MS", "1500"))
+RERANKER_CACHE_SIZE = int(os.getenv("RERANKER_CACHE_SIZE", "20000"))
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def chunk_key(doc) -> str:
+    """Stable chunk identity for the score cache: source and text of the chunk."""
+    return _hash(f"{doc.metadata.get('source', '')}\0{doc.page_content}")
+
+
+class CrossEncoderReranker:
+    """Cross-encoder with batched scoring on a thread pool, a pair score cache and a latency budget."""
+
+    def __init__(self, model_name: str = RERANKER_MODEL, backend: str = RERANKER_BACKEND, onnx_file: str = RERANKER_ONNX_FILE,
+                 max_length: int = RERANKER_MAX_LENGTH, batch_size: int = RERANKER_BATCH_SIZE, workers: int = RERANKER_WORKERS,
+                 latency_budget_ms: float = RERANKER_LATENCY_BUDGET_MS, cache_size: int = RERANKER_CACHE_SIZE,
+                 enabled: bool = RERANKER_ENABLED):
+        self.model_name = model_name
+        self.backend = backend
+        self.onnx_file = onnx_file
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.latency_budget_ms = latency_budget_ms
+        self.cache_size = cache_size
+        self.enabled = enabled and SENTENCE_TRANSFORMERS_AVAILABLE
+        self._model = None
+        self._load_error = None
+        self._load_future = None
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # (question hash, chunk hash) -> score, least recently used first
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="reranker")
+        self._stats = {"reranked": 0, "fallbacks": 0, "pairs_scored": 0, "cache_hits": 0, "load_seconds": None}
+
+    # --- Model loading ---
+
+    def _load(self):
+        from sentence_transformers import CrossEncoder
+        start = time.perf_counter()
+        model = None
+        if self.backend == "onnx":
+            try:
+                model = CrossEncoder(self.model_name, max_length=self.max_length, device="cpu",
+                                     backend="onnx", model_kwargs={"file_name": self.onnx_file})
+            except Exception as e:  # Older sentence-transformers or no ONNX file for this model
+                print(f"Reranker: ONNX model not available ({e}); loading the regular model.")
+        if model is None:
+            model = CrossEncoder(self.model_name, max_length=self.max_length, device="cpu")
+        self._stats["load_seconds"] = round(time.perf_counter() - start, 2)
+        print(f"Reranker model '{self.model_name}' loaded in {self._stats['load_seconds']:.1f}s")
+        return model
+
+    def _load_in_background(self):
+        try:
+            model = self._load()
+        except Exception as e:
+            print(f"Error loading reranker model '{self.model_name}': {e}")
+            with self._lock:
+                self._load_error = str(e)
+            return
+        with self._lock:
+            self._model = model
+
+    def warm_up(self) -> Optional[concurrent.futures.Future]:
+        """Starts loading the model in the background; returns the load future (None if disabled)."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            if self._load_future is None:
+                self._load_future = self._executor.submit(self._load_in_background)
+            return self._load_future
+
+    def is_ready(self) -> bool:
+        with self._lock:
+            return self._model is not None
+
+    # --- Scoring ---
+
+    def _cache_get(self, key):
+        with self._lock:
+            score = self._cache.get(key)
+            if score is not None:
+                self._cache.move_to_end(key)
+            return score
+
+    def _cache_put(self, keys: list, scores):
+        with self._lock:
+            for key, score in zip(keys, scores):
+                self._cache[key] = float(score)
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _score_batch(self, question: str, keys: list, texts: list) -> list:
+        scores = self._model.predict([(question, text) for text in texts], batch_size=len(texts), show_progress_bar=False)
+        self._cache_put(keys, scores)
+        with self._lock:
+            self._stats["pairs_scored"] += len(texts)
+        return [float(score) for score in scores]
+
+    def rerank(self, question: str, scored_docs: list, top_n: int, latency_budget_ms: float = None) -> tuple:
+        """
+        Reorders (doc, vector score) pairs, which are expected best vector score first.
+        Returns (top_n (doc, score) pairs, info). If the reranker is disabled, still loading or
+        over its latency budget, the vector order is kept and info["reranked"] is False.
+        """
+        start = time.perf_counter()
+        budget = (self.latency_budget_ms if latency_budget_ms is None else latency_budget_ms) / 1000
+        info = {"reranked": False, "reason": None, "cache_hits": 0, "scored": 0, "seconds": 0.0}
+
+        def fallback(reason):
+            with self._lock:
+                self._stats["fallbacks"] += 1
+            info.update(reason=reason, seconds=time.perf_counter() - start)
+            return scored_docs[:top_n], info
+
+        if not scored_docs:
+            info["reason"] = "no documents"
+            return [], info
+        if not self.enabled:
+            return fallback("reranker disabled" if SENTENCE_TRANSFORMERS_AVAILABLE else "sentence-transformers not installed")
+        self.warm_up()
+        if not self.is_ready():
+            return fallback(f"model not available ({self._load_error})" if self._load_error else "model still loading")
+
+        question_hash = _hash(question)
+        keys = [(question_hash, chunk_key(doc)) for doc, _ in scored_docs]
+        scores = [self._cache_get(key) for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        info["cache_hits"] = len(keys) - len(missing)
+        with self._lock:
+            self._stats["cache_hits"] += info["cache_hits"]
+
+        futures = {}
+        for offset in range(0, len(missing), self.batch_size):
+            batch = missing[offset:offset + self.batch_size]
+            future = self._executor.submit(self._score_batch, question, [keys[i] for i in batch], [scored_docs[i][0].page_content for i in batch])
+            futures[future] = batch
+        timeout = None if budget == float("inf") else max(0.0, budget - (time.perf_counter() - start))
+        done, not_done = concurrent.futures.wait(futures, timeout=timeout)
+        if not_done:
+            for future in not_done:
+                future.cancel()  # Batches already running still finish and fill the cache
+            return fallback(f"latency budget of {budget * 1000:.0f}ms exceeded")
+        try:
+            for future in done:
+                for i, score in zip(futures[future], future.result()):
+                    scores[i] = score
+        except Exception as e:
+            print(f"Reranker scoring failed: {e}")
+            return fallback(f"scoring failed ({e})")
+
+        ranked = sorted(((doc, score) for (doc, _), score in zip(scored_docs, scores)), key=lambda item: item[1], reverse=True)
+        with self._lock:
+            self._stats["reranked"] += 1
+        info.update(reranked=True, scored=len(missing), seconds=time.perf_counter() - start)
+        return ranked[:top_n], info
+
+    def get_statistics(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "model": self.model_name,
+                "ready": self._model is not None,
+                "load_error": self._load_error,
+                "cache_entries": len(self._cache),
+                **self._stats,
+            }
+
+
+# Global reranker instance
+_reranker: Optional[CrossEncoderReranker] = None
+_reranker_lock = threading.Lock()
+
+def get_reranker() -> CrossEncoderReranker:
+    """Get or create the global reranker"""
+    global _reranker
+    with _reranker_lock:
+        if _reranker is None:
+            _reranker = CrossEncoderReranker()
+        return _reranker
@@ -0,0 +1,199 @@
+"""
+Batched multi-query retrieval over the knowledge field FAISS indexes.
+
+All (expanded) queries of a question are embedded with a single embedding request. Each
+field's index is then searched once with the whole query matrix (index.search(Q, k)) instead
+of one retriever call per query and field, which embedded every query again for every field.
+
+Hits are returned as (Document, score) pairs. The score is the cosine similarity of query and
+chunk. Query vectors are normalized to unit length before every search. If the stored vectors
+have unit length too (checked on a sample once per index), the cosine is 1 - d / 2 for the
+squared distance d of the default L2 indexes and the product itself for inner-product indexes;
+otherwise it is computed from the norms of the stored hit vectors. Scores are therefore
+comparable across fields, are used to merge their results and can be compared with fixed
+thresholds (see benchmarks/eval_retrieval_thresholds.py).
+"""
+import asyncio
+import time
+
+import numpy as np
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.documents import Document
+
+
+def embed_queries(embeddings, queries: list) -> np.ndarray:
+    """Embeds all queries with one request; returns a float32 matrix with one row per query."""
+    return np.asarray(embeddings.embed_documents(list(queries)), dtype=np.float32)
+
+
+UNIT_NORM_SAMPLE = 256  # Stored vectors checked for unit length per index
+UNIT_NORM_TOLERANCE = 1e-3
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """Copy of the vectors scaled to unit length (zero vectors stay zero)."""
+    vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def has_unit_vectors(store) -> bool:
+    """
+    Whether the vectors stored in the index have unit length, checked on an evenly spread sample
+    and remembered on the store. Indexes that cannot reconstruct vectors are assumed normalized.
+    """
+    checked = getattr(store, "_unit_vectors", None)
+    if checked is None:
+        total = store.index.ntotal
+        checked = True
+        if total:
+            sample = np.unique(np.linspace(0, total - 1, min(UNIT_NORM_SAMPLE, total)).astype(np.int64))
+            try:
+                norms = np.linalg.norm(reconstruct_vectors(store, sample.tolist()), axis=1)
+                checked = bool(np.all(np.abs(norms - 1.0) <= UNIT_NORM_TOLERANCE))
+            except Exception as e:
+                print(f"Could not check vector norms of the index ({e}); assuming unit-length vectors")
+        if not checked:
+            print("Index vectors are not unit-length; similarities are computed from the stored vector norms")
+        store._unit_vectors = checked
+    return checked
+
+
+def distance_to_similarity(store, distances: np.ndarray, positions: np.ndarray = None) -> np.ndarray:
+    """
+    Cosine similarities of search results for unit-length queries. positions (the hit positions,
+    -1 for none) are needed for indexes whose vectors are not unit-length.
+    """
+    distances = np.asarray(distances, dtype=np.float32)
+    inner_product = store.distance_strategy in (DistanceStrategy.MAX_INNER_PRODUCT, DistanceStrategy.DOT_PRODUCT, DistanceStrategy.COSINE)
+    if positions is None or has_unit_vectors(store):
+        return distances if inner_product else 1.0 - distances / 2.0
+    positions = np.asarray(positions, dtype=np.int64)
+    norms = np.ones_like(distances)
+    found = positions >= 0
+    if found.any():
+        norms[found] = np.linalg.norm(reconstruct_vectors(store, positions[found].tolist()), axis=1)
+    norms = np.where(norms == 0, 1.0, norms)
+    # |q - x|^2 = 1 + |x|^2 - 2 q.x for a unit-length query q
+    products = distances if inner_product else (1.0 + norms ** 2 - distances) / 2.0
+    return products / norms
+
+
+def search_positions(store, query_vectors: np.ndarray, k: int) -> tuple:
+    """Runs one index.search for all query vectors; returns (positions, similarities), one row per query."""
+    vectors = normalize_rows(query_vectors)
+    distances, positions = store.index.search(vectors, min(k, store.index.ntotal) or 1)
+    return positions, distance_to_similarity(store, distances, positions)
+
+
+def documents_for_positions(store, scored_positions) -> list:
+    """Looks up the chunks of (index position, score) pairs; returns (Document, score) pairs."""
+    hits = []
+    for position, score in scored_positions:
+        if position == -1:
+            continue
+        doc = store.docstore.search(store.index_to_docstore_id[int(position)])
+        if isinstance(doc, Document):
+            hits.append((doc, float(score)))
+    return hits
+
+
+def search_store(store, query_vectors: np.ndarray, k: int) -> list:
+    """
+    Searches one FAISS store with all query vectors at once.
+    Returns one list of (Document, score) per query, best hit first.
+    """
+    positions, similarities = search_positions(store, query_vectors, k)
+    return [documents_for_positions(store, zip(row_positions, row_scores)) for row_positions, row_scores in zip(positions, similarities)]
+
+
+def best_position_scores(store, query_vectors: np.ndarray, k: int) -> dict:
+    """Searches with all query vectors and returns {index position: best similarity over all queries}."""
+    positions, similarities = search_positions(store, query_vectors, k)
+    best = {}
+    for position, score in zip(positions.ravel(), similarities.ravel()):
+        position = int(position)
+        if position != -1 and score > best.get(position, float("-inf")):
+            best[position] = float(score)
+    return best
+
+
+def reconstruct_vectors(store, positions: list) -> np.ndarray:
+    """Returns the vectors stored in the index for these positions, without an embedding request."""
+    keys = np.asarray(positions, dtype=np.int64)
+    try:
+        return np.asarray(store.index.reconstruct_batch(keys), dtype=np.float32)
+    except (AttributeError, RuntimeError):
+        return np.vstack([store.index.reconstruct(int(key)) for key in keys]).astype(np.float32)
+
+
+def top_by_cosine(vectors: np.ndarray, query_vector, n: int) -> list:
+    """Cosine similarity of every row with the query in one matrix product; returns the best n (row, similarity) pairs."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    query = np.asarray(query_vector, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query) or 1.0)
+    similarities = (vectors @ query) / np.where(norms == 0, 1.0, norms)
+    order = np.argsort(-similarities)[:n]
+    return [(int(row), float(similarities[row])) for row in order]
+
+
+def search_store_with_scores(store, query_vector, k: int) -> list:
+    """Searches one store with a single vector; returns (Document, similarity) pairs, best hit first."""
+    if not store.index.ntotal:
+        return []
+    hits = search_store(store, np.asarray([query_vector], dtype=np.float32), k)[0]
+    return sorted(hits, key=lambda item: item[1], reverse=True)
+
+
+def merge_scored_results(scored_docs, limit: int = None) -> list:
+    """
+    Merges (Document, score) pairs from several queries and fields: duplicates (same text and
+    source) keep their best score, the result is ordered by score.
+    """
+    best = {}
+    for doc, score in scored_docs:
+        key = (doc.page_content, doc.metadata.get('source', 'N/A'))
+        if key not in best or score > best[key][1]:
+            best[key] = (doc, score)
+    merged = sorted(best.values(), key=lambda item: item[1], reverse=True)
+    return merged[:limit] if limit else merged
+
+
+async def batched_search(stores: dict, queries: list, embeddings, k: int = 25, cancellation_check=lambda: False):
+    """
+    Embeds all queries in one request and searches every store with the query matrix.
+    Returns (results, errors, stats): the merged (Document, score) list per field, the exception
+    per failed field, and the number of embedding calls and the latencies.
+    """
+    results, errors = {}, {}
+    stats = {"queries": len(queries), "embedding_calls": 0, "embed_seconds": 0.0, "search_seconds": {}}
+    if not stores or not queries:
+        return results, errors, stats
+
+    start = time.perf_counter()
+    try:
+        query_vectors = await asyncio.to_thread(embed_queries, embeddings, queries)
+    except Exception as e:
+        return results, {field: e for field in stores}, stats
+    stats["embedding_calls"] = 1
+    stats["embed_seconds"] = time.perf_counter() - start
+    if cancellation_check():
+        return results, errors, stats
+
+    async def search_field(field, store):
+        field_start = time.perf_counter()
+        try:
+            per_query = await asyncio.to_thread(search_store, store, query_vectors, k)
+            results[field] = merge_scored_results(hit for hits in per_query for hit in hits)
+        except Exception as e:
+            errors[field] = e
+        stats["search_seconds"][field] = time.perf_counter() - field_start
+
+    await asyncio.gather(*[search_field(field, store) for field, store in stores.items()])
+    return results, errors, stats
+
+
+def format_search_stats(stats: dict) -> str:
+    search_times = ", ".join(f"{field} {seconds * 1000:.0f}ms" for field, seconds in stats["search_seconds"].items())
+    return (f"{stats['queries']} queries, {stats['embedding_calls']} embedding call(s) in {stats['embed_seconds'] * 1000:.0f}ms, "
+            f"search: {search_times or 'none'}")
@@ -1,6 +1,4 @@
-import os
-from llm import robust_api_call, LLM_MODEL
-from together import Together
+from llm_clients import get_together_client
 from database import SessionLocal, FaultyCodeLog
 from datetime import datetime
 
@@ -58,6 +56,8 @@ Your response MUST be a single word: 'SAFE' or 'UNSAFE'.
     ]
 
     try:
+        # llm wird erst hier importiert, damit der Import von security schnell bleibt.
+        from llm import robust_api_call, LLM_MODEL
         # Wir verwenden das Llama-3-Modell gemäß dem Feedback des Benutzers.
         response = robust_api_call(client, LLM_MODEL, messages, 0.0)
         decision = response.choices[0].message.content.strip().upper()
@@ -82,7 +82,7 @@ def is_code_safe(code: str) -> tuple[bool, str]:
 
     # Schritt 2: LLM-Audit (benötigt einen API-Client)
     try:
-        client = Together(api_key=os.getenv("TOGETHER_API_KEY"))
+        client = get_together_client()
         is_safe, reason = llm_security_audit(client, code)
         if not is_safe:
             return False, reason
@@ -0,0 +1,145 @@
+"""
+Compact on-disk format of the document structure index.
+
+The structure index ({category: {term: [field, ...]}, "field_stats": {...}}) used to be written
+as indented JSON, with every term stored twice (original and lower-cased alias, each with its own
+copy of the field list). It is now written with msgpack in a compact layout:
+
+- fields:     the knowledge field names once; postings refer to them by index
+- postings:   the distinct field lists, as CSR arrays (offsets uint32, field ids uint16)
+- categories: per category the term strings and one posting id per term (uint32); a lower-cased
+              alias with the same field list as its original term is not stored, the original
+              is flagged (uint8) and the alias is restored on load
+- field_stats is stored as is
+
+Arrays are little-endian bytes. The file starts with a format name and version;
+load_structure_index() reads the binary file if it has a known version and falls back to the
+JSON file of earlier versions otherwise. Without msgpack installed the index is written as
+compact JSON.
+"""
+import importlib.util
+import json
+import os
+
+import numpy as np
+
+MSGPACK_AVAILABLE = importlib.util.find_spec("msgpack") is not None
+
+STRUCTURE_INDEX_FORMAT = "document_structure_index"
+STRUCTURE_INDEX_VERSION = 1
+TERM_CATEGORIES = ("topics", "processes", "search_terms", "headings", "filenames")
+
+
+def _to_bytes(values, dtype) -> bytes:
+    return np.asarray(values, dtype=np.dtype(dtype).newbyteorder("<")).tobytes()
+
+
+def _from_bytes(data: bytes, dtype) -> list:
+    return np.frombuffer(data, dtype=np.dtype(dtype).newbyteorder("<")).tolist()
+
+
+def encode_structure_index(index: dict) -> dict:
+    """Compact, msgpack-serializable form of a structure index."""
+    field_ids, posting_ids = {}, {}
+    offsets, posting_fields = [0], []
+
+    def posting_id(fields) -> int:
+        key = tuple(field_ids.setdefault(field, len(field_ids)) for field in fields)
+        if key not in posting_ids:
+            posting_ids[key] = len(posting_ids)
+            posting_fields.extend(key)
+            offsets.append(len(posting_fields))
+        return posting_ids[key]
+
+    categories = {}
+    for category in TERM_CATEGORIES:
+        entries = index.get(category) or {}
+        # Lower-cased aliases that are restored from their original term on load
+        aliases, flagged = set(), set()
+        for term, fields in entries.items():
+            lower = term.lower()
+            if lower != term and lower not in aliases and entries.get(lower) == fields:
+                aliases.add(lower)
+                flagged.add(term)
+        terms, postings, aliased = [], [], []
+        for term, fields in entries.items():
+            if term in aliases:
+                continue
+            terms.append(term)
+            postings.append(posting_id(fields))
+            aliased.append(term in flagged)
+        categories[category] = {"terms": terms, "postings": _to_bytes(postings, np.uint32), "aliased": _to_bytes(aliased, np.uint8)}
+
+    return {
+        "format": STRUCTURE_INDEX_FORMAT,
+        "version": STRUCTURE_INDEX_VERSION,
+        "fields": list(field_ids),
+        "offsets": _to_bytes(offsets, np.uint32),
+        "field_ids": _to_bytes(posting_fields, np.uint16),
+        "categories": categories,
+        "field_stats": index.get("field_stats", {}),
+    }
+
+
+def decode_structure_index(data: dict) -> dict:
+    """Structure index from its compact form. Raises ValueError for an unknown format or version."""
+    if data.get("format") != STRUCTURE_INDEX_FORMAT or data.get("version") != STRUCTURE_INDEX_VERSION:
+        raise ValueError(f"Unsupported structure index format {data.get('format')!r} version {data.get('version')!r}")
+    fields = data["fields"]
+    offsets = _from_bytes(data["offsets"], np.uint32)
+    field_ids = _from_bytes(data["field_ids"], np.uint16)
+    # Terms with the same fields share one list, as a term and its alias do in a freshly built index
+    postings = [[fields[i] for i in field_ids[offsets[p]:offsets[p + 1]]] for p in range(len(offsets) - 1)]
+
+    index = {}
+    for category in TERM_CATEGORIES:
+        encoded = data["categories"].get(category)
+        entries = {}
+        if encoded:
+            terms = encoded["terms"]
+            entries = dict(zip(terms, map(postings.__getitem__, _from_bytes(encoded["postings"], np.uint32))))
+            for i in np.flatnonzero(np.frombuffer(encoded["aliased"], dtype=np.uint8)).tolist():
+                entries[terms[i].lower()] = entries[terms[i]]
+        index[category] = entries
+    index["field_stats"] = data.get("field_stats", {})
+    return index
+
+
+def save_structure_index(index: dict, binary_path: str, json_path: str) -> str:
+    """Writes the index in the compact binary format (JSON without msgpack). Returns the path written."""
+    if MSGPACK_AVAILABLE:
+        import msgpack
+        path, payload = binary_path, msgpack.packb(encode_structure_index(index), use_bin_type=True)
+    else:
+        path, payload = json_path, json.dumps(index, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(payload)
+    os.replace(temp_path, path)
+    # An older file in the other format would otherwise be loaded instead of (or after) this one
+    other_path = json_path if path == binary_path else binary_path
+    if os.path.exists(other_path):
+        os.remove(other_path)
+    return path
+
+
+def load_structure_index(binary_path: str, json_path: str):
+    """
+    Returns (index, path loaded) from the binary file, or from the JSON file if the binary file
+    is missing, has an unknown version or msgpack is not installed. (None, None) if neither exists.
+    """
+    if MSGPACK_AVAILABLE and os.path.exists(binary_path):
+        import msgpack
+        try:
+            with open(binary_path, "rb") as f:
+                return decode_structure_index(msgpack.unpackb(f.read(), raw=False)), binary_path
+        except Exception as e:
+            print(f"Could not load binary structure index {binary_path} ({e}); trying {json_path}")
+    if os.path.exists(json_path):
+        with open(json_path, "r", encoding="utf-8") as f:
+            return json.load(f), json_path
+    return None, None
+
+
+def structure_index_exists(binary_path: str, json_path: str) -> bool:
+    return (MSGPACK_AVAILABLE and os.path.exists(binary_path)) or os.path.exists(json_path)
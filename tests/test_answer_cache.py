@@ -0,0 +1,104 @@
+"""
+SemanticAnswerCache on its own: similarity threshold, keying by knowledge fields and
+language, TTL, LRU eviction and invalidation after knowledge base rebuilds.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import answer_cache  # noqa: E402
+from answer_cache import SemanticAnswerCache  # noqa: E402
+
+FIELDS = ["Handbuch"]
+
+
+def store(cache, embedding, fields=FIELDS, language="de", answer="Im Personalportal.", question="Wie beantrage ich Urlaub?"):
+    cache.store(question, embedding, fields, language, answer, "Urlaub.docx", "Urlaub", ["Wer genehmigt?"], "vector_store")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replaces time.time() in answer_cache; returns the mutable current time."""
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_similar_question_is_a_hit_and_dissimilar_one_a_miss():
+    cache = SemanticAnswerCache(similarity_threshold=0.95)
+    store(cache, [1.0, 0.0, 0.0])
+
+    hit = cache.lookup([10.0, 0.5, 0.0], FIELDS, "de")  # Not normalized, cosine ~0.999
+    assert hit["answer"] == "Im Personalportal."
+    assert hit["follow_ups"] == ["Wer genehmigt?"]
+    assert hit["similarity"] == pytest.approx(0.9988, abs=1e-3)
+    assert cache.lookup([0.7, 0.7, 0.0], FIELDS, "de") is None  # cosine ~0.71
+
+    stats = cache.get_statistics()
+    assert (stats["hits"], stats["misses"], stats["stores"]) == (1, 1, 1)
+
+
+def test_entries_are_keyed_by_field_set_and_language():
+    cache = SemanticAnswerCache()
+    store(cache, [1.0, 0.0], fields=["Handbuch", "Vertrieb"], language="de")
+
+    assert cache.lookup([1.0, 0.0], ["Vertrieb", "Handbuch"], "de") is not None  # Order does not matter
+    assert cache.lookup([1.0, 0.0], ["Handbuch"], "de") is None
+    assert cache.lookup([1.0, 0.0], ["Handbuch", "Vertrieb"], "en") is None
+    assert cache.lookup([1.0, 0.0], ["Handbuch", "Vertrieb"], None) is None
+
+
+def test_empty_answers_are_not_stored():
+    cache = SemanticAnswerCache()
+    store(cache, [1.0, 0.0], answer="")
+    assert cache.get_statistics()["entries"] == 0
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = SemanticAnswerCache(ttl_seconds=60)
+    store(cache, [1.0, 0.0])
+
+    clock[0] += 60
+    assert cache.lookup([1.0, 0.0], FIELDS, "de") is not None
+    clock[0] += 1
+    assert cache.lookup([1.0, 0.0], FIELDS, "de") is None
+    assert cache.get_statistics()["expirations"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticAnswerCache(max_entries=2)
+    store(cache, [1.0, 0.0, 0.0], answer="A")
+    store(cache, [0.0, 1.0, 0.0], answer="B")
+    assert cache.lookup([1.0, 0.0, 0.0], FIELDS, "de")["answer"] == "A"  # B is now the least recently used
+
+    store(cache, [0.0, 0.0, 1.0], answer="C")
+    assert cache.lookup([0.0, 1.0, 0.0], FIELDS, "de") is None
+    assert cache.lookup([1.0, 0.0, 0.0], FIELDS, "de")["answer"] == "A"
+    assert cache.lookup([0.0, 0.0, 1.0], FIELDS, "de")["answer"] == "C"
+    assert cache.get_statistics()["evictions"] == 1
+
+
+def test_invalidate_field_removes_every_answer_that_used_the_field():
+    cache = SemanticAnswerCache()
+    store(cache, [1.0, 0.0], fields=["Handbuch"])
+    store(cache, [1.0, 0.0], fields=["Handbuch", "Vertrieb"])
+    store(cache, [1.0, 0.0], fields=["Vertrieb"])
+
+    assert cache.invalidate_field("Handbuch") == 2
+    assert cache.lookup([1.0, 0.0], ["Handbuch"], "de") is None
+    assert cache.lookup([1.0, 0.0], ["Vertrieb"], "de") is not None
+    assert cache.invalidate_field("Finanzen") == 0
+
+
+def test_retain_fields_drops_answers_of_deleted_fields():
+    cache = SemanticAnswerCache()
+    store(cache, [1.0, 0.0], fields=["Handbuch"])
+    store(cache, [1.0, 0.0], fields=["Handbuch", "Archiv"])
+
+    assert cache.retain_fields(["Handbuch", "Vertrieb"]) == 1
+    assert cache.lookup([1.0, 0.0], ["Handbuch"], "de") is not None
+    assert cache.lookup([1.0, 0.0], ["Handbuch", "Archiv"], "de") is None
+    assert cache.get_statistics()["invalidations"] == 1
@@ -0,0 +1,61 @@
+"""
+Knowledge field access control in field selection and the semantic prescreen: no selection
+means all fields the user may access, a selection without accessible fields searches nothing.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+llm = pytest.importorskip("llm")
+
+USER = "anna@example.com"
+FIELDS = ["Handbuch", "Vertrieb", "Finanzen"]
+
+
+class Store:
+    """Stands in for a FAISS store; the searches are stubbed."""
+
+
+@pytest.fixture
+def fields(monkeypatch):
+    """Three loaded fields of which the user may access only Handbuch; returns the searched fields."""
+    searched = []
+    monkeypatch.setattr(llm, "vector_stores", {field: Store() for field in FIELDS})
+    monkeypatch.setattr(llm, "check_knowledge_field_permission", lambda email, field: field == "Handbuch")
+    monkeypatch.setattr(llm, "embed_query_cached", lambda text: (1.0, 0.0))
+
+    def search_store_with_scores(store, query_vector, k):
+        field = next(name for name, candidate in llm.vector_stores.items() if candidate is store)
+        searched.append(field)
+        return [(llm.Document(page_content=field, metadata={}), 0.9)]
+
+    monkeypatch.setattr(llm, "search_store_with_scores", search_store_with_scores)
+    return searched
+
+
+def test_no_selection_means_all_accessible_fields(fields):
+    assert llm._accessible_field_selection(USER, None) == ["Handbuch"]
+    assert llm._accessible_field_selection(USER, []) == ["Handbuch"]
+    assert llm._accessible_field_selection(None, []) is None
+    assert llm._select_target_fields(None) == FIELDS
+
+
+def test_selection_without_accessible_fields_searches_nothing(fields):
+    selection = llm._accessible_field_selection(USER, ["Vertrieb", "Finanzen"])
+    assert selection == []
+    assert llm._select_target_fields(selection) == []
+    assert llm._select_target_stores(selection) == {}
+
+
+def test_prescreen_searches_and_returns_only_accessible_fields(fields):
+    result = llm.ultra_fast_semantic_prescreen("Wie hoch ist das Budget?", ["Vertrieb", "Finanzen"], USER)
+    assert fields == []
+    assert result["relevant_fields"] == []
+
+    scored_results = {field: [(llm.Document(page_content=field, metadata={}), 0.95)] for field in FIELDS}
+    result = llm.ultra_fast_semantic_prescreen("Wie hoch ist das Budget?", None, USER, scored_results=scored_results)
+    assert set(result["results"]) == {"Handbuch"}
+    assert result["relevant_fields"] == ["Handbuch"]
@@ -0,0 +1,104 @@
+"""
+Answer cache in get_answer, consumed the way api.stream_and_process_response does: events are
+read until {"type": "end"} and the generator is not resumed after it.
+
+The LLM calls, the router and the vector search are replaced by stubs; the answer cache is the
+real SemanticAnswerCache. Needs the app's dependencies (llm); the cache itself is tested in
+test_answer_cache.py.
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+llm = pytest.importorskip("llm")
+from answer_cache import SemanticAnswerCache  # noqa: E402
+
+FIELD = "Handbuch"
+QUESTION = "Wie beantrage ich Urlaub im Personalportal?"
+
+
+@pytest.fixture
+def stubbed_llm(monkeypatch):
+    """Stubs everything get_answer calls outside this process; returns the call counters and the route."""
+    state = {"answers": 0, "route": "vector_store"}
+    doc = llm.Document(page_content="Urlaub wird im Personalportal beantragt.", metadata={"source": "Urlaub.docx"})
+
+    async def stream_answer_with_follow_ups(*args, **kwargs):
+        state["answers"] += 1
+        yield {"type": "chunk", "data": "Im Personalportal unter Abwesenheiten."}
+        yield {"type": "follow_ups", "data": ["Wer genehmigt den Antrag?"]}
+
+    async def search_vector_stores(target_stores, queries, k=25, cancellation_check=lambda: False):
+        return {}, {}, None
+
+    monkeypatch.setattr(llm, "answer_cache", SemanticAnswerCache())
+    monkeypatch.setattr(llm, "ANSWER_CACHE_ENABLED", True)
+    monkeypatch.setattr(llm, "get_together_client", lambda: None)
+    monkeypatch.setattr(llm, "load_features", lambda: {"web_search": False})
+    monkeypatch.setattr(llm, "check_for_ambiguity", lambda *args, **kwargs: {"clarification_needed": False})
+    monkeypatch.setattr(llm, "can_answer_from_conversation_context", lambda *args, **kwargs: False)
+    monkeypatch.setattr(llm, "assess_context_quality_for_followup", lambda *args, **kwargs: {"quality_score": 0.0, "recommended_action": "use_context"})
+    monkeypatch.setattr(llm, "route_query", lambda *args, **kwargs: state["route"])
+    monkeypatch.setattr(llm, "expand_query_with_llm", lambda client, history, *args, **kwargs: [history[-1]["content"]])
+    monkeypatch.setattr(llm, "embed_query_cached", lambda text: (1.0, 0.0, 0.0))
+    monkeypatch.setattr(llm, "detect_question_language", lambda text: "de")
+    monkeypatch.setattr(llm, "vector_stores", {FIELD: object()})
+    monkeypatch.setattr(llm, "_select_target_fields", lambda fields: [FIELD])
+    monkeypatch.setattr(llm, "_select_target_stores", lambda fields: {FIELD: object()})
+    monkeypatch.setattr(llm, "search_vector_stores", search_vector_stores)
+    monkeypatch.setattr(llm, "ultra_fast_semantic_prescreen", lambda *args, **kwargs: {
+        "reason": "", "results": {FIELD: [(doc, 0.9)]}, "decision": "high", "has_relevant_content": True,
+        "relevant_fields": [FIELD], "max_similarity": 0.9,
+    })
+    monkeypatch.setattr(llm, "evaluate_vector_store_quality", lambda *args, **kwargs: {"quality_sufficient": True, "reason": ""})
+    monkeypatch.setattr(llm, "stream_answer_with_follow_ups", stream_answer_with_follow_ups)
+    return state
+
+
+def ask(question: str) -> list:
+    """Reads the events of get_answer like api.stream_and_process_response: up to and including "end"."""
+    async def consume():
+        events = []
+        async for event in llm.get_answer([{"role": "user", "content": question}], selected_fields=[FIELD]):
+            events.append(event)
+            if event["type"] == "end":
+                break
+        return events
+    return asyncio.run(consume())
+
+
+def meta(events: list) -> dict:
+    return next(event["data"] for event in events if event["type"] == "meta")
+
+
+def answer_text(events: list) -> str:
+    return "".join(event["data"] for event in events if event["type"] == "chunk")
+
+
+def test_answer_is_cached_before_end_and_served_for_the_same_question(stubbed_llm):
+    first = ask(QUESTION)
+    assert stubbed_llm["answers"] == 1
+    assert not meta(first).get("cached")
+    assert llm.answer_cache.get_statistics()["stores"] == 1
+
+    second = ask(QUESTION)
+    assert stubbed_llm["answers"] == 1  # No second LLM answer
+    assert meta(second).get("cached") is True
+    assert answer_text(second) == answer_text(first)
+    assert {"type": "follow_ups", "data": ["Wer genehmigt den Antrag?"]} in second
+    assert second[-1] == {"type": "end"}
+
+
+def test_cached_answer_is_not_served_for_a_question_routed_elsewhere(stubbed_llm):
+    ask(QUESTION)
+    assert stubbed_llm["answers"] == 1
+
+    stubbed_llm["route"] = "direct_answer"
+    events = ask(QUESTION)
+    assert stubbed_llm["answers"] == 2
+    assert not meta(events).get("cached")
+    assert meta(events)["sources"] == "General Knowledge"
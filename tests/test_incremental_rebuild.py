@@ -0,0 +1,142 @@
+"""
+Incremental knowledge base rebuilds (force_create_vector_store) over a temporary Documents/
+directory: documents whose parser fails must not be recorded in the manifest, so the next
+incremental rebuild parses them again, and a field whose embedding fails keeps its previous
+generation without stopping the other fields.
+
+Embeddings are deterministic hash vectors and unstructured's partition is replaced by a stub;
+parsing runs in-process (KB_PARSE_WORKERS=1), the FAISS index and manifest are real. The
+document structure index (LLM analysis) is not built.
+"""
+import hashlib
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+llm = pytest.importorskip("llm")
+pytest.importorskip("faiss")
+docx = pytest.importorskip("docx")
+fitz = pytest.importorskip("fitz")
+from vector_store_registry import VectorStoreRegistry  # noqa: E402
+
+FIELD = "Handbuch"
+
+
+class HashEmbeddings:
+    """Unit-length vectors derived from the text hash; equal texts get equal vectors. Texts containing FAIL raise."""
+    dimensions = 16
+
+    def embed_query(self, text):
+        if "FAIL" in text:
+            raise RuntimeError("embedding API unavailable")
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        vector = [byte - 127.5 for byte in digest[:self.dimensions]]
+        norm = sum(value * value for value in vector) ** 0.5
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+@pytest.fixture
+def knowledge_base(tmp_path, monkeypatch):
+    """Documents/<FIELD> with one DOCX and one PDF; returns the partition stub's state."""
+    documents_path = tmp_path / "Documents"
+    field_path = documents_path / FIELD
+    field_path.mkdir(parents=True)
+    write_docx(field_path / "Urlaub.docx", "Urlaub", "Urlaub wird im Personalportal unter Abwesenheiten beantragt.")
+    with fitz.open() as pdf:
+        pdf.new_page().insert_text((72, 72), "Reisekosten werden monatlich abgerechnet.")
+        pdf.save(str(field_path / "Reisekosten.pdf"))
+
+    state = {"calls": 0, "fail": True}
+
+    def partition(filename, **kwargs):
+        state["calls"] += 1
+        if state["fail"]:
+            raise RuntimeError("hi_res model not available")
+        return [types.SimpleNamespace(category="Title", text="Reisekosten", id="e1"),
+                types.SimpleNamespace(category="NarrativeText", text="Reisekosten werden monatlich abgerechnet.", id="e2")]
+
+    partition_module = types.ModuleType("unstructured.partition.auto")
+    partition_module.partition = partition
+    monkeypatch.setitem(sys.modules, "unstructured", types.ModuleType("unstructured"))
+    monkeypatch.setitem(sys.modules, "unstructured.partition", types.ModuleType("unstructured.partition"))
+    monkeypatch.setitem(sys.modules, "unstructured.partition.auto", partition_module)
+
+    monkeypatch.setattr(llm, "DOCUMENTS_PATH", str(documents_path))
+    monkeypatch.setattr(llm, "VECTOR_STORE_PATH", str(tmp_path / "vector_store"))
+    monkeypatch.setattr(llm, "KB_PARSE_WORKERS", 1)
+    monkeypatch.setattr(llm, "EMBEDDING_CACHE_ENABLED", False)
+    monkeypatch.setattr(llm, "get_embeddings", lambda model: HashEmbeddings())
+    monkeypatch.setattr(llm, "create_document_structure_index", lambda fields: {})  # LLM analysis, not under test
+    monkeypatch.setattr(llm, "vector_stores", VectorStoreRegistry(
+        list_fields=lambda: llm._list_vector_store_fields(),
+        resolve_path=lambda field: llm._resolve_field_store_path(field),
+        embeddings_factory=HashEmbeddings,
+    ))
+    return state
+
+
+def write_docx(path, heading: str, text: str):
+    document = docx.Document()
+    document.add_heading(heading, level=1)
+    document.add_paragraph(text)
+    document.save(str(path))
+
+
+def rebuild() -> list:
+    return list(llm.force_create_vector_store())
+
+
+def manifest_files(field: str = FIELD) -> dict:
+    return llm._load_vector_store_manifest(llm._resolve_field_store_path(field))["files"]
+
+
+def test_failed_pdf_is_not_indexed_and_is_parsed_again_on_the_next_rebuild(knowledge_base):
+    messages = rebuild()
+    assert knowledge_base["calls"] == 1
+    assert any("CRITICAL ERROR processing Reisekosten.pdf" in message for message in messages)
+    assert set(manifest_files()) == {"Urlaub.docx"}
+
+    knowledge_base["fail"] = False
+    messages = rebuild()
+    assert knowledge_base["calls"] == 2
+    assert any("'Handbuch': 1 added, 0 changed, 0 deleted, 1 unchanged documents" in message for message in messages)
+    files = manifest_files()
+    assert set(files) == {"Urlaub.docx", "Reisekosten.pdf"}
+    assert files["Reisekosten.pdf"]["chunk_ids"]
+
+
+def test_documents_without_changes_are_not_parsed_again(knowledge_base):
+    knowledge_base["fail"] = False
+    rebuild()
+    assert knowledge_base["calls"] == 1
+
+    messages = rebuild()
+    assert knowledge_base["calls"] == 1
+    assert any("No changes in 'Handbuch'" in message for message in messages)
+
+
+def test_failed_embedding_keeps_the_previous_generation_and_updates_the_other_fields(knowledge_base):
+    knowledge_base["fail"] = False
+    sales_path = os.path.join(llm.DOCUMENTS_PATH, "Vertrieb")
+    os.makedirs(sales_path)
+    write_docx(os.path.join(sales_path, "Preise.docx"), "Preise", "Rabatte über 10 % gibt die Vertriebsleitung frei.")
+    rebuild()
+    sales_generation = llm.get_current_generation("Vertrieb")
+    handbook_generation = llm.get_current_generation(FIELD)
+
+    write_docx(os.path.join(sales_path, "Preise.docx"), "Preise", "FAIL")
+    write_docx(os.path.join(llm.DOCUMENTS_PATH, FIELD, "Urlaub.docx"), "Urlaub", "Resturlaub verfällt am 31. März.")
+    messages = rebuild()
+
+    assert any("ERROR: Updating the index of 'Vertrieb' failed" in message for message in messages)
+    assert llm.get_current_generation("Vertrieb") == sales_generation
+    assert manifest_files("Vertrieb")["Preise.docx"]["chunk_ids"]
+    assert llm.get_current_generation(FIELD) != handbook_generation
+    assert "--- Knowledge base update complete. ---" in messages
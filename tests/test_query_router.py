@@ -0,0 +1,29 @@
+"""
+Keyword rules of the local query router against the fixed cases of the router evaluation
+(benchmarks/query_router_rule_cases.json).
+"""
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from query_router import LocalQueryRouter, classify_with_rules  # noqa: E402
+
+with open(os.path.join(ROOT, "benchmarks", "query_router_rule_cases.json"), "r", encoding="utf-8") as f:
+    RULE_CASES = json.load(f)
+
+
+@pytest.mark.parametrize("case", RULE_CASES, ids=[case["question"] for case in RULE_CASES])
+def test_rule_cases(case):
+    assert classify_with_rules(case["question"])[0] == case["expected"]
+
+
+def test_command_that_only_mentions_an_image_is_left_to_the_llm():
+    router = LocalQueryRouter(embed_fn=lambda question: [1.0, 0.0], centroids={"image_generation": [1.0, 0.0], "direct_answer": [0.0, 1.0]})
+    label, confidence, _ = router.classify("Erstelle eine Präsentation über unser Logo")
+    assert label is None and confidence == 0.0
+    assert router.classify("Erstelle ein Bild von einer Katze")[:2] == ("image_generation", 1.0)
@@ -0,0 +1,99 @@
+"""
+In-memory cache of the RAG data of uploaded documents.
+
+A PDF/DOCX uploaded for RAG is stored per session in its own directory
+(rag_vector_store_path): either a FAISS index or, for documents analysed as a whole,
+fulltext_content.txt. The first question loads it from disk; follow-up questions on the
+same document reuse the loaded handle instead of reading the directory again.
+
+Handles are keyed by the directory and released when the session's upload is cleaned up
+(new dialog, new upload, disconnect). When the estimated memory of all handles exceeds the
+budget, the least recently used handles are dropped and loaded again on their next question.
+
+Environment variables:
+    UPLOAD_STORE_CACHE_MB   - estimated memory of cached upload handles (default 512)
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+UPLOAD_STORE_CACHE_BYTES = int(float(os.getenv("UPLOAD_STORE_CACHE_MB", "512")) * 1024 * 1024)
+
+
+def estimate_handle_bytes(kind: str, value) -> int:
+    if kind == "fulltext":
+        return sys.getsizeof(value)
+    index = value.index
+    index_bytes = index.ntotal * getattr(index, "code_size", index.d * 4)
+    chunks = getattr(value.docstore, "_dict", {}).values()
+    return index_bytes + sum(sys.getsizeof(doc.page_content) for doc in chunks)
+
+
+class UploadStoreCache:
+    """Thread-safe LRU cache of (kind, value) handles, kind "vector" (FAISS store) or "fulltext" (text)."""
+
+    def __init__(self, max_bytes: int = UPLOAD_STORE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._path_locks = {}
+        self._entries = OrderedDict()  # path -> (kind, value, estimated bytes), least recently used first
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "releases": 0}
+
+    def get(self, path: str, loader) -> tuple:
+        """Returns the cached (kind, value) for path; loader(path) loads it on a miss. Blocking."""
+        key = os.path.abspath(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[0], entry[1]
+            path_lock = self._path_locks.setdefault(key, threading.Lock())
+        # Concurrent questions on the same upload wait for one load instead of loading twice
+        with path_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry[0], entry[1]
+                self._stats["misses"] += 1
+            kind, value = loader(path)
+            size = estimate_handle_bytes(kind, value)
+            with self._lock:
+                self._entries[key] = (kind, value, size)
+                self._entries.move_to_end(key)
+                self._enforce_budget(keep=key)
+            return kind, value
+
+    def _enforce_budget(self, keep):
+        while sum(size for _, _, size in self._entries.values()) > self.max_bytes:
+            coldest = next((key for key in self._entries if key != keep), None)
+            if coldest is None:
+                break
+            del self._entries[coldest]
+            self._stats["evictions"] += 1
+
+    def release(self, path: str):
+        """Drops the handle of an upload directory (called when the session's upload is cleaned up)."""
+        if not path:
+            return
+        key = os.path.abspath(path)
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._stats["releases"] += 1
+            self._path_locks.pop(key, None)
+
+    def get_statistics(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "memory_mb": round(sum(size for _, _, size in self._entries.values()) / (1024 * 1024), 2),
+                "budget_mb": round(self.max_bytes / (1024 * 1024), 2),
+                **self._stats,
+            }
+
+
+# Global upload store cache instance
+upload_store_cache = UploadStoreCache()
@@ -0,0 +1,259 @@
+"""
+Lazily loaded, memory-bounded registry of the knowledge base vector stores.
+
+Knowledge fields are no longer all loaded into memory at startup. A field's FAISS index is
+loaded the first time the field is queried. Where the faiss build and index type allow it,
+index.faiss is memory-mapped read-only. Chunk texts and metadata are read on demand from a
+SQLite docstore (docstore.sqlite) next to the index instead of a pickled in-memory docstore.
+When the estimated memory of the loaded fields exceeds the budget, the least recently used
+fields are unloaded again; questions that still hold a store object keep using it.
+
+Stores written before the SQLite docstore (index.faiss + index.pkl) are still loaded with
+FAISS.load_local.
+
+Environment variables:
+    VECTOR_STORE_MMAP               - "true"/"false": memory-map index.faiss read-only (default true)
+    VECTOR_STORE_MEMORY_BUDGET_MB   - estimated memory of loaded fields before cold fields are unloaded (default 2048)
+"""
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from pathlib import Path
+
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+VECTOR_STORE_MMAP = os.getenv("VECTOR_STORE_MMAP", "true").lower() == "true"
+VECTOR_STORE_MEMORY_BUDGET_BYTES = int(float(os.getenv("VECTOR_STORE_MEMORY_BUDGET_MB", "2048")) * 1024 * 1024)
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "docstore.sqlite"
+BYTES_PER_DOCSTORE_ID = 120  # Rough size of one entry of index_to_docstore_id
+
+
+class SQLiteDocstore(Docstore):
+    """Read-only docstore that reads chunks from docstore.sqlite when a search returns them."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(f"{Path(path).absolute().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+
+    @staticmethod
+    def _to_document(page_content: str, metadata: str) -> Document:
+        return Document(page_content=page_content, metadata=json.loads(metadata))
+
+    def search(self, search: str):
+        with self._lock:
+            row = self._connection.execute("SELECT page_content, metadata FROM chunks WHERE docstore_id = ?", (search,)).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return self._to_document(*row)
+
+    def index_to_docstore_id(self) -> dict:
+        with self._lock:
+            return dict(self._connection.execute("SELECT position, docstore_id FROM chunks ORDER BY position").fetchall())
+
+    def to_in_memory(self) -> InMemoryDocstore:
+        """Loads all chunks, for stores that are modified (incremental rebuilds)."""
+        with self._lock:
+            rows = self._connection.execute("SELECT docstore_id, page_content, metadata FROM chunks").fetchall()
+        return InMemoryDocstore({docstore_id: self._to_document(content, metadata) for docstore_id, content, metadata in rows})
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def save_field_store(store: FAISS, path: str):
+    """Writes index.faiss and docstore.sqlite for a store; no pickle is written."""
+    import faiss
+    os.makedirs(path, exist_ok=True)
+    faiss.write_index(store.index, os.path.join(path, INDEX_FILE))
+    docstore_path = os.path.join(path, DOCSTORE_FILE)
+    if os.path.exists(docstore_path):
+        os.remove(docstore_path)
+    connection = sqlite3.connect(docstore_path)
+    try:
+        connection.execute("PRAGMA journal_mode=OFF")
+        connection.execute("""
+            CREATE TABLE chunks (
+                docstore_id TEXT PRIMARY KEY,
+                position INTEGER NOT NULL UNIQUE,
+                page_content TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            )
+        """)
+        rows = []
+        for position, docstore_id in store.index_to_docstore_id.items():
+            doc = store.docstore.search(docstore_id)
+            if not isinstance(doc, Document):
+                raise ValueError(f"Chunk {docstore_id} is missing from the docstore")
+            rows.append((docstore_id, position, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False, default=str)))
+        connection.executemany("INSERT INTO chunks (docstore_id, position, page_content, metadata) VALUES (?, ?, ?, ?)", rows)
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def _read_index(index_path: str, mmap: bool):
+    import faiss
+    if mmap:
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+        try:
+            return faiss.read_index(index_path, flags)
+        except Exception as e:
+            print(f"Could not memory-map {index_path} ({e}); reading it into memory.")
+    return faiss.read_index(index_path)
+
+
+def load_field_store(path: str, embeddings, mmap: bool = VECTOR_STORE_MMAP, writable: bool = False) -> FAISS:
+    """
+    Loads a field's store from a directory. Serving stores use the SQLite docstore and a
+    memory-mapped index; writable=True loads index and chunks fully into memory so the store
+    can be modified and saved again.
+    """
+    if not os.path.exists(os.path.join(path, DOCSTORE_FILE)):
+        return FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+    index = _read_index(os.path.join(path, INDEX_FILE), mmap and not writable)
+    docstore = SQLiteDocstore(os.path.join(path, DOCSTORE_FILE))
+    index_to_docstore_id = docstore.index_to_docstore_id()
+    if writable:
+        in_memory = docstore.to_in_memory()
+        docstore.close()
+        docstore = in_memory
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+
+def estimate_store_bytes(store: FAISS) -> int:
+    index = store.index
+    code_size = getattr(index, "code_size", index.d * 4)
+    return index.ntotal * code_size + len(store.index_to_docstore_id) * BYTES_PER_DOCSTORE_ID
+
+
+class VectorStoreRegistry(Mapping):
+    """
+    Mapping of knowledge field -> FAISS store that loads stores on first access and unloads
+    the least recently used ones when the memory budget is exceeded.
+
+    list_fields() returns the fields available on disk, resolve_path(field) the directory
+    of a field's served index, embeddings_factory() the embeddings for loaded stores.
+    """
+
+    def __init__(self, list_fields, resolve_path, embeddings_factory, memory_budget_bytes: int = VECTOR_STORE_MEMORY_BUDGET_BYTES,
+                 mmap: bool = VECTOR_STORE_MMAP):
+        self.list_fields = list_fields
+        self.resolve_path = resolve_path
+        self.embeddings_factory = embeddings_factory
+        self.memory_budget_bytes = memory_budget_bytes
+        self.mmap = mmap
+        self._lock = threading.RLock()
+        self._field_locks = {}
+        self._known = None  # Field names; read from disk on first use or by refresh()
+        self._loaded = OrderedDict()  # field -> (store, estimated bytes), least recently used first
+        self._stats = {"loads": 0, "evictions": 0, "load_errors": 0}
+
+    def refresh(self):
+        """Re-reads the available fields from disk; loaded stores of removed fields are dropped."""
+        fields = set(self.list_fields())
+        with self._lock:
+            self._known = fields
+            for field in [field for field in self._loaded if field not in fields]:
+                del self._loaded[field]
+        return sorted(self._known)
+
+    def _known_fields(self) -> set:
+        if self._known is None:
+            self.refresh()
+        return self._known
+
+    def __contains__(self, field) -> bool:
+        with self._lock:
+            return field in self._known_fields()
+
+    def __iter__(self):
+        with self._lock:
+            return iter(sorted(self._known_fields()))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._known_fields())
+
+    def __getitem__(self, field):
+        with self._lock:
+            if field in self._loaded:
+                self._loaded.move_to_end(field)
+                return self._loaded[field][0]
+            if field not in self._known_fields():
+                raise KeyError(field)
+            field_lock = self._field_locks.setdefault(field, threading.Lock())
+        # Load outside the registry lock so other fields stay available; the field lock prevents double loads
+        with field_lock:
+            with self._lock:
+                if field in self._loaded:
+                    self._loaded.move_to_end(field)
+                    return self._loaded[field][0]
+            path = self.resolve_path(field)
+            if not path:
+                raise KeyError(field)
+            try:
+                store = load_field_store(path, self.embeddings_factory(), mmap=self.mmap)
+            except Exception as e:
+                with self._lock:
+                    self._stats["load_errors"] += 1
+                print(f"Error loading vector store for '{field}': {e}")
+                raise KeyError(field) from e
+            print(f"Loaded vector store for knowledge field '{field}' ({store.index.ntotal} chunks)")
+            self._put(field, store, count_load=True)
+            return store
+
+    def __setitem__(self, field, store):
+        """Registers a store that was just built, replacing the loaded one."""
+        self._put(field, store)
+
+    def _put(self, field, store, count_load: bool = False):
+        with self._lock:
+            self._loaded[field] = (store, estimate_store_bytes(store))
+            self._loaded.move_to_end(field)
+            self._known_fields().add(field)
+            if count_load:
+                self._stats["loads"] += 1
+            self._enforce_budget(keep=field)
+
+    def _enforce_budget(self, keep):
+        while sum(size for _, size in self._loaded.values()) > self.memory_budget_bytes:
+            coldest = next((field for field in self._loaded if field != keep), None)
+            if coldest is None:
+                break
+            del self._loaded[coldest]
+            self._stats["evictions"] += 1
+            print(f"Unloaded vector store for knowledge field '{coldest}' (memory budget)")
+
+    def pop(self, field, default=None):
+        with self._lock:
+            self._known_fields().discard(field)
+            entry = self._loaded.pop(field, None)
+        return entry[0] if entry else default
+
+    def unload(self, field):
+        with self._lock:
+            self._loaded.pop(field, None)
+
+    def loaded_fields(self) -> list:
+        with self._lock:
+            return list(self._loaded)
+
+    def get_statistics(self) -> dict:
+        with self._lock:
+            return {
+                "fields": len(self._known) if self._known is not None else None,
+                "loaded": list(self._loaded),
+                "memory_mb": round(sum(size for _, size in self._loaded.values()) / (1024 * 1024), 2),
+                "budget_mb": round(self.memory_budget_bytes / (1024 * 1024), 2),
+                "mmap": self.mmap,
+                **self._stats,
+            }